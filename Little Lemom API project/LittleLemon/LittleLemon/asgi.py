@@ -3,14 +3,28 @@ ASGI config for LittleLemon project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests are resolved against LittleLemon.asgi_urls, which serves the cart
+and order endpoints from the async views in LittleLemonAPI.async_views.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LittleLemon.settings')
 
-application = get_asgi_application()
+ASGI_URLCONF = 'LittleLemon.asgi_urls'
+
+
+class LittleLemonASGIHandler(ASGIHandler):
+    async def get_response_async(self, request):
+        request.urlconf = ASGI_URLCONF
+        return await super().get_response_async(request)
+
+
+django.setup(set_prefix=False)
+application = LittleLemonASGIHandler()
@@ -0,0 +1,13 @@
+"""
+URL configuration used by the ASGI application.
+
+The cart and order endpoints resolve to the async views first; everything
+else falls through to the regular LittleLemon.urls patterns.
+"""
+from django.urls import path, include
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/', include('LittleLemonAPI.async_urls')),
+] + sync_urlpatterns
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 
+from LittleLemonAPI.db import sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,7 +48,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so the timings cover the whole request.
+    'LittleLemonAPI.instrumentation.request_metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
+    # Before anything that queries: unsafe requests read from the primary database.
+    'LittleLemonAPI.middleware.primary_database_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,13 +85,50 @@ WSGI_APPLICATION = 'LittleLemon.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Tuned pragmas, busy timeout and persistent connections (WAL is set by a migration):
+# see LittleLemonAPI/db.py.
+# 'replica' is a read-only connection to the same file; GET requests read from it
+# (LittleLemonAPI.routers.ReadReplicaRouter) so they never queue behind writers.
 DATABASES = {
+    'default': sqlite_database(BASE_DIR / 'db.sqlite3'),
+    'replica': sqlite_database(BASE_DIR / 'db.sqlite3', replica_of='default'),
+}
+
+DATABASE_ROUTERS = ['LittleLemonAPI.routers.ReadReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# 'default' is per process. Roles and the catalog use 'shared' and tokens 'auth', both
+# SQLite files every worker on the host sees; use Redis or Memcached across hosts.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Entries every worker process must see dropped at once (e.g. roles after
+    # a group change). Use Redis or Memcached when running on several hosts.
+    'shared': {
+        'BACKEND': 'LittleLemonAPI.sqlite_cache.SQLiteCache',
+        'LOCATION': BASE_DIR / 'cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Token -> user entries for LittleLemonAPI.authentication.CachedTokenAuthentication.
+    # Shared like 'shared' so a logout or deactivation revokes the token in every worker.
+    'auth': {
+        'BACKEND': 'LittleLemonAPI.sqlite_cache.SQLiteCache',
+        'LOCATION': BASE_DIR / 'auth-cache.sqlite3',
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
 }
 
+TOKEN_CACHE_ALIAS = 'auth'
+
+# Cached menu and category responses; a menu write must invalidate them in every worker.
+CATALOG_CACHE_ALIAS = 'shared'
+CATALOG_CACHE_TTL = 600
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -131,9 +174,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'LittleLemonAPI.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+    # orjson-backed JSON with byte-identical output (see LittleLemonAPI/renderers.py).
+    'DEFAULT_RENDERER_CLASSES': [
+        'LittleLemonAPI.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'LittleLemonAPI.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
          'django_filters.rest_framework.DjangoFilterBackend',
          'rest_framework.filters.OrderingFilter',
@@ -141,9 +194,11 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 2,
+    # Token buckets shared by all worker processes (see THROTTLE_STORE_PATH).
+    # rest_framework.throttling.AnonRateThrottle/UserRateThrottle keep per-process history instead.
     'DEFAULT_THROTTLE_CLASSES': [
-         'rest_framework.throttling.AnonRateThrottle',
-         'rest_framework.throttling.UserRateThrottle',
+         'LittleLemonAPI.throttling.SharedAnonRateThrottle',
+         'LittleLemonAPI.throttling.SharedUserRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
          'anon': '5/minute',
@@ -154,4 +209,26 @@ REST_FRAMEWORK = {
 DJOSER = {
     "USER_ID_FIELD": "username"
 
-}
\ No newline at end of file
+}
+
+# Fraction of requests timed phase by phase (phase histograms and the
+# Server-Timing header); every request is still counted in the latency
+# histograms. Server-Timing is only sent with DEBUG on or to staff users and
+# managers, and not at all with METRICS_SERVER_TIMING off.
+METRICS_SAMPLE_RATE = 0.01
+METRICS_SERVER_TIMING = True
+
+# New orders go to the least loaded delivery crew member (LittleLemonAPI/dispatch.py).
+AUTO_DISPATCH_ORDERS = True
+DISPATCH_REFRESH_INTERVAL = 30
+
+# SQLite file holding the shared throttle buckets
+THROTTLE_STORE_PATH = BASE_DIR / 'throttle.sqlite3'
+
+# Points THROTTLE_STORE_PATH at a temporary file while the tests run.
+TEST_RUNNER = 'LittleLemon.test_runner.IsolatedStoresRunner'
+
+# Seconds a user's group membership is cached by LittleLemonAPI.roles, and the
+# cache alias holding it.
+ROLE_CACHE_TTL = 300
+ROLE_CACHE_ALIAS = 'shared'
@@ -0,0 +1,40 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from LittleLemonAPI import throttling
+
+
+class IsolatedStoresRunner(DiscoverRunner):
+    """
+    Run the tests against throw-away copies of the shared on-disk stores.
+
+    Tests clear the throttle buckets and caches between cases; without this
+    they would wipe those of the development server or deployment sharing
+    THROTTLE_STORE_PATH and the SQLite cache files.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.store_dir = Path(tempfile.mkdtemp(prefix='littlelemon-tests-'))
+        cache_settings = {
+            alias: {**config, 'LOCATION': self.store_dir / f'cache-{alias}.sqlite3'}
+            if config['BACKEND'] == 'LittleLemonAPI.sqlite_cache.SQLiteCache' else config
+            for alias, config in settings.CACHES.items()
+        }
+        self.store_settings = override_settings(
+            THROTTLE_STORE_PATH=self.store_dir / 'throttle.sqlite3',
+            CACHES=cache_settings,
+        )
+        self.store_settings.enable()
+        throttling._stores.clear()
+
+    def teardown_test_environment(self, **kwargs):
+        self.store_settings.disable()
+        throttling._stores.clear()
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,163 @@
+import datetime
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+
+from . import jobs
+from .models import Order, OrderItem, DailySales, OrderStatusSummary, MenuItemSales, DeliveryCrewSummary, Job
+
+RECORD_ORDER_JOB = 'analytics.record_order'
+
+
+def increment(model, key, rows):
+    """
+    Add the numeric fields of ``rows`` to ``model``'s summary rows in one statement.
+
+    ``key`` is the unique column identifying a row; missing rows are created
+    with the given values, existing ones are incremented in the database.
+    Rows sharing a key are merged first so each summary row is touched once.
+    """
+    merged = {}
+    for row in rows:
+        if row[key] is None:
+            continue
+        if row[key] in merged:
+            for name, value in row.items():
+                if name != key:
+                    merged[row[key]][name] += value
+        else:
+            merged[row[key]] = dict(row)
+    rows = list(merged.values())
+    if not rows:
+        return
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    fields = list(rows[0])
+    columns = [model._meta.get_field(name).column for name in fields]
+    key_column = model._meta.get_field(key).column
+    updates = ', '.join(
+        f'{connection.ops.quote_name(column)} = {table}.{connection.ops.quote_name(column)} + excluded.{connection.ops.quote_name(column)}'
+        for name, column in zip(fields, columns) if name != key
+    )
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(fields)) + ')'] * len(rows))
+    sql = (
+        f'INSERT INTO {table} ({", ".join(connection.ops.quote_name(c) for c in columns)}) VALUES {placeholders} '
+        f'ON CONFLICT ({connection.ops.quote_name(key_column)}) DO UPDATE SET {updates}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [row[name] for row in rows for name in fields])
+
+
+def _item_rows(lines, sign):
+    return [
+        {'menuitem': line['menuitem_id'], 'quantity': sign * line['quantity'], 'revenue': sign * line['price']}
+        for line in lines
+    ]
+
+
+def _crew_rows(crew_id, status, sign):
+    return [{'delivery_crew': crew_id, 'assigned': sign, 'delivered': sign if status else 0}]
+
+
+def record_order(order, lines, sign=1):
+    """
+    Count a new order (sign=1) or remove a deleted one (sign=-1) from every summary.
+
+    ``lines`` are dicts with menuitem_id, quantity and price. Call inside the
+    transaction that writes the order so the summaries never drift.
+    """
+    increment(DailySales, 'date', [{'date': order.date, 'orders': sign, 'revenue': sign * order.total}])
+    increment(OrderStatusSummary, 'status', [{'status': order.status, 'orders': sign}])
+    increment(MenuItemSales, 'menuitem', _item_rows(lines, sign))
+    increment(DeliveryCrewSummary, 'delivery_crew', _crew_rows(order.delivery_crew_id, order.status, sign))
+
+
+def enqueue_record_order(order, lines):
+    """
+    Have a worker run record_order for a new order.
+
+    The job carries the order as it is now, not its id: summaries are only
+    ever incremented, so changes recorded before the job runs still add up.
+    Call inside the transaction that creates the order.
+    """
+    jobs.enqueue(RECORD_ORDER_JOB, {
+        'date': order.date,
+        'total': order.total,
+        'status': order.status,
+        'delivery_crew_id': order.delivery_crew_id,
+        'lines': [{'menuitem_id': line['menuitem_id'], 'quantity': line['quantity'], 'price': line['price']} for line in lines],
+    })
+
+
+@jobs.task(RECORD_ORDER_JOB)
+def record_order_job(payload):
+    order = Order(
+        date=datetime.date.fromisoformat(payload['date']),
+        total=Decimal(payload['total']),
+        status=payload['status'],
+        delivery_crew_id=payload['delivery_crew_id'],
+    )
+    lines = [dict(line, price=Decimal(line['price'])) for line in payload['lines']]
+    record_order(order, lines)
+
+
+def record_order_delete(order):
+    lines = list(order.order_items.values('menuitem_id', 'quantity', 'price'))
+    record_order(order, lines, sign=-1)
+
+
+def record_order_change(old_status, old_crew_id, order):
+    """Move an updated order between status and delivery crew summaries."""
+    increment(OrderStatusSummary, 'status', [
+        {'status': old_status, 'orders': -1},
+        {'status': order.status, 'orders': 1},
+    ])
+    increment(
+        DeliveryCrewSummary, 'delivery_crew',
+        _crew_rows(old_crew_id, old_status, -1) + _crew_rows(order.delivery_crew_id, order.status, 1),
+    )
+
+
+def record_orders_change(old_rows, changes):
+    """
+    Set-based record_order_change for a bulk update.
+
+    ``old_rows`` are the (status, delivery_crew_id) pairs before the update and
+    ``changes`` the values every one of those orders now has.
+    """
+    status_rows, crew_rows = [], []
+    for old_status, old_crew_id in old_rows:
+        status = changes.get('status', old_status)
+        crew_id = changes.get('delivery_crew_id', old_crew_id)
+        status_rows += [{'status': old_status, 'orders': -1}, {'status': status, 'orders': 1}]
+        crew_rows += _crew_rows(old_crew_id, old_status, -1) + _crew_rows(crew_id, status, 1)
+    increment(OrderStatusSummary, 'status', status_rows)
+    increment(DeliveryCrewSummary, 'delivery_crew', crew_rows)
+
+
+@transaction.atomic
+def rebuild():
+    """Recompute every summary table from Order/OrderItem."""
+    for model in (DailySales, OrderStatusSummary, MenuItemSales, DeliveryCrewSummary):
+        model.objects.all().delete()
+    # The rebuild counts orders whose record_order job has not run yet.
+    Job.objects.filter(name=RECORD_ORDER_JOB).delete()
+
+    DailySales.objects.bulk_create(
+        DailySales(date=row['date'], orders=row['orders'], revenue=row['revenue'])
+        for row in Order.objects.values('date').annotate(orders=Count('id'), revenue=Sum('total')).order_by()
+    )
+    OrderStatusSummary.objects.bulk_create(
+        OrderStatusSummary(status=row['status'], orders=row['orders'])
+        for row in Order.objects.values('status').annotate(orders=Count('id')).order_by()
+    )
+    MenuItemSales.objects.bulk_create(
+        MenuItemSales(menuitem_id=row['menuitem'], quantity=row['quantity'], revenue=row['revenue'])
+        for row in OrderItem.objects.values('menuitem').annotate(quantity=Sum('quantity'), revenue=Sum('price')).order_by()
+    )
+    DeliveryCrewSummary.objects.bulk_create(
+        DeliveryCrewSummary(delivery_crew_id=row['delivery_crew'], assigned=row['assigned'], delivered=row['delivered'])
+        for row in Order.objects.filter(delivery_crew__isnull=False).values('delivery_crew')
+        .annotate(assigned=Count('id'), delivered=Count('id', filter=Q(status=True))).order_by()
+    )
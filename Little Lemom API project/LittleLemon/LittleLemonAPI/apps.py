@@ -1,6 +1,38 @@
 from django.apps import AppConfig
+from django.contrib.auth.signals import user_logged_out
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_save, post_delete
 
 
 class LittlelemonapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'LittleLemonAPI'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+        from rest_framework.authtoken.models import Token
+        from . import authentication, dispatch, instrumentation
+        from . import analytics  # registers its background job tasks
+        from .caching import bump_catalog_version
+        from .models import MenuItem, Category
+        from .roles import groups_changed
+
+        m2m_changed.connect(groups_changed, sender=User.groups.through, dispatch_uid='littlelemon_roles_groups_changed')
+
+        # Cached token authentication: drop entries on logout, token deletion, user or group changes.
+        post_delete.connect(authentication.token_deleted, sender=Token, dispatch_uid='littlelemon_auth_token_deleted')
+        post_save.connect(authentication.user_changed, sender=User, dispatch_uid='littlelemon_auth_user_saved')
+        user_logged_out.connect(authentication.user_changed, dispatch_uid='littlelemon_auth_logged_out')
+        m2m_changed.connect(authentication.groups_changed, sender=User.groups.through, dispatch_uid='littlelemon_auth_groups_changed')
+
+        # The dispatcher's crew heap is reloaded when someone joins or leaves a group.
+        m2m_changed.connect(dispatch.crew_changed, sender=User.groups.through, dispatch_uid='littlelemon_dispatch_groups_changed')
+
+        # Any change to the catalog, through the API or the admin, invalidates cached menu responses.
+        for model in (MenuItem, Category):
+            post_save.connect(bump_catalog_version, sender=model, dispatch_uid=f'littlelemon_catalog_save_{model.__name__}')
+            post_delete.connect(bump_catalog_version, sender=model, dispatch_uid=f'littlelemon_catalog_delete_{model.__name__}')
+
+        # Request metrics: time every query and the DRF phases of sampled requests.
+        connection_created.connect(instrumentation.connection_created, dispatch_uid='littlelemon_metrics_queries')
+        instrumentation.install_drf_hooks()
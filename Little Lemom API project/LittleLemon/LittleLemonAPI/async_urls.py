@@ -0,0 +1,15 @@
+from django.urls import path
+
+from .async_views import cart_menu_items, orders_list, order_detail, order_events
+
+
+# Served ahead of LittleLemonAPI.urls by the ASGI application (LittleLemon/asgi_urls.py).
+urlpatterns = [
+    # Cart
+    path('cart/menu-items', cart_menu_items, name="cart-menu-items"),
+    # Order
+    path('orders', orders_list, name='orders-list'),
+    path('orders/<int:order_id>', order_detail, name='order-detail'),
+    # Order change stream (ASGI only)
+    path('orders/events', order_events, name='order-events'),
+]
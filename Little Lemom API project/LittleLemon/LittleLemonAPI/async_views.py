@@ -0,0 +1,326 @@
+"""
+Async versions of the cart and order endpoints, served by the ASGI application.
+
+LittleLemon/asgi.py routes /api/cart/menu-items, /api/orders and
+/api/orders/<id> here (see LittleLemonAPI/async_urls.py); the WSGI
+deployment keeps using the DRF views in views.py. Responses, errors
+included, match the DRF views, with two exceptions: the browsable API is
+not served (a client accepting only text/html gets 406 instead of the HTML
+page) and OPTIONS requests get 405 instead of the view metadata.
+/api/orders/events, the order change stream, only exists here.
+
+Reads run on Django's async ORM (through the values() readers) and
+authentication, role and throttle checks are awaited; the SQLite cache and
+throttle store I/O they need runs on the thread pool, so a slow or locked
+file never stalls the event loop and the other requests and event streams
+on it. Writes leave the event loop too: transactions are not async in
+Django, so checkout, cart upserts and order updates reuse the sync code
+through sync_to_async.
+"""
+import functools
+import math
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.http import HttpResponse, HttpResponseBase, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import events
+from .cart import MAX_CART_LINES, add_to_cart, CartLimitExceeded, UnknownMenuItems
+from .checkout import checkout, EmptyCart, StalePrices
+from .instrumentation import timed
+from .models import Cart, Order
+from .pagination import CURSOR_ORDERINGS, MAX_PAGE_SIZE, InvalidCursor, apaginate_by_cursor
+from .readers import reader_for
+from .roles import aget_roles, is_manager, is_delivery_crew
+from .serializers import CartSerializer, CartLineSerializer, OrderSerializer
+from .views import _update_order, _delete_order
+
+
+def _renderers():
+    # The browsable API needs a full APIView to render, so only the data renderers are offered.
+    return [renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES if renderer.format != 'api']
+
+
+def _render(request, data, status_code, headers=None):
+    renderers = _renderers()
+    try:
+        renderer, media_type = DefaultContentNegotiation().select_renderer(request, renderers)
+    except exceptions.NotAcceptable as exc:
+        renderer, media_type = renderers[0], renderers[0].media_type
+        data, status_code = {'detail': exc.detail}, exc.status_code
+    with timed('render'):
+        content = renderer.render(data, media_type) if data is not None else b''
+    response = HttpResponse(
+        content,
+        status=status_code,
+        content_type=renderer.media_type,
+    )
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+async def _authenticate(request):
+    """APIView.perform_authentication: the first authenticator that recognises the request wins."""
+    for authenticator in request.authenticators:
+        if hasattr(authenticator, 'aauthenticate'):
+            result = await authenticator.aauthenticate(request)
+        else:
+            # SessionAuthentication loads the session and checks CSRF synchronously.
+            result = await sync_to_async(authenticator.authenticate)(request)
+        if result is not None:
+            return result
+    return None
+
+
+async def _reauthenticate(request):
+    """
+    Authenticate ``request`` again, for a response that outlives it: the
+    user, freshly loaded, or None once the token was revoked, the session
+    ended or the user was deactivated.
+    """
+    django_request = request._request
+    if hasattr(django_request, 'session'):
+        # Both were read when the request came in; logout flushes the stored session.
+        django_request.session = import_module(settings.SESSION_ENGINE).SessionStore(django_request.session.session_key)
+        django_request.user = await aget_user(django_request)
+    try:
+        authenticated = await _authenticate(request)
+    except exceptions.APIException:
+        return None
+    return authenticated[0] if authenticated is not None else None
+
+
+def _handle_exception(request, exc, methods):
+    """APIView.handle_exception: render what DRF's exception handler makes of ``exc``, or re-raise."""
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        exc.auth_header = request.authenticators[0].authenticate_header(request)
+    response = api_settings.EXCEPTION_HANDLER(exc, {'request': request, 'args': (), 'kwargs': {}})
+    if response is None:
+        raise exc
+    headers = {name: response[name] for name in ('WWW-Authenticate', 'Retry-After') if response.has_header(name)}
+    if isinstance(exc, exceptions.MethodNotAllowed):
+        headers['Allow'] = ', '.join(methods)
+    return _render(request, response.data, response.status_code, headers)
+
+
+def async_api_view(methods):
+    """
+    Wrap an ``async def view(request, ...)`` with DRF-style request handling.
+
+    Runs the DEFAULT_AUTHENTICATION_CLASSES (IsAuthenticated is required),
+    pre-loads the user's roles and applies the default throttles, then
+    renders the returned (data, status) pair with the negotiated renderer.
+    APIExceptions raised on the way (e.g. a ParseError from request.data)
+    go through DRF's exception handler. A returned HttpResponse (e.g. a
+    stream) is passed through as is.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(django_request, *args, **kwargs):
+            request = Request(
+                django_request,
+                parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+                authenticators=[authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+            )
+            try:
+                if django_request.method not in methods:
+                    raise exceptions.MethodNotAllowed(django_request.method)
+
+                with timed('auth'):
+                    authenticated = await _authenticate(request)
+                if authenticated is None:
+                    raise exceptions.NotAuthenticated()
+                request.user, request.auth = authenticated
+                with timed('permissions'):
+                    await aget_roles(request.user)
+
+                for throttle in (throttle_class() for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES):
+                    with timed('throttle'):
+                        # The shared buckets live in a SQLite file; keep its I/O off the event loop.
+                        allowed = await sync_to_async(throttle.allow_request, thread_sensitive=False)(request, None)
+                    if not allowed:
+                        raise exceptions.Throttled(math.ceil(throttle.wait()))
+
+                result = await view(request, *args, **kwargs)
+            except Exception as exc:
+                return _handle_exception(request, exc, methods)
+            if isinstance(result, HttpResponseBase):
+                return result
+            data, status_code = result
+            return _render(request, data, status_code)
+        return wrapper
+    return decorator
+
+
+@async_api_view(['GET', 'POST', 'DELETE'])
+async def cart_menu_items(request):
+    user = request.user
+
+    if request.method == 'GET':
+        reader = reader_for(CartSerializer)
+        return await reader.ato_representation(reader.values(Cart.objects.filter(user=user))), status.HTTP_200_OK
+
+    elif request.method == 'POST':
+        many = isinstance(request.data, list)
+        if many:
+            serializer = CartLineSerializer(data=request.data, many=True, allow_empty=False, max_length=MAX_CART_LINES)
+        else:
+            serializer = CartLineSerializer(data=request.data)
+        if not serializer.is_valid():
+            return serializer.errors, status.HTTP_400_BAD_REQUEST
+        lines = serializer.validated_data if many else [serializer.validated_data]
+        try:
+            menuitem_ids = await sync_to_async(add_to_cart)(user, lines)
+        except UnknownMenuItems as e:
+            return {"error": f"Menu items not found: {e.ids}"}, status.HTTP_400_BAD_REQUEST
+        except CartLimitExceeded as e:
+            return {"error": str(e)}, status.HTTP_400_BAD_REQUEST
+
+        if many:
+            cart_items = [item async for item in Cart.objects.filter(user=user)]
+            return CartSerializer(cart_items, many=True).data, status.HTTP_201_CREATED
+        cart_item = await Cart.objects.aget(user=user, menuitem_id=menuitem_ids[0])
+        return CartSerializer(cart_item).data, status.HTTP_201_CREATED
+
+    elif request.method == 'DELETE':
+        await Cart.objects.filter(user=user).adelete()
+        return {"message": "Cart cleared."}, status.HTTP_200_OK
+
+
+@async_api_view(['GET', 'POST'])
+async def orders_list(request):
+    user = request.user
+
+    if request.method == 'GET':
+        reader = reader_for(OrderSerializer)
+        orders = Order.objects.visible_to(user)
+        orders = orders.filter_status(request.query_params.get('status'))
+        ordering_param = request.query_params.get('ordering') or '-date'
+
+        try:
+            perpage = int(request.query_params.get('perpage', 10))
+            page = int(request.query_params.get('page', 1))
+        except ValueError:
+            return {"error": "Invalid page or perpage parameter."}, status.HTTP_400_BAD_REQUEST
+        if perpage < 1:
+            return {"error": "Invalid page or perpage parameter."}, status.HTTP_400_BAD_REQUEST
+        perpage = min(perpage, MAX_PAGE_SIZE)
+
+        cursor = request.query_params.get('cursor')
+        if cursor is not None:
+            if ordering_param not in CURSOR_ORDERINGS:
+                return {"error": f"Cursor pagination supports ordering by {', '.join(CURSOR_ORDERINGS)}."}, status.HTTP_400_BAD_REQUEST
+            try:
+                rows, next_cursor = await apaginate_by_cursor(reader.values(orders), ordering_param, cursor, perpage)
+            except InvalidCursor:
+                return {"error": "Invalid cursor."}, status.HTTP_400_BAD_REQUEST
+            return {"results": await reader.ato_representation(rows), "next": next_cursor}, status.HTTP_200_OK
+
+        # Same pages as the sync view's Paginator (out of range pages are empty) without its COUNT(*).
+        if page < 1:
+            return [], status.HTTP_200_OK
+        offset = (page - 1) * perpage
+        rows = reader.values(orders.order_by(ordering_param))[offset:offset + perpage]
+        return await reader.ato_representation(rows), status.HTTP_200_OK
+
+    elif request.method == 'POST':
+        if is_manager(user) or is_delivery_crew(user):
+            return {"error": "Only customers can create orders."}, status.HTTP_403_FORBIDDEN
+
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key and len(idempotency_key) > 64:
+            return {"error": "Idempotency-Key must be at most 64 characters."}, status.HTTP_400_BAD_REQUEST
+        try:
+            order, created = await sync_to_async(checkout)(user, idempotency_key)
+        except EmptyCart:
+            return {"error": "Cart is empty."}, status.HTTP_400_BAD_REQUEST
+        except StalePrices as exc:
+            return {"error": "Menu prices changed since these items were added; the cart has been repriced.", "menuitems": exc.ids}, status.HTTP_409_CONFLICT
+        except CartLimitExceeded as e:
+            return {"error": str(e)}, status.HTTP_400_BAD_REQUEST
+
+        order = await Order.objects.with_details().aget(id=order.id)
+        return OrderSerializer(order).data, status.HTTP_201_CREATED if created else status.HTTP_200_OK
+
+
+@async_api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
+async def order_detail(request, order_id):
+    user = request.user
+
+    if request.method == 'GET':
+        reader = reader_for(OrderSerializer)
+        rows = [row async for row in reader.values(Order.objects.filter(id=order_id))]
+        if not rows:
+            return {"detail": "No Order matches the given query."}, status.HTTP_404_NOT_FOUND
+        if not (is_manager(user) or is_delivery_crew(user)):
+            if rows[0]['user_id'] != user.id:
+                return {"error": "Not authorized to view this order."}, status.HTTP_403_FORBIDDEN
+        return (await reader.ato_representation(rows))[0], status.HTTP_200_OK
+
+    order = await Order.objects.with_details().filter(id=order_id).afirst()
+    if order is None:
+        return {"detail": "No Order matches the given query."}, status.HTTP_404_NOT_FOUND
+
+    if request.method in ['PUT', 'PATCH']:
+        if is_manager(user):
+            response = await sync_to_async(_update_order)(order, request.data)
+            return response.data, response.status_code
+        elif is_delivery_crew(user):
+            if set(request.data.keys()) != {'status'}:
+                return {"error": "Delivery crew can only update the 'status' field."}, status.HTTP_400_BAD_REQUEST
+            response = await sync_to_async(_update_order)(order, request.data)
+            return response.data, response.status_code
+        else:
+            return {"error": "Not authorized to update this order."}, status.HTTP_403_FORBIDDEN
+
+    elif request.method == 'DELETE':
+        if is_manager(user):
+            await sync_to_async(_delete_order)(order)
+            return {"message": "Order deleted."}, status.HTTP_200_OK
+        else:
+            return {"error": "Not authorized to delete this order."}, status.HTTP_403_FORBIDDEN
+
+
+@async_api_view(['GET'])
+async def order_events(request):
+    """
+    text/event-stream of order.created, order.updated and order.deleted events
+    for the orders the user may see (see LittleLemonAPI.events).
+
+    ?order=<id> narrows the stream to one order; a Last-Event-ID header
+    replays the events missed since that id. The stream is closed when the
+    user logs out or their role changes.
+    """
+    user = request.user
+    try:
+        order_id = int(request.query_params['order']) if 'order' in request.query_params else None
+        last_event_id = int(request.headers['Last-Event-ID']) if 'Last-Event-ID' in request.headers else None
+    except ValueError:
+        return {"error": "Invalid order or Last-Event-ID."}, status.HTTP_400_BAD_REQUEST
+    if order_id is not None and not await Order.objects.visible_to(user).filter(id=order_id).aexists():
+        return {"detail": "No Order matches the given query."}, status.HTTP_404_NOT_FOUND
+
+    async def current_audience():
+        user = await _reauthenticate(request)
+        if user is None:
+            return None
+        await aget_roles(user)
+        return events.audience(user)
+
+    response = StreamingHttpResponse(
+        events.stream(events.audience(user), order_id, last_event_id, current_audience),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,132 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User, Group
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from .roles import get_roles, aget_roles
+
+# Cache alias holding token -> user entries. Its TIMEOUT bounds how long an entry
+# lives and past MAX_ENTRIES the least recently used tokens are evicted.
+# Revocation deletes entries, so every worker process must share this cache
+# (a process-local LocMemCache would keep serving revoked tokens).
+TOKEN_CACHE_ALIAS = getattr(settings, 'TOKEN_CACHE_ALIAS', 'default')
+
+
+def _cache_key(key):
+    # Keep raw tokens out of (possibly shared) cache keys.
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+stats = _Stats()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that caches the token with its user and roles.
+
+    A hit skips the Token + User join and the group lookup. Entries are
+    dropped from the shared cache as soon as the token is deleted (djoser
+    logout / token destroy), the user is saved (e.g. deactivated) or their
+    groups change, which revokes the token in every worker at once.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = caches[TOKEN_CACHE_ALIAS]
+        token = cache.get(_cache_key(key))
+        stats.record(hit=token is not None)
+
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            get_roles(user)  # cached on the user and stored with the token
+            cache.set(_cache_key(key), token)
+            return user, token
+
+        return token.user, token
+
+    async def aauthenticate(self, request):
+        """Async variant of authenticate() for the ASGI views: a cache hit needs no sync_to_async database call."""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        cache = caches[TOKEN_CACHE_ALIAS]
+        token = await cache.aget(_cache_key(key))
+        stats.record(hit=token is not None)
+        if token is not None:
+            return token.user, token
+
+        try:
+            token = await Token.objects.select_related('user').aget(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        await aget_roles(token.user)
+        await cache.aset(_cache_key(key), token)
+        return token.user, token
+
+
+def invalidate_tokens(*keys):
+    caches[TOKEN_CACHE_ALIAS].delete_many([_cache_key(key) for key in keys])
+
+
+def invalidate_user_tokens(*user_ids):
+    invalidate_tokens(*Token.objects.filter(user_id__in=user_ids).values_list('key', flat=True))
+
+
+def token_deleted(sender, instance, **kwargs):
+    invalidate_tokens(instance.key)
+
+
+def user_changed(sender, instance=None, user=None, **kwargs):
+    """post_save / user_logged_out receiver for User."""
+    user = instance or user
+    if user is not None and user.pk is not None:
+        invalidate_user_tokens(user.pk)
+
+
+def groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """m2m_changed receiver for User.groups: cached entries carry the user's roles."""
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+
+    if isinstance(instance, User):
+        invalidate_user_tokens(instance.pk)
+    elif isinstance(instance, Group):
+        if action == 'pre_clear':
+            pk_set = set(instance.user_set.values_list('pk', flat=True))
+        if pk_set:
+            invalidate_user_tokens(*pk_set)
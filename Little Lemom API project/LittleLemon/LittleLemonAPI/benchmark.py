@@ -0,0 +1,506 @@
+"""
+Benchmark harness for the LittleLemon API, driven by ``manage.py bench_api``.
+
+Seeds a dataset in bulk, then replays each endpoint either in-process (the
+view is called directly with an already authenticated request), through
+the WSGI application or through the ASGI application (middleware, token
+authentication and routing included). For every endpoint it records
+throughput, p50/p95/p99 latency and the SQL query count of one request.
+measure_concurrent() replays a read endpoint with several requests in
+flight: threads for the sync drivers, asyncio tasks for ASGI, where it
+also records how late a 1 ms timer fires on the event loop (loop lag: the
+time the loop spent blocked). store_contention() makes the shared SQLite
+stores as busy as a second worker process would.
+"""
+import asyncio
+import datetime
+import io
+import json
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.core.cache import caches
+from django.core.signals import request_started, request_finished
+from django.db import close_old_connections, connection, connections
+from django.test.utils import override_settings
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.throttling import SimpleRateThrottle
+
+from . import throttling
+from .models import Category, MenuItem, Cart, Order, OrderItem
+from .roles import MANAGER, DELIVERY_CREW
+from .sqlite_cache import SQLiteCache
+
+BATCH_SIZE = 5000
+# Seconds between the event loop timer ticks measure_concurrent uses to measure loop lag.
+LAG_TICK = 0.001
+
+
+class Dataset:
+    """Ids and tokens of the seeded rows the endpoints are replayed against."""
+
+    def __init__(self, manager, crew, customer, order_id, menuitem_ids):
+        self.users = {'manager': manager, 'crew': crew, 'customer': customer}
+        self.tokens = {role: Token.objects.get_or_create(user=user)[0].key for role, user in self.users.items()}
+        self.order_id = order_id
+        self.menuitem_ids = menuitem_ids
+
+
+def _host():
+    # 'localhost' is accepted by an empty ALLOWED_HOSTS while DEBUG is on.
+    hosts = [host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')]
+    return hosts[0] if hosts else 'localhost'
+
+
+def _batches(iterable, size=BATCH_SIZE):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(menu_items, users, orders, items_per_order=2, rng=None, log=lambda msg: None):
+    """Bulk-insert a realistic catalog, user base and order history."""
+    rng = rng or random.Random(42)
+    manager_group, _ = Group.objects.get_or_create(name=MANAGER)
+    crew_group, _ = Group.objects.get_or_create(name=DELIVERY_CREW)
+
+    categories = Category.objects.bulk_create([
+        Category(slug=f'bench-{i}', title=f'Bench category {i}') for i in range(max(1, menu_items // 500))
+    ])
+    for batch in _batches(
+        MenuItem(
+            title=f'Bench dish {i}',
+            price=Decimal(rng.randint(200, 4000)) / 100,
+            featured=rng.random() < 0.1,
+            category=rng.choice(categories),
+        )
+        for i in range(menu_items)
+    ):
+        MenuItem.objects.bulk_create(batch)
+    menuitems = dict(MenuItem.objects.filter(category__in=categories).values_list('id', 'price'))
+    menuitem_ids = list(menuitems)
+    log(f'seeded {len(menuitem_ids)} menu items')
+
+    password = make_password('bench')
+    for batch in _batches(User(username=f'bench-user-{i}', password=password) for i in range(users)):
+        User.objects.bulk_create(batch)
+    user_ids = list(User.objects.filter(username__startswith='bench-user-').values_list('id', flat=True))
+    crew_ids = user_ids[:max(1, len(user_ids) // 250)]
+    manager_id = user_ids[-1]
+    customer_ids = user_ids[len(crew_ids):-1] or user_ids
+    crew_group.user_set.add(*crew_ids)
+    manager_group.user_set.add(manager_id)
+    log(f'seeded {len(user_ids)} users ({len(crew_ids)} delivery crew)')
+
+    today = datetime.date.today()
+    created = 0
+    for batch in _batches(range(orders)):
+        order_rows = []
+        item_rows = []
+        for _ in batch:
+            lines = rng.sample(menuitem_ids, min(items_per_order, len(menuitem_ids)))
+            quantities = [rng.randint(1, 3) for _ in lines]
+            order_rows.append(Order(
+                user_id=rng.choice(customer_ids),
+                delivery_crew_id=rng.choice(crew_ids) if rng.random() < 0.8 else None,
+                status=rng.random() < 0.6,
+                total=sum(menuitems[m] * q for m, q in zip(lines, quantities)),
+                date=today - datetime.timedelta(days=rng.randint(0, 365)),
+            ))
+            item_rows.append(list(zip(lines, quantities)))
+        Order.objects.bulk_create(order_rows)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menuitem_id=m, quantity=q, unit_price=menuitems[m], price=menuitems[m] * q)
+            for order, lines in zip(order_rows, item_rows)
+            for m, q in lines
+        ], batch_size=BATCH_SIZE)
+        created += len(order_rows)
+        if created % 100_000 < BATCH_SIZE:
+            log(f'seeded {created} orders')
+
+    customer = User.objects.get(id=customer_ids[0])
+    order_id = Order.objects.filter(user=customer).values_list('id', flat=True).first() \
+        or Order.objects.values_list('id', flat=True).first()
+    return Dataset(
+        manager=User.objects.get(id=manager_id),
+        crew=User.objects.get(id=crew_ids[0]),
+        customer=customer,
+        order_id=order_id,
+        menuitem_ids=menuitem_ids,
+    )
+
+
+class Endpoint:
+    """One request to replay: ``before`` runs untimed ahead of every request (e.g. to fill a cart)."""
+
+    def __init__(self, name, role, method, path, data=None, before=None):
+        self.name, self.role, self.method = name, role, method
+        self.path, self.data, self.before = path, data, before
+
+
+def endpoints(dataset):
+    customer = dataset.users['customer']
+    menuitem = dataset.menuitem_ids[0]
+
+    def fill_cart():
+        Cart.objects.filter(user=customer).delete()
+        Cart.objects.bulk_create([
+            Cart(user=customer, menuitem_id=m, quantity=1, unit_price=price, price=price)
+            for m, price in MenuItem.objects.filter(id__in=dataset.menuitem_ids[:5]).values_list('id', 'price')
+        ])
+
+    return [
+        Endpoint('menu-items list', 'customer', 'get', '/api/menu-items?ordering=price'),
+        Endpoint('menu-items search', 'customer', 'get', '/api/menu-items?search=dish 12'),
+        Endpoint('menu-item detail', 'customer', 'get', f'/api/menu-items/{menuitem}'),
+        Endpoint('categories', 'customer', 'get', '/api/categories/'),
+        Endpoint('cart list', 'customer', 'get', '/api/cart/menu-items', before=fill_cart),
+        Endpoint('cart add', 'customer', 'post', '/api/cart/menu-items', {'menuitem': menuitem, 'quantity': 1}),
+        Endpoint('checkout', 'customer', 'post', '/api/orders', before=fill_cart),
+        Endpoint('orders (manager)', 'manager', 'get', '/api/orders'),
+        Endpoint('orders (manager, deep page)', 'manager', 'get', '/api/orders?page=500'),
+        Endpoint('orders (manager, cursor)', 'manager', 'get', '/api/orders?cursor='),
+        Endpoint('orders (crew)', 'crew', 'get', '/api/orders'),
+        Endpoint('orders (customer)', 'customer', 'get', '/api/orders'),
+        Endpoint('order detail', 'manager', 'get', f'/api/orders/{dataset.order_id}'),
+        Endpoint('manager group', 'manager', 'get', '/api/groups/manager/users'),
+        Endpoint('delivery crew group', 'manager', 'get', '/api/groups/delivery-crew/users'),
+    ]
+
+
+class InProcessDriver:
+    """Calls the resolved view with a pre-authenticated request: measures view + ORM + serialization."""
+
+    mode = 'in-process'
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.factory = APIRequestFactory(SERVER_NAME=_host())
+
+    def __call__(self, endpoint):
+        if endpoint.method == 'get':
+            request = self.factory.get(endpoint.path)
+        else:
+            request = getattr(self.factory, endpoint.method)(endpoint.path, endpoint.data, format='json')
+        force_authenticate(request, user=self.dataset.users[endpoint.role])
+        match = resolve(endpoint.path.partition('?')[0])
+        response = match.func(request, *match.args, **match.kwargs)
+        response.render()
+        return response.status_code
+
+
+class WSGIDriver:
+    """Sends requests through LittleLemon.wsgi.application with token authentication."""
+
+    mode = 'wsgi'
+
+    def __init__(self, dataset):
+        from LittleLemon.wsgi import application
+
+        self.application = application
+        self.dataset = dataset
+
+    def __call__(self, endpoint):
+        path, _, query = endpoint.path.partition('?')
+        body = json.dumps(endpoint.data).encode() if endpoint.data is not None else b''
+        environ = {
+            'REQUEST_METHOD': endpoint.method.upper(),
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': _host(),
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'HTTP_AUTHORIZATION': f'Token {self.dataset.tokens[endpoint.role]}',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': False,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'wsgi.version': (1, 0),
+        }
+        status = []
+        chunks = self.application(environ, lambda s, headers, exc_info=None: status.append(s))
+        b''.join(chunks)
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        return int(status[0].split()[0])
+
+
+class ASGIDriver:
+    """Sends requests through LittleLemon.asgi.application, where cart and orders use the async views."""
+
+    mode = 'asgi'
+
+    def __init__(self, dataset):
+        from LittleLemon.asgi import application
+
+        self.application = application
+        self.dataset = dataset
+
+    async def request(self, endpoint):
+        path, _, query = endpoint.path.partition('?')
+        body = json.dumps(endpoint.data).encode() if endpoint.data is not None else b''
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': endpoint.method.upper(),
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [
+                (b'host', _host().encode()),
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'authorization', f'Token {self.dataset.tokens[endpoint.role]}'.encode()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': (_host(), 80),
+        }
+        received = False
+        status = []
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            # Never disconnect; Django cancels this wait once the response is sent.
+            await asyncio.Future()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await self.application(scope, receive, send)
+        return status[0]
+
+    def __call__(self, endpoint):
+        return async_to_sync(self.request)(endpoint)
+
+
+@contextmanager
+def benchmark_environment():
+    """
+    Isolate the shared stores, lift throttle limits and keep the seeded transaction's connection open.
+
+    Seed and replay inside it. The SQLite caches and throttle buckets are
+    moved to temporary files, and other caches to a private LocMemCache:
+    the seeded rows are usually rolled back and SQLite hands their ids out
+    again, so roles, tokens or catalog pages cached for them in the shared
+    stores would be served to the real users created next. Like
+    django.test.Client, the WSGI handler must not close the connection
+    between requests or the rolled-back dataset would disappear.
+    """
+    store_dir = tempfile.mkdtemp(prefix='littlelemon-bench-')
+    stores = override_settings(
+        CACHES={
+            alias: {**config, 'LOCATION': f'{store_dir}/cache-{alias}.sqlite3'}
+            if config['BACKEND'] == 'LittleLemonAPI.sqlite_cache.SQLiteCache'
+            else {**config, 'LOCATION': f'bench-{alias}'}
+            for alias, config in settings.CACHES.items()
+        },
+        THROTTLE_STORE_PATH=f'{store_dir}/throttle.sqlite3',
+    )
+    rates = SimpleRateThrottle.THROTTLE_RATES
+    saved = dict(rates)
+    rates.update({scope: '1000000000/second' for scope in rates})
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    stores.enable()
+    try:
+        yield
+    finally:
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        stores.disable()
+        throttling._stores.pop(f'{store_dir}/throttle.sqlite3', None)
+        shutil.rmtree(store_dir, ignore_errors=True)
+        rates.clear()
+        rates.update(saved)
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+
+
+class QueryCounter:
+    """execute_wrapper counting statements; unlike the DEBUG query log it is never reset or truncated."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(driver, endpoint, requests, warmup=3):
+    """Replay ``endpoint`` and return its statistics (latencies in milliseconds)."""
+    for _ in range(warmup):
+        if endpoint.before:
+            endpoint.before()
+        driver(endpoint)
+
+    if endpoint.before:
+        endpoint.before()
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        status = driver(endpoint)
+
+    samples = []
+    for _ in range(requests):
+        if endpoint.before:
+            endpoint.before()
+        start = time.perf_counter()
+        driver(endpoint)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return {'status': status, **_summary(samples, sum(samples) / 1000), 'queries': counter.count}
+
+
+def _summary(samples, elapsed):
+    cuts = statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+    return {
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / elapsed, 1),
+        'p50_ms': round(cuts[49], 3),
+        'p95_ms': round(cuts[94], 3),
+        'p99_ms': round(cuts[98], 3),
+    }
+
+
+def measure_concurrent(driver, endpoint, requests, concurrency):
+    """
+    Replay a read-only ``endpoint`` with ``concurrency`` requests in flight.
+
+    Sync drivers use one thread (and database connection) per worker; the
+    ASGI driver runs the workers as tasks on one event loop. Threads open
+    their own connections, so the seeded data must be committed.
+    """
+    samples = []
+    per_worker = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+
+    if isinstance(driver, ASGIDriver):
+        async def worker(count):
+            for _ in range(count):
+                start = time.perf_counter()
+                await driver.request(endpoint)
+                samples.append((time.perf_counter() - start) * 1000)
+
+        lags = []
+
+        async def ticker(done):
+            loop = asyncio.get_running_loop()
+            while not done.is_set():
+                begin = loop.time()
+                await asyncio.sleep(LAG_TICK)
+                lags.append((loop.time() - begin - LAG_TICK) * 1000)
+
+        async def run():
+            done = asyncio.Event()
+            tick = asyncio.ensure_future(ticker(done))
+            await asyncio.gather(*(worker(count) for count in per_worker))
+            done.set()
+            await tick
+
+        start = time.perf_counter()
+        async_to_sync(run)()
+        elapsed = time.perf_counter() - start
+        return {
+            **_summary(samples, elapsed),
+            'loop_lag_p99_ms': round(
+                statistics.quantiles(lags, n=100, method='inclusive')[98] if len(lags) > 1 else max(lags, default=0), 3,
+            ),
+            'loop_lag_max_ms': round(max(lags, default=0), 3),
+        }
+    else:
+        def worker(count):
+            try:
+                for _ in range(count):
+                    begin = time.perf_counter()
+                    driver(endpoint)
+                    samples.append((time.perf_counter() - begin) * 1000)
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(worker, per_worker))
+
+    return _summary(samples, time.perf_counter() - start)
+
+
+@contextmanager
+def store_contention(hold_ms=20, every_ms=40):
+    """
+    Hold the write lock of the throttle store and every SQLiteCache for
+    ``hold_ms`` out of each ``every_ms`` from another connection, the way a
+    busy second worker process does.
+    """
+    store = throttling.get_store()
+    store.connection()  # create the file and its table
+    paths = [store.path] + [caches[alias].path for alias in settings.CACHES if isinstance(caches[alias], SQLiteCache)]
+    stop = threading.Event()
+
+    def hold():
+        conns = [sqlite3.connect(path, timeout=5, isolation_level=None) for path in paths]
+        try:
+            while not stop.is_set():
+                for conn in conns:
+                    conn.execute('BEGIN IMMEDIATE')
+                time.sleep(hold_ms / 1000)
+                for conn in conns:
+                    conn.execute('COMMIT')
+                time.sleep((every_ms - hold_ms) / 1000)
+        finally:
+            for conn in conns:
+                conn.close()
+
+    thread = threading.Thread(target=hold, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regressions of ``results`` against ``baseline``."""
+    regressions = []
+    for mode, endpoints_ in results.items():
+        for name, current in endpoints_.items():
+            previous = baseline.get(mode, {}).get(name)
+            if previous is None:
+                continue
+            # Concurrent runs record latency only.
+            if 'queries' in current and current['queries'] > previous['queries']:
+                regressions.append(f'{mode} {name}: {previous["queries"]} -> {current["queries"]} queries')
+            if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                regressions.append(f'{mode} {name}: p95 {previous["p95_ms"]} -> {current["p95_ms"]} ms')
+    return regressions
@@ -0,0 +1,45 @@
+from django.db import transaction
+
+from . import analytics, events
+from .models import Order, OrderEvent
+
+# Most orders a single bulk request may touch.
+MAX_BULK_ORDERS = 1000
+
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+
+
+def bulk_update_orders(order_ids, changes):
+    """
+    Apply ``changes`` (delivery_crew_id and/or status) to every order in ``order_ids``.
+
+    Runs in one transaction with a fixed number of queries: the current rows
+    are read (and locked) once, every order that actually changes is written
+    by a single UPDATE, the sales summaries are moved in one statement per
+    table and the changes are logged for the order event stream. Returns
+    {order_id: UPDATED | UNCHANGED | NOT_FOUND} in input order.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    with transaction.atomic():
+        current = {
+            row[0]: row[1:]
+            for row in Order.objects.select_for_update()
+            .filter(id__in=order_ids)
+            .values_list('id', 'status', 'delivery_crew_id')
+        }
+        changed = [
+            order_id for order_id, (status, crew_id) in current.items()
+            if changes.get('status', status) != status or changes.get('delivery_crew_id', crew_id) != crew_id
+        ]
+        if changed:
+            Order.objects.filter(id__in=changed).update(**changes)
+            analytics.record_orders_change([current[order_id] for order_id in changed], changes)
+            events.publish_orders(OrderEvent.UPDATED, changed)
+
+    changed = set(changed)
+    return {
+        order_id: NOT_FOUND if order_id not in current else UPDATED if order_id in changed else UNCHANGED
+        for order_id in order_ids
+    }
@@ -0,0 +1,89 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+# Cache holding the catalog version and cached menu/category responses. A
+# version bump must reach every worker, so multi-process deployments need a
+# shared backend here (settings use the 'shared' alias).
+CATALOG_CACHE_ALIAS = getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')
+CATALOG_CACHE_TTL = getattr(settings, 'CATALOG_CACHE_TTL', 600)
+
+VERSION_KEY = 'catalog:version'
+
+
+def catalog_cache():
+    return caches[CATALOG_CACHE_ALIAS]
+
+
+def catalog_version():
+    cache = catalog_cache()
+    cache.add(VERSION_KEY, 1, timeout=None)
+    return cache.get(VERSION_KEY, 1)
+
+
+def bump_catalog_version(**kwargs):
+    """Invalidate every cached catalog response. Usable as a signal receiver."""
+    cache = catalog_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 2, timeout=None)
+
+
+def _normalized_params(query_params):
+    return '&'.join(
+        f'{key}={",".join(sorted(query_params.getlist(key)))}'
+        for key in sorted(query_params)
+    )
+
+
+class CatalogCacheMixin:
+    """
+    Cache list/retrieve responses of catalog views until the catalog changes.
+
+    Entries are keyed on the view, the object id, the normalized query
+    parameters and the catalog version, so any create/update/delete of a
+    menu item or category (which bumps the version) makes old entries
+    unreachable. Responses carry an ETag derived from the same key and a
+    matching If-None-Match is answered with 304 without touching the DB.
+    Authentication, permissions and throttling still run as usual.
+    """
+
+    def catalog_cache_key(self, request):
+        parts = [
+            type(self).__name__,
+            getattr(self, 'action', None) or 'list',
+            str(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, '')),
+            request.get_host(),
+            _normalized_params(request.query_params),
+            str(catalog_version()),
+        ]
+        return 'catalog:' + hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def cached_response(self, request, build):
+        key = self.catalog_cache_key(request)
+        etag = f'"{key[len("catalog:"):]}"'
+
+        if etag in request.headers.get('If-None-Match', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cache = catalog_cache()
+            cached = cache.get(key)
+            if cached is None:
+                response = build()
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, CATALOG_CACHE_TTL)
+            else:
+                response = Response(cached)
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,124 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery
+from django.db.models.functions import Round
+
+from .models import Cart, MenuItem
+
+# Most lines a single cart POST may carry.
+MAX_CART_LINES = 100
+
+# What Cart.quantity (SmallIntegerField) and the cart/order price columns
+# (DecimalField(max_digits=6, decimal_places=2)) can hold.
+MAX_LINE_QUANTITY = 32767
+MAX_PRICE = Decimal('9999.99')
+
+
+class UnknownMenuItems(Exception):
+    """Raised when a cart line refers to menu items that do not exist."""
+
+    def __init__(self, ids):
+        super().__init__(ids)
+        self.ids = sorted(ids)
+
+
+class CartLimitExceeded(Exception):
+    """Raised when a cart line or the cart total would not fit the cart and order columns."""
+
+
+def _check_limits(user, quantities, prices):
+    """Raise CartLimitExceeded unless the cart, with ``quantities`` added, stays within the column limits."""
+    existing = {
+        menuitem_id: (quantity, price)
+        for menuitem_id, quantity, price in Cart.objects.filter(user=user).values_list('menuitem_id', 'quantity', 'price')
+    }
+    too_large = []
+    total = sum(price for menuitem_id, (_, price) in existing.items() if menuitem_id not in quantities)
+    for menuitem_id, quantity in quantities.items():
+        quantity += existing.get(menuitem_id, (0, 0))[0]
+        price = prices[menuitem_id] * quantity
+        if quantity > MAX_LINE_QUANTITY or price > MAX_PRICE:
+            too_large.append(menuitem_id)
+        total += price
+    if too_large:
+        raise CartLimitExceeded(
+            f'Quantity or price too large for menu items {sorted(too_large)}: '
+            f'a line may hold at most {MAX_LINE_QUANTITY} items and cost at most {MAX_PRICE}.'
+        )
+    if total > MAX_PRICE:
+        raise CartLimitExceeded(f'The cart total may not exceed {MAX_PRICE}.')
+
+
+def _upsert_sql(rows):
+    table = connection.ops.quote_name(Cart._meta.db_table)
+    values = ', '.join(['(%s, %s, %s, %s, %s)'] * rows)
+    # On conflict the existing quantity is incremented in the database and the
+    # line is repriced at the current menu price. The WHERE clause skips lines
+    # that would outgrow their columns (a concurrent add since _check_limits);
+    # add_to_cart notices from the row count.
+    return (
+        f'INSERT INTO {table} (user_id, menuitem_id, quantity, unit_price, price) VALUES {values} '
+        f'ON CONFLICT (menuitem_id, user_id) DO UPDATE SET '
+        f'quantity = {table}.quantity + excluded.quantity, '
+        f'unit_price = excluded.unit_price, '
+        f'price = ROUND(excluded.unit_price * ({table}.quantity + excluded.quantity), 2) '
+        f'WHERE {table}.quantity + excluded.quantity <= {MAX_LINE_QUANTITY} '
+        f'AND ROUND(excluded.unit_price * ({table}.quantity + excluded.quantity), 2) <= {float(MAX_PRICE)}'
+    )
+
+
+def add_to_cart(user, lines):
+    """
+    Add ``lines`` ({'menuitem': id, 'quantity': n}) to the user's cart in one transaction.
+
+    Prices are read with a single query and every line is upserted with a
+    single INSERT .. ON CONFLICT statement, so adding an item that is already
+    in the cart raises its quantity instead of failing on unique_together.
+    Raises CartLimitExceeded, changing nothing, if a line or the cart total
+    would not fit the cart and order columns. Returns the affected menu item ids.
+    """
+    quantities = {}
+    for line in lines:
+        quantities[line['menuitem']] = quantities.get(line['menuitem'], 0) + line['quantity']
+    if not quantities:
+        return []
+
+    prices = dict(MenuItem.objects.filter(id__in=quantities).values_list('id', 'price'))
+    missing = set(quantities) - set(prices)
+    if missing:
+        raise UnknownMenuItems(missing)
+
+    params = []
+    for menuitem_id, quantity in quantities.items():
+        unit_price = prices[menuitem_id]
+        params += [user.id, menuitem_id, quantity, unit_price, unit_price * quantity]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _check_limits(user, quantities, prices)
+        cursor.execute(_upsert_sql(len(quantities)), params)
+        if cursor.rowcount != len(quantities):
+            raise CartLimitExceeded(f'A line may hold at most {MAX_LINE_QUANTITY} items and cost at most {MAX_PRICE}.')
+    return list(quantities)
+
+
+def reprice_carts(menuitem_ids, user=None):
+    """
+    Reprice the cart lines of ``menuitem_ids`` (only ``user``'s, if given) at the current menu price.
+
+    A single UPDATE sets unit_price from MenuItem and price = unit_price *
+    quantity, whatever the number of carts or items. Lines already at the
+    current price are left alone, and so are lines whose new price would
+    exceed MAX_PRICE: they keep the old one and checkout refuses them.
+    Returns the number of lines repriced.
+    """
+    menu_price = Subquery(MenuItem.objects.filter(id=OuterRef('menuitem_id')).values('price')[:1])
+    lines = Cart.objects.filter(menuitem_id__in=menuitem_ids).exclude(unit_price=F('menuitem__price')).alias(
+        new_price=ExpressionWrapper(F('quantity') * F('menuitem__price'), output_field=DecimalField()),
+    ).filter(new_price__lte=MAX_PRICE)
+    if user is not None:
+        lines = lines.filter(user=user)
+    return lines.update(
+        unit_price=menu_price,
+        price=Round(ExpressionWrapper(F('quantity') * menu_price, output_field=DecimalField(max_digits=6, decimal_places=2)), 2),
+    )
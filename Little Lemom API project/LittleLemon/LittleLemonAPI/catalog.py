@@ -0,0 +1,58 @@
+"""
+Aggregates over the menu for navigation: the category index and facet counts.
+
+Both are single GROUP BY queries; callers cache the results by catalog
+version (see LittleLemonAPI.caching), so they are recomputed only after a
+menu item or category changes.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Max, Min, Q
+
+from .models import Category
+
+CENTS = Decimal('0.01')
+
+
+def _money(value):
+    # Aggregates over a DecimalField come back unquantized on SQLite.
+    return None if value is None else value.quantize(CENTS)
+
+
+def category_index():
+    """Every category with its number of items, featured items and price range, in one query."""
+    rows = Category.objects.order_by('title', 'id').values('id', 'slug', 'title').annotate(
+        items=Count('menuitem'),
+        featured=Count('menuitem', filter=Q(menuitem__featured=True)),
+        min_price=Min('menuitem__price'),
+        max_price=Max('menuitem__price'),
+    )
+    return [{**row, 'min_price': _money(row['min_price']), 'max_price': _money(row['max_price'])} for row in rows]
+
+
+def menu_facets(menuitems):
+    """
+    Facet counts for a (filtered) MenuItem queryset, in one query.
+
+    Items are grouped by (category, featured) and the groups are folded
+    into the total, the price range and the counts per category and per
+    featured flag.
+    """
+    groups = menuitems.order_by().values('category_id', 'featured').annotate(
+        items=Count('id'), min_price=Min('price'), max_price=Max('price'),
+    )
+    categories = {}
+    featured = {'true': 0, 'false': 0}
+    prices = []
+    for group in groups:
+        category = categories.setdefault(group['category_id'], {'id': group['category_id'], 'items': 0})
+        category['items'] += group['items']
+        featured['true' if group['featured'] else 'false'] += group['items']
+        prices += [group['min_price'], group['max_price']]
+    return {
+        'items': featured['true'] + featured['false'],
+        'min_price': _money(min(prices)) if prices else None,
+        'max_price': _money(max(prices)) if prices else None,
+        'category': sorted(categories.values(), key=lambda category: category['id']),
+        'featured': featured,
+    }
@@ -0,0 +1,117 @@
+import datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from . import analytics, dispatch, events
+from .cart import MAX_PRICE, CartLimitExceeded, reprice_carts
+from .models import Cart, Order, OrderEvent, OrderItem
+
+CENTS = Decimal('0.01')
+
+
+class EmptyCart(Exception):
+    """Raised when a customer checks out without any cart items."""
+
+
+class StalePrices(Exception):
+    """Raised when menu prices changed since items were added; the cart has been repriced."""
+
+    def __init__(self, ids):
+        super().__init__(ids)
+        self.ids = sorted(ids)
+
+
+def checkout(user, idempotency_key=None):
+    """
+    Turn the user's cart into an Order in a single transaction.
+
+    The order is assigned to the least loaded delivery crew member (see
+    LittleLemonAPI.dispatch) unless AUTO_DISPATCH_ORDERS is off.
+
+    Line prices are checked against the menu in the query that reads the
+    cart. If any changed, the cart is repriced, no order is created and
+    StalePrices is raised so the customer can review the new total. A cart
+    that would cost more than the price columns hold at the current prices
+    raises CartLimitExceeded instead.
+
+    Returns (order, created). When an order already exists for the same
+    idempotency key it is returned unchanged with created=False, so client
+    retries never build a second order. The number of queries does not
+    depend on the number of cart rows. Sales summaries are updated later by
+    a background job (see LittleLemonAPI.jobs).
+    """
+    if idempotency_key:
+        existing = Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return existing, False
+
+    try:
+        with transaction.atomic():
+            # Lock the cart rows so a concurrent checkout cannot reuse them.
+            cart_items = Cart.objects.select_for_update().filter(user=user)
+            lines = list(cart_items.values(
+                'id', 'menuitem_id', 'quantity', 'unit_price', 'price', menu_price=F('menuitem__price'),
+            ))
+            if not lines:
+                raise EmptyCart()
+            _check_current_prices(lines)
+
+            stale = {line['menuitem_id'] for line in lines if line['unit_price'] != line['menu_price']}
+            if stale:
+                reprice_carts(stale, user=user)
+                order = None
+            else:
+                order = _create_order(user, cart_items, lines, idempotency_key)
+    except IntegrityError:
+        # Another request with the same key won the race.
+        if not idempotency_key:
+            raise
+        return Order.objects.get(user=user, idempotency_key=idempotency_key), False
+
+    if order is None:
+        # Raised outside the transaction so the repriced cart is kept.
+        raise StalePrices(stale)
+    return order, True
+
+
+def _check_current_prices(lines):
+    """Raise CartLimitExceeded unless every line, and the cart, fits the price columns at the current menu prices."""
+    prices = {line['menuitem_id']: line['quantity'] * line['menu_price'] for line in lines}
+    # reprice_carts leaves these lines at their old price, so they would never stop being stale.
+    too_large = sorted(menuitem_id for menuitem_id, price in prices.items() if price > MAX_PRICE)
+    if too_large:
+        raise CartLimitExceeded(
+            f'At the current menu prices the lines for menu items {too_large} would cost more than {MAX_PRICE}; '
+            f'lower their quantity.'
+        )
+    if sum(prices.values()) > MAX_PRICE:
+        raise CartLimitExceeded(f'At the current menu prices the cart total would exceed {MAX_PRICE}.')
+
+
+def _create_order(user, cart_items, lines, idempotency_key):
+    """Create the order and its items from the locked cart ``lines``, then empty the cart."""
+    # Summed by the database over the rows this transaction holds; SQLite returns the sum unquantized.
+    total = cart_items.aggregate(total=Sum('price'))['total'].quantize(CENTS)
+    order = Order.objects.create(
+        user=user,
+        delivery_crew_id=dispatch.crew_for_new_order(),
+        total=total,
+        date=datetime.date.today(),
+        idempotency_key=idempotency_key or None,
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            menuitem_id=line['menuitem_id'],
+            quantity=line['quantity'],
+            unit_price=line['unit_price'],
+            price=line['price'],
+        )
+        for line in lines
+    ])
+    Cart.objects.filter(id__in=[line['id'] for line in lines]).delete()
+    analytics.enqueue_record_order(order, lines)
+    events.publish_order(OrderEvent.CREATED, order)
+    return order
@@ -0,0 +1,55 @@
+"""
+SQLite connection setup used by DATABASES in settings.py.
+
+The database runs in WAL mode, so readers never block the writer and the
+writer never blocks readers. WAL is stored in the file itself and is set
+once by migration 0010_sqlite_wal rather than on connect, so opening a
+database (e.g. for a management command) never rewrites it. Connections
+apply the pragmas below. Transactions start with BEGIN IMMEDIATE and wait
+up to SQLITE_BUSY_TIMEOUT seconds for the write lock: a deferred
+transaction that reads first and then writes fails at once with
+"database is locked" when another writer got in between, whatever the
+timeout. Connections are kept for CONN_MAX_AGE seconds and
+health-checked before reuse.
+
+This module is imported by settings.py and must not import Django models.
+"""
+SQLITE_PRAGMAS = {
+    # Durable at every checkpoint; a power loss can only drop the last commits, never corrupt.
+    'synchronous': 'NORMAL',
+    # Negative sizes are KiB: 64 MiB of page cache per connection.
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+SQLITE_BUSY_TIMEOUT = 20
+CONN_MAX_AGE = 60
+
+
+def sqlite_database(name, replica_of=None, pragmas=None, busy_timeout=SQLITE_BUSY_TIMEOUT, conn_max_age=CONN_MAX_AGE):
+    """
+    Return a DATABASES entry for the SQLite file ``name``.
+
+    With ``replica_of`` (the primary's alias) the entry is a read-only
+    connection to the same file: queries that would write are rejected,
+    and tests reuse the primary's test database.
+    """
+    pragmas = {**SQLITE_PRAGMAS, **(pragmas or {})}
+    if replica_of:
+        pragmas['query_only'] = 'ON'
+    database = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': busy_timeout,
+            'init_command': ';'.join(f'PRAGMA {pragma}={value}' for pragma, value in pragmas.items()),
+        },
+    }
+    if replica_of:
+        database['TEST'] = {'MIRROR': replica_of}
+    else:
+        database['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+    return database
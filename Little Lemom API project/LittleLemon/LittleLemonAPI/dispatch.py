@@ -0,0 +1,171 @@
+"""
+Automatic delivery crew assignment.
+
+New orders go to the active "Delivery crew" member with the fewest open
+(undelivered) orders. Each process keeps those counts in a min-heap, so
+picking a member costs O(log n) and no aggregate query; the heap is
+reloaded from the database every DISPATCH_REFRESH_INTERVAL seconds and
+whenever group membership changes, which also picks up orders delivered
+or reassigned elsewhere and assignments made by other workers. Between
+reloads workers only see their own assignments, which keeps the load close
+to even but not exact; ``dispatch_backlog`` (the dispatch_orders command)
+evens it out.
+
+The membership signal only reaches the process that made the change, and
+deactivating a user sends none, so the member picked from the heap is
+confirmed with a primary key lookup before an order is given to them; a
+stale heap is reloaded on the spot.
+
+An order is only ever written with its crew once: checkout creates it
+assigned, and the backlog dispatcher locks the unassigned rows it moves.
+"""
+import heapq
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Q
+
+from . import analytics, events
+from .bulk import MAX_BULK_ORDERS
+from .models import Order, OrderEvent
+from .roles import DELIVERY_CREW
+
+# Seconds before a worker reloads open-order counts from the database.
+DISPATCH_REFRESH_INTERVAL = getattr(settings, 'DISPATCH_REFRESH_INTERVAL', 30)
+
+
+def open_orders_by_crew():
+    """{crew member id: number of undelivered orders} for every active delivery crew member."""
+    return dict(
+        User.objects.filter(groups__name=DELIVERY_CREW, is_active=True)
+        .annotate(open_orders=Count('delivery_crew', filter=Q(delivery_crew__status=False)))
+        .values_list('id', 'open_orders')
+    )
+
+
+class CrewDispatcher:
+    """Per-process min-heap of (open orders, crew member id)."""
+
+    def __init__(self, refresh_interval=DISPATCH_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.heap = []
+        self.loaded_at = None
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = None
+
+    def _load(self):
+        self.heap = [(count, crew_id) for crew_id, count in open_orders_by_crew().items()]
+        heapq.heapify(self.heap)
+        self.loaded_at = time.monotonic()
+
+    def reserve(self):
+        """Return the id of the least loaded crew member and count one more order for them, or None."""
+        with self.lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at > self.refresh_interval:
+                self._load()
+            if not self.heap:
+                return None
+            count, crew_id = self.heap[0]
+            heapq.heapreplace(self.heap, (count + 1, crew_id))
+            return crew_id
+
+
+dispatcher = CrewDispatcher()
+
+
+def crew_for_new_order():
+    """The crew member a new order goes to, or None when AUTO_DISPATCH_ORDERS is off or there is no crew."""
+    if not getattr(settings, 'AUTO_DISPATCH_ORDERS', True):
+        return None
+    for _ in range(2):
+        crew_id = dispatcher.reserve()
+        if crew_id is None or _is_active_crew(crew_id):
+            return crew_id
+        # Removed from the crew or deactivated, possibly by another worker.
+        dispatcher.invalidate()
+    return None
+
+
+def _is_active_crew(user_id):
+    return User.objects.filter(id=user_id, groups__name=DELIVERY_CREW, is_active=True).exists()
+
+
+def crew_changed(**kwargs):
+    """Signal receiver: reload the heap after group membership changes."""
+    dispatcher.invalidate()
+
+
+def _open_orders():
+    return Order.objects.select_for_update().filter(status=False)
+
+
+def _former_crew_orders(crew):
+    """Lock and return the open orders of users who are no longer delivery crew."""
+    return list(
+        _open_orders().filter(delivery_crew__isnull=False).exclude(delivery_crew_id__in=list(crew))
+        .order_by('date', 'id').values_list('id', 'delivery_crew_id')
+    )
+
+
+def _excess_orders(crew, target):
+    """Lock and return the newest open orders above ``target`` of each crew member."""
+    moved = []
+    for crew_id, count in crew.items():
+        if count > target:
+            moved += _open_orders().filter(delivery_crew_id=crew_id).order_by('-date', '-id').values_list(
+                'id', 'delivery_crew_id')[:count - target]
+            crew[crew_id] = target
+    return moved
+
+
+def dispatch_backlog(rebalance=False):
+    """
+    Assign every unassigned open order, oldest first, to the least loaded crew members.
+
+    With ``rebalance`` the newest open orders of members above the even
+    share, and the open orders of users no longer in the crew, are moved
+    as well. Runs in one transaction that locks the orders it moves, so
+    concurrent checkouts and manual assignments are never overwritten.
+    Returns {crew member id: orders assigned}.
+    """
+    with transaction.atomic():
+        crew = open_orders_by_crew()
+        if not crew:
+            return {}
+
+        backlog = list(
+            Order.objects.select_for_update()
+            .filter(status=False, delivery_crew__isnull=True)
+            .order_by('date', 'id')
+            .values_list('id', 'delivery_crew_id')
+        )
+        if rebalance:
+            backlog += _former_crew_orders(crew)
+            target = math.ceil((sum(crew.values()) + len(backlog)) / len(crew))
+            backlog += _excess_orders(crew, target)
+
+        heap = [(count, crew_id) for crew_id, count in crew.items()]
+        heapq.heapify(heap)
+        assignments = {}
+        for order_id, old_crew_id in backlog:
+            count, crew_id = heap[0]
+            heapq.heapreplace(heap, (count + 1, crew_id))
+            if crew_id != old_crew_id:
+                assignments.setdefault(crew_id, []).append((order_id, old_crew_id))
+
+        for crew_id, orders in assignments.items():
+            for start in range(0, len(orders), MAX_BULK_ORDERS):
+                chunk = orders[start:start + MAX_BULK_ORDERS]
+                Order.objects.filter(id__in=[order_id for order_id, _ in chunk]).update(delivery_crew_id=crew_id)
+                analytics.record_orders_change([(False, old_crew_id) for _, old_crew_id in chunk], {'delivery_crew_id': crew_id})
+                events.publish_orders(OrderEvent.UPDATED, [order_id for order_id, _ in chunk])
+
+    dispatcher.invalidate()
+    return {crew_id: len(orders) for crew_id, orders in assignments.items()}
@@ -0,0 +1,278 @@
+"""
+Server-sent events for order changes.
+
+Writers (checkout, order updates and deletes, bulk updates, the dispatcher)
+``publish`` an OrderEvent row in the transaction that changes the order,
+so every worker process, WSGI or ASGI, feeds the same log. Each ASGI
+process runs one poller task that reads the log after the last id it has
+seen and hands the events to its open streams; the number of queries does
+not depend on the number of connections. Writers in the same process wake
+the poller on commit, others are picked up within ORDER_EVENT_POLL_INTERVAL.
+
+Streams are indexed by audience, using the role rules of
+OrderQuerySet.visible_to: managers get every order, delivery crew the
+orders assigned to them and customers their own. An event is formatted
+once and put on the queue of each matching stream only. A stream whose
+queue fills up (a client that stopped reading) is closed; the client
+reconnects with Last-Event-ID and the missed events are replayed from
+the log, which keeps ORDER_EVENT_RETENTION seconds of history. Expired
+events are deleted by the writers, at most once a minute per process, so
+the log stays bounded with WSGI workers only or no stream open.
+
+Access is checked again every heartbeat interval, busy or idle: a stream
+whose client logged out, was deactivated or changed role is closed, and a
+reconnect gets the stream its current credentials allow.
+"""
+import asyncio
+import datetime
+import json
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Order, OrderEvent
+from .roles import is_manager, is_delivery_crew
+
+ORDER_EVENT_POLL_INTERVAL = getattr(settings, 'ORDER_EVENT_POLL_INTERVAL', 1.0)
+ORDER_EVENT_RETENTION = getattr(settings, 'ORDER_EVENT_RETENTION', 3600)
+# Seconds between comment lines that keep idle connections open through proxies.
+ORDER_EVENT_HEARTBEAT = getattr(settings, 'ORDER_EVENT_HEARTBEAT', 15)
+# Events a stream may fall behind before it is closed.
+STREAM_QUEUE_SIZE = 256
+POLL_BATCH = 500
+REPLAY_LIMIT = 1000
+RETRY_MS = 3000
+# Seconds between deletions of expired events by one process.
+PRUNE_INTERVAL = 60
+KEEPALIVE = ': keepalive\n\n'
+
+MANAGERS = ('managers',)
+
+ORDER_EVENT_FIELDS = ('id', 'user_id', 'delivery_crew_id', 'status', 'total', 'date')
+
+
+# ----- Publishing ----- #
+
+def _order_data(row):
+    # Same fields and formats as OrderSerializer, without the items.
+    return {
+        'id': row['id'],
+        'user': row['user_id'],
+        'delivery_crew': row['delivery_crew_id'],
+        'status': row['status'],
+        'total': str(row['total']),
+        'date': row['date'].isoformat() if isinstance(row['date'], datetime.date) else row['date'],
+    }
+
+
+def publish(kind, rows):
+    """
+    Log ``kind`` for every order in ``rows`` (dicts with ORDER_EVENT_FIELDS).
+
+    Call inside the transaction that changes the orders; streams in this
+    process are woken when it commits.
+    """
+    OrderEvent.objects.bulk_create([
+        OrderEvent(
+            kind=kind,
+            order_id=row['id'],
+            user_id=row['user_id'],
+            delivery_crew_id=row['delivery_crew_id'],
+            data={'id': row['id']} if kind == OrderEvent.DELETED else _order_data(row),
+        )
+        for row in rows
+    ])
+    _maybe_prune()
+    transaction.on_commit(broker.wake)
+
+
+def prune():
+    """Delete the events older than ORDER_EVENT_RETENTION. Returns how many were deleted."""
+    cutoff = timezone.now() - datetime.timedelta(seconds=ORDER_EVENT_RETENTION)
+    return OrderEvent.objects.filter(created_at__lt=cutoff).delete()[0]
+
+
+_pruned_at = None
+
+
+def _maybe_prune():
+    global _pruned_at
+    now = time.monotonic()
+    if _pruned_at is None or now - _pruned_at > PRUNE_INTERVAL:
+        _pruned_at = now
+        prune()
+
+
+def publish_order(kind, order):
+    publish(kind, [{field: getattr(order, field) for field in ORDER_EVENT_FIELDS}])
+
+
+def publish_orders(kind, order_ids):
+    """publish() for orders read back by id, after a bulk UPDATE."""
+    publish(kind, Order.objects.filter(id__in=order_ids).order_by('id').values(*ORDER_EVENT_FIELDS))
+
+
+# ----- Streaming ----- #
+
+def audience(user):
+    """The subscription key for ``user``, following OrderQuerySet.visible_to."""
+    if is_manager(user):
+        return MANAGERS
+    if is_delivery_crew(user):
+        return ('crew', user.id)
+    return ('user', user.id)
+
+
+def _audiences(row):
+    keys = [MANAGERS, ('user', row['user_id'])]
+    if row['delivery_crew_id'] is not None:
+        keys.append(('crew', row['delivery_crew_id']))
+    return keys
+
+
+def _message(row):
+    data = json.dumps(row['data'], cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f"id: {row['id']}\nevent: {row['kind']}\ndata: {data}\n\n"
+
+
+class Subscription:
+
+    def __init__(self, key, order_id=None):
+        self.key = key
+        self.order_id = order_id
+        self.queue = asyncio.Queue(STREAM_QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event_id, order_id, message):
+        if self.overflowed or (self.order_id is not None and order_id != self.order_id):
+            return
+        try:
+            self.queue.put_nowait((event_id, message))
+        except asyncio.QueueFull:
+            # Too slow: end the stream and let the client resume with Last-Event-ID.
+            self.overflowed = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class OrderEventBroker:
+    """Open streams of this process, by audience, fed by a single poller task."""
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.loop = None
+        self.poller = None
+        self.wakeup = None
+        self.last_id = None
+
+    def subscribe(self, key, order_id=None):
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            # First stream, or the previous loop is gone (tests run one loop per test).
+            self.subscriptions, self.loop, self.poller, self.last_id = {}, loop, None, None
+            self.wakeup = asyncio.Event()
+        subscription = Subscription(key, order_id)
+        self.subscriptions.setdefault(key, set()).add(subscription)
+        if self.poller is None or self.poller.done():
+            self.poller = loop.create_task(self._poll())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self.subscriptions.get(subscription.key)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscriptions[subscription.key]
+
+    def wake(self):
+        """Poll now instead of at the next interval; callable from any thread."""
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self.wakeup.set)
+            except RuntimeError:
+                pass  # the loop shut down meanwhile
+
+    def dispatch(self, rows):
+        """Fan ``rows`` (OrderEvent values) out to the matching streams."""
+        for row in rows:
+            message = _message(row)
+            for key in _audiences(row):
+                for subscription in self.subscriptions.get(key, ()):
+                    subscription.deliver(row['id'], row['order_id'], message)
+
+    async def _poll(self):
+        if self.last_id is None:
+            self.last_id = (await OrderEvent.objects.aaggregate(last=Max('id')))['last'] or 0
+        while self.subscriptions:
+            self.wakeup.clear()
+            rows = [
+                row async for row in OrderEvent.objects.filter(id__gt=self.last_id).order_by('id')
+                .values('id', 'kind', 'order_id', 'user_id', 'delivery_crew_id', 'data')[:POLL_BATCH]
+            ]
+            if rows:
+                self.last_id = rows[-1]['id']
+                self.dispatch(rows)
+            if len(rows) < POLL_BATCH:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), ORDER_EVENT_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+
+broker = OrderEventBroker()
+
+
+def _replay_queryset(key, order_id, after):
+    events = OrderEvent.objects.filter(id__gt=after)
+    if key[0] == 'user':
+        events = events.filter(user_id=key[1])
+    elif key[0] == 'crew':
+        events = events.filter(delivery_crew_id=key[1])
+    if order_id is not None:
+        events = events.filter(order_id=order_id)
+    return events.order_by('id').values('id', 'kind', 'data')[:REPLAY_LIMIT]
+
+
+async def stream(key, order_id=None, last_event_id=None, recheck=None):
+    """
+    The text/event-stream body for one client: replayed events after ``last_event_id``, then live ones.
+
+    ``recheck`` is awaited every ORDER_EVENT_HEARTBEAT seconds, busy or idle,
+    and returns the key the client is now entitled to (None when it no longer
+    is authenticated); the stream ends as soon as that differs from ``key``.
+    """
+    subscription = broker.subscribe(key, order_id)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        last = last_event_id
+        if last is not None:
+            async for row in _replay_queryset(key, order_id, last):
+                yield _message(row)
+                last = row['id']
+        recheck_at = time.monotonic() + ORDER_EVENT_HEARTBEAT
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.queue.get(), ORDER_EVENT_HEARTBEAT)
+            except asyncio.TimeoutError:
+                item = KEEPALIVE
+            # On a deadline rather than on timeouts, which a steady flow of events never hits.
+            if recheck is not None and time.monotonic() >= recheck_at:
+                if await recheck() != key:
+                    return
+                recheck_at = time.monotonic() + ORDER_EVENT_HEARTBEAT
+            if item is None:
+                return
+            if item is KEEPALIVE:
+                yield item
+                continue
+            event_id, message = item
+            # Live events already sent by the replay.
+            if last is None or event_id > last:
+                yield message
+    finally:
+        broker.unsubscribe(subscription)
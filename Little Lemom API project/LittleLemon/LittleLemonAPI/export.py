@@ -0,0 +1,105 @@
+import csv
+import json
+
+from django.db.models import Q
+from rest_framework.renderers import JSONRenderer
+
+from .models import Order, OrderItem
+
+# Orders fetched per query. Memory use depends on this, never on the size of the export.
+EXPORT_CHUNK_SIZE = 1000
+
+ORDER_FIELDS = ['id', 'user', 'delivery_crew', 'status', 'total', 'date']
+ITEM_FIELDS = ['id', 'menuitem', 'quantity', 'unit_price', 'price']
+CSV_HEADER = ORDER_FIELDS + [f'item_{name}' for name in ITEM_FIELDS]
+
+
+def order_chunks(start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield lists of orders (dicts shaped like OrderSerializer output) ordered by date and id.
+
+    Each chunk costs two short queries: the next ``chunk_size`` orders, found
+    by seeking past the last (date, id) of the previous chunk, and their items.
+    No database cursor stays open between chunks.
+    """
+    orders = Order.objects.order_by('date', 'id')
+    if start:
+        orders = orders.filter(date__gte=start)
+    if end:
+        orders = orders.filter(date__lte=end)
+
+    last = None
+    while True:
+        chunk = orders
+        if last is not None:
+            chunk = chunk.filter(Q(date__gt=last['date']) | Q(date=last['date'], id__gt=last['id']))
+        rows = list(chunk.values('id', 'user_id', 'delivery_crew_id', 'status', 'total', 'date')[:chunk_size])
+        if not rows:
+            return
+
+        items = {}
+        for item in (
+            OrderItem.objects.filter(order_id__in=[row['id'] for row in rows])
+            .order_by('order_id', 'id')
+            .values('order_id', 'id', 'menuitem_id', 'quantity', 'unit_price', 'price')
+        ):
+            items.setdefault(item['order_id'], []).append({
+                'id': item['id'],
+                'menuitem': item['menuitem_id'],
+                'quantity': item['quantity'],
+                'unit_price': str(item['unit_price']),
+                'price': str(item['price']),
+            })
+
+        yield [
+            {
+                'id': row['id'],
+                'user': row['user_id'],
+                'delivery_crew': row['delivery_crew_id'],
+                'status': row['status'],
+                'total': str(row['total']),
+                'date': row['date'].isoformat(),
+                'order_items': items.get(row['id'], []),
+            }
+            for row in rows
+        ]
+        last = rows[-1]
+        if len(rows) < chunk_size:
+            return
+
+
+def ndjson_lines(chunks):
+    """One JSON document per order, items nested."""
+    for chunk in chunks:
+        yield ''.join(json.dumps(order, separators=(',', ':')) + '\n' for order in chunk)
+
+
+class CSVRenderer(JSONRenderer):
+    """Lets clients send Accept: text/csv; only error responses are rendered (as JSON), rows are streamed."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(JSONRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class _Echo:
+    """File-like object for csv.writer that returns the line instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(chunks):
+    """One row per order item; an order without items gets a single row with empty item columns."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for chunk in chunks:
+        lines = []
+        for order in chunk:
+            head = [order[name] for name in ORDER_FIELDS]
+            for item in order['order_items'] or [None]:
+                lines.append(writer.writerow(head + ([item[name] for name in ITEM_FIELDS] if item else [''] * len(ITEM_FIELDS))))
+        yield ''.join(lines)
@@ -0,0 +1,290 @@
+"""
+Per-request timings and per-view latency histograms.
+
+request_metrics_middleware times every request into a histogram labelled
+with the view name and method. A sample of requests (METRICS_SAMPLE_RATE)
+is also broken down into phases:
+
+- db: every SQL query, on any connection (count and time)
+- auth, permissions, throttle: APIView.perform_authentication,
+  check_permissions/check_object_permissions and check_throttles
+- serialize: Serializer.data and the values() readers
+- render: Response.rendered_content
+
+Sampled requests feed per-phase histograms. Their Server-Timing header,
+which reveals query counts and phase durations, is only sent when DEBUG is
+on or to staff users and managers. An unsampled request costs two perf_counter() calls and one histogram
+update; the hooks below only do work while a sampled request is active,
+so leaving the middleware on with a low sample rate is cheap.
+
+Phases overlap: queries run while serializing count towards both db and
+serialize. Metrics are kept per process, like the auth cache counters;
+Prometheus scrapes each worker.
+"""
+import bisect
+import contextvars
+import functools
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+from rest_framework.views import APIView
+
+from .roles import is_manager
+
+# Seconds; Prometheus' default buckets.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+PHASES = ('auth', 'throttle', 'permissions', 'db', 'serialize', 'render')
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Phase durations of one sampled request."""
+
+    def __init__(self):
+        self.durations = {}
+        self.queries = 0
+        self._open = set()
+
+    def enter(self, phase):
+        # Nested timers of the same phase (a serializer inside a serializer) count once.
+        if phase in self._open:
+            return False
+        self._open.add(phase)
+        return True
+
+    def leave(self, phase, elapsed):
+        self._open.discard(phase)
+        self.durations[phase] = self.durations.get(phase, 0.0) + elapsed
+
+    def record_query(self, elapsed):
+        self.queries += 1
+        self.durations['db'] = self.durations.get('db', 0.0) + elapsed
+
+    def server_timing(self, total):
+        entries = []
+        for phase in PHASES:
+            if phase in self.durations:
+                entry = f'{phase};dur={self.durations[phase] * 1000:.2f}'
+                if phase == 'db':
+                    entry += f';desc="{self.queries} queries"'
+                entries.append(entry)
+        entries.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(entries)
+
+
+class _Timer:
+    __slots__ = ('phase', 'timings', 'start')
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        timings = _current.get()
+        if timings is not None and timings.enter(self.phase):
+            self.timings, self.start = timings, time.perf_counter()
+        else:
+            self.timings = None
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.leave(self.phase, time.perf_counter() - self.start)
+
+
+def timed(phase):
+    """Context manager adding its duration to ``phase`` of the current sampled request, if any."""
+    return _Timer(phase)
+
+
+class _Histograms:
+    """Thread-safe histograms keyed by metric name and label values."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, name, labels, buckets, value):
+        index = bisect.bisect_left(buckets, value)
+        with self.lock:
+            series = self.series.get((name, labels))
+            if series is None:
+                # One count per bucket plus +Inf, then the sum.
+                series = self.series[(name, labels)] = [buckets, [0] * (len(buckets) + 1), 0.0]
+            series[1][index] += 1
+            series[2] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {key: (buckets, list(counts), total) for key, (buckets, counts, total) in self.series.items()}
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+
+histograms = _Histograms()
+
+
+def record_request(view, method, total, timings):
+    labels = (('view', view), ('method', method))
+    histograms.observe('littlelemon_request_duration_seconds', labels, DURATION_BUCKETS, total)
+    if timings is not None:
+        histograms.observe('littlelemon_request_queries', labels, QUERY_BUCKETS, timings.queries)
+        for phase, elapsed in timings.durations.items():
+            histograms.observe('littlelemon_request_phase_seconds', labels + (('phase', phase),), DURATION_BUCKETS, elapsed)
+
+
+def _may_see_timings(request):
+    # The user DRF authenticated is set on the Django request too.
+    if settings.DEBUG:
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_authenticated and (user.is_staff or is_manager(user))
+
+
+def _view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response):
+    """Time every request; sample some for a phase breakdown and a Server-Timing header."""
+    sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 0.01)
+    server_timing = getattr(settings, 'METRICS_SERVER_TIMING', True)
+
+    def start():
+        sampled = sample_rate >= 1 or random.random() < sample_rate
+        timings = RequestTimings() if sampled else None
+        return timings, _current.set(timings), time.perf_counter()
+
+    def finish(request, response, timings, token, started, show_timings):
+        total = time.perf_counter() - started
+        _current.reset(token)
+        record_request(_view_label(request), request.method, total, timings)
+        if show_timings:
+            response['Server-Timing'] = timings.server_timing(total)
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            timings, token, started = start()
+            try:
+                response = await get_response(request)
+            except BaseException:
+                _current.reset(token)
+                raise
+            # Resolving a session user may query the database.
+            show_timings = timings is not None and server_timing and await sync_to_async(_may_see_timings)(request)
+            return finish(request, response, timings, token, started, show_timings)
+    else:
+        def middleware(request):
+            timings, token, started = start()
+            try:
+                response = get_response(request)
+            except BaseException:
+                _current.reset(token)
+                raise
+            show_timings = timings is not None and server_timing and _may_see_timings(request)
+            return finish(request, response, timings, token, started, show_timings)
+    return middleware
+
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper adding each query to the current sampled request."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.record_query(time.perf_counter() - started)
+
+
+def connection_created(sender, connection, **kwargs):
+    """connection_created receiver: time the queries of every database connection."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _timed_method(phase, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with timed(phase):
+            return method(*args, **kwargs)
+    wrapper.instrumented = True
+    return wrapper
+
+
+def install_drf_hooks():
+    """
+    Time the DRF request phases of every API view.
+
+    Function views (@api_view), generic views and djoser's views all run
+    through APIView, so its hooks are wrapped once instead of adding a base
+    class to each view. Safe to call more than once.
+    """
+    if getattr(APIView.check_throttles, 'instrumented', False):
+        return
+    APIView.perform_authentication = _timed_method('auth', APIView.perform_authentication)
+    APIView.check_permissions = _timed_method('permissions', APIView.check_permissions)
+    APIView.check_object_permissions = _timed_method('permissions', APIView.check_object_permissions)
+    APIView.check_throttles = _timed_method('throttle', APIView.check_throttles)
+    BaseSerializer.data = property(_timed_method('serialize', BaseSerializer.data.fget))
+    Response.rendered_content = property(_timed_method('render', Response.rendered_content.fget))
+
+
+# ----- Prometheus text format ----- #
+
+_HELP = {
+    'littlelemon_request_duration_seconds': 'Request duration by view and method.',
+    'littlelemon_request_phase_seconds': 'Time spent in each request phase (sampled requests).',
+    'littlelemon_request_queries': 'SQL queries per request (sampled requests).',
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(labels, extra=()):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels + extra) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def prometheus_text(counters=()):
+    """
+    The histograms (and ``counters``, (name, help, value) triples) in the
+    Prometheus text exposition format 0.0.4.
+    """
+    lines = []
+    for name, help_text, value in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter', f'{name} {_number(value)}']
+
+    series = histograms.snapshot()
+    for name in sorted({name for name, _ in series}):
+        lines += [f'# HELP {name} {_HELP.get(name, name)}', f'# TYPE {name} histogram']
+        for (series_name, labels), (buckets, counts, total) in sorted(series.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, (("le", bound),))} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{name}_bucket{_labels(labels, (("le", "+Inf"),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
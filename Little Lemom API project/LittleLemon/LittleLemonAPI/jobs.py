@@ -0,0 +1,145 @@
+"""
+A small job queue kept in the Job table; no broker needed.
+
+Request handlers ``enqueue`` work inside their own transaction, so a job
+exists exactly when the change that produced it commits. Workers (the
+run_jobs command) ``claim`` a batch: the rows are marked running under a
+lease that expires after JOB_LEASE_SECONDS, and a job whose worker died is
+claimed again once its lease has expired. Claiming locks the rows
+(SELECT .. FOR UPDATE SKIP LOCKED where supported; SQLite write
+transactions are already serialized), so two workers never hold the same
+job.
+
+A task runs in one transaction with the deletion of its job, which only
+succeeds while the worker still holds the lease. Database writes made by
+a task therefore happen exactly once, even if a job is retried or its
+lease expires mid-run. A failing task is retried with exponential backoff
+until max_attempts; after that the row is kept with status failed and the
+traceback in last_error.
+"""
+import datetime
+import os
+import socket
+import traceback
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+# Seconds a claimed job belongs to its worker.
+JOB_LEASE_SECONDS = getattr(settings, 'JOB_LEASE_SECONDS', 60)
+# Seconds before the first retry, doubled for each further attempt up to JOB_MAX_RETRY_DELAY.
+JOB_RETRY_DELAY = getattr(settings, 'JOB_RETRY_DELAY', 5)
+JOB_MAX_RETRY_DELAY = getattr(settings, 'JOB_MAX_RETRY_DELAY', 3600)
+
+DONE = 'done'
+RETRY = 'retry'
+FAILED = 'failed'
+LOST = 'lost'
+
+_tasks = {}
+
+
+class UnknownTask(Exception):
+    """Raised when enqueueing or running a job whose task is not registered."""
+
+
+class LeaseLost(Exception):
+    """The job's lease expired and another worker claimed it."""
+
+
+def task(name):
+    """Register the decorated ``func(payload)`` as the task run for jobs called ``name``."""
+    def register(func):
+        _tasks[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=5):
+    """Add a job. Call inside the transaction of the change it follows up on."""
+    if name not in _tasks:
+        raise UnknownTask(name)
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def claim(worker, limit=10, lease=JOB_LEASE_SECONDS):
+    """Lease up to ``limit`` due jobs (oldest first) to ``worker`` and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=Job.PENDING, run_at__lte=now) | Q(status=Job.RUNNING, lease_expires_at__lt=now))
+            .order_by('run_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids).update(
+            status=Job.RUNNING,
+            lease_owner=worker,
+            lease_expires_at=now + datetime.timedelta(seconds=lease),
+            attempts=F('attempts') + 1,
+        )
+        return list(Job.objects.filter(id__in=ids).order_by('run_at', 'id'))
+
+
+def _release(job, worker, error):
+    """Schedule a retry of a failed job, or mark it failed once it has no attempts left."""
+    if job.attempts >= job.max_attempts:
+        changes = {'status': Job.FAILED}
+    else:
+        delay = min(JOB_RETRY_DELAY * 2 ** (job.attempts - 1), JOB_MAX_RETRY_DELAY)
+        changes = {'status': Job.PENDING, 'run_at': timezone.now() + datetime.timedelta(seconds=delay)}
+    Job.objects.filter(id=job.id, lease_owner=worker, status=Job.RUNNING).update(
+        lease_owner='', lease_expires_at=None, last_error=error, **changes,
+    )
+    return FAILED if changes['status'] == Job.FAILED else RETRY
+
+
+def run_job(job, worker):
+    """Run one claimed job. Returns DONE, RETRY, FAILED or LOST."""
+    if job.attempts > job.max_attempts:
+        # Its earlier workers died holding the lease.
+        return _release(job, worker, f'Lease expired {job.attempts - 1} times.')
+
+    try:
+        func = _tasks.get(job.name)
+        if func is None:
+            raise UnknownTask(job.name)
+        with transaction.atomic():
+            func(job.payload)
+            deleted, _ = Job.objects.filter(id=job.id, lease_owner=worker, status=Job.RUNNING).delete()
+            if not deleted:
+                raise LeaseLost()
+    except LeaseLost:
+        return LOST
+    except Exception:
+        return _release(job, worker, traceback.format_exc())
+    return DONE
+
+
+def run_pending(worker=None, batch=10):
+    """Run due jobs until none is left. Returns {outcome: count}."""
+    worker = worker or worker_id()
+    outcomes = {}
+    while True:
+        jobs = claim(worker, batch)
+        if not jobs:
+            return outcomes
+        for job in jobs:
+            outcome = run_job(job, worker)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
@@ -0,0 +1,119 @@
+import contextlib
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from LittleLemonAPI import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large dataset and report throughput, latency percentiles and query counts '
+        'for every API endpoint. Seed data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--menu-items', type=int, default=10_000)
+        parser.add_argument('--users', type=int, default=50_000)
+        parser.add_argument('--orders', type=int, default=1_000_000)
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint and mode.')
+        parser.add_argument('--mode', choices=['in-process', 'wsgi', 'asgi', 'all'], default='all')
+        parser.add_argument('--only', help='Run only endpoints whose name contains this text.')
+        parser.add_argument('--save', type=Path, help='Write the results to this JSON baseline.')
+        parser.add_argument('--compare', type=Path, help='Fail if results regress against this JSON baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 slowdown (0.25 = 25%%).')
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Also replay the read endpoints with this many requests in flight (needs --commit-seed).',
+        )
+        parser.add_argument(
+            '--contend-stores', action='store_true',
+            help='Keep the SQLite caches and throttle store busy from another connection during the concurrent runs.',
+        )
+        parser.add_argument(
+            '--commit-seed', action='store_true',
+            help='Keep the seed data instead of rolling it back. Use a scratch database.',
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] > 1 and not options['commit_seed']:
+            raise CommandError(
+                'Concurrent workers use their own database connections and cannot see a rolled-back seed; '
+                'pass --commit-seed and run against a scratch database.'
+            )
+
+        with benchmark.benchmark_environment():
+            if options['commit_seed']:
+                dataset = benchmark.seed(
+                    options['menu_items'], options['users'], options['orders'], log=self.stdout.write
+                )
+                results = self.run(dataset, options)
+            else:
+                with transaction.atomic():
+                    dataset = benchmark.seed(
+                        options['menu_items'], options['users'], options['orders'], log=self.stdout.write
+                    )
+                    results = self.run(dataset, options)
+                    transaction.set_rollback(True)
+
+        if options['save']:
+            options['save'].write_text(json.dumps(results, indent=2))
+            self.stdout.write(f'\nBaseline written to {options["save"]}')
+
+        if options['compare']:
+            regressions = benchmark.compare(results, json.loads(options['compare'].read_text()), options['tolerance'])
+            if regressions:
+                raise CommandError('Performance regressions:\n' + '\n'.join(regressions))
+            self.stdout.write(f'\nNo regressions against {options["compare"]}')
+
+    def run(self, dataset, options):
+        results = {}
+        drivers = [benchmark.InProcessDriver(dataset), benchmark.WSGIDriver(dataset), benchmark.ASGIDriver(dataset)]
+        if options['mode'] != 'all':
+            drivers = [d for d in drivers if d.mode == options['mode']]
+
+        for driver in drivers:
+            self.stdout.write(f'\n{driver.mode}')
+            self.stdout.write(
+                f'{"endpoint":<30}{"status":>7}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}'
+            )
+            results[driver.mode] = {}
+            for endpoint in benchmark.endpoints(dataset):
+                if options['only'] and options['only'] not in endpoint.name:
+                    continue
+                stats = benchmark.measure(driver, endpoint, options['requests'])
+                results[driver.mode][endpoint.name] = stats
+                self.stdout.write(
+                    f'{endpoint.name:<30}{stats["status"]:>7}{stats["throughput_rps"]:>9}'
+                    f'{stats["p50_ms"]:>9}{stats["p95_ms"]:>9}{stats["p99_ms"]:>9}{stats["queries"]:>9}'
+                )
+
+        if options['concurrency'] > 1:
+            with benchmark.store_contention() if options['contend_stores'] else contextlib.nullcontext():
+                self.run_concurrent(dataset, drivers, options, results)
+        return results
+
+    def run_concurrent(self, dataset, drivers, options, results):
+        for driver in drivers:
+            self.stdout.write(f'\n{driver.mode}, {options["concurrency"]} concurrent requests')
+            self.stdout.write(
+                f'{"endpoint":<30}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"lag p99":>9}{"lag max":>9}'
+            )
+            key = f'{driver.mode} x{options["concurrency"]}'
+            results[key] = {}
+            for endpoint in benchmark.endpoints(dataset):
+                if endpoint.method != 'get' or (options['only'] and options['only'] not in endpoint.name):
+                    continue
+                if endpoint.before:
+                    endpoint.before()
+                stats = benchmark.measure_concurrent(
+                    driver, endpoint, options['requests'], options['concurrency']
+                )
+                results[key][endpoint.name] = stats
+                self.stdout.write(
+                    f'{endpoint.name:<30}{stats["throughput_rps"]:>9}'
+                    f'{stats["p50_ms"]:>9}{stats["p95_ms"]:>9}{stats["p99_ms"]:>9}'
+                    f'{stats.get("loop_lag_p99_ms", ""):>9}{stats.get("loop_lag_max_ms", ""):>9}'
+                )
@@ -0,0 +1,61 @@
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from LittleLemonAPI import benchmark
+from LittleLemonAPI.models import MenuItem, Order
+from LittleLemonAPI.renderers import FastJSONParser, FastJSONRenderer, orjson
+from LittleLemonAPI.serializers import MenuItemSerializer, OrderSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSONRenderer/JSONParser with the orjson-backed FastJSONRenderer/FastJSONParser "
+        'on OrderSerializer and MenuItemSerializer output. Seed data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000, help='Orders in the serialized payload.')
+        parser.add_argument('--menu-items', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write('orjson is not installed: the fast classes fall back to the stdlib path.')
+
+        with transaction.atomic():
+            benchmark.seed(options['menu_items'], users=50, orders=options['orders'], items_per_order=3)
+            payloads = {
+                'orders': OrderSerializer(Order.objects.with_details().order_by('-id')[:options['orders']], many=True).data,
+                'menu-items': MenuItemSerializer(MenuItem.objects.order_by('-id')[:options['menu_items']], many=True).data,
+            }
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{"payload":<12}{"bytes":>10}{"render ms":>11}{"fast ms":>9}{"parse ms":>10}{"fast ms":>9}')
+        for name, data in payloads.items():
+            body = JSONRenderer().render(data)
+            if FastJSONRenderer().render(data) != body:
+                raise CommandError(f'{name}: FastJSONRenderer output differs from JSONRenderer')
+            if FastJSONParser().parse(io.BytesIO(body)) != JSONParser().parse(io.BytesIO(body)):
+                raise CommandError(f'{name}: FastJSONParser result differs from JSONParser')
+
+            render_ms = self.time(lambda: JSONRenderer().render(data), options['repeat'])
+            fast_render_ms = self.time(lambda: FastJSONRenderer().render(data), options['repeat'])
+            parse_ms = self.time(lambda: JSONParser().parse(io.BytesIO(body)), options['repeat'])
+            fast_parse_ms = self.time(lambda: FastJSONParser().parse(io.BytesIO(body)), options['repeat'])
+            self.stdout.write(
+                f'{name:<12}{len(body):>10}{render_ms:>11.2f}{fast_render_ms:>9.2f}{parse_ms:>10.2f}{fast_parse_ms:>9.2f}'
+            )
+
+    def time(self, func, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
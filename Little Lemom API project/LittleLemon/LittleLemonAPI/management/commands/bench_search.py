@@ -0,0 +1,67 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from LittleLemonAPI.models import Category, MenuItem
+from LittleLemonAPI.search import full_text_search
+
+WORDS = [
+    'lemon', 'chicken', 'greek', 'salad', 'bruschetta', 'grilled', 'fish', 'pasta', 'basil',
+    'tomato', 'feta', 'olive', 'lamb', 'souvlaki', 'garlic', 'bread', 'cake', 'honey',
+    'yogurt', 'spinach', 'pie', 'roasted', 'pepper', 'mint', 'orange', 'almond', 'rice',
+]
+
+TERMS = ['lemon', 'chick', 'greek salad', 'souv', 'honey cake']
+
+
+class Command(BaseCommand):
+    help = 'Compare LIKE search with the FTS5 index on a seeded menu. Seed data is rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['items'])
+            self.stdout.write(f'{"term":<14}{"matches":>9}{"LIKE ms":>10}{"FTS ms":>10}{"ranked ms":>11}')
+            for term in TERMS:
+                like = MenuItem.objects.filter(title__icontains=term).order_by('title')
+                fts = full_text_search(MenuItem.objects.all(), [term], rank=False).order_by('title')
+                ranked = full_text_search(MenuItem.objects.all(), [term])
+                like_ms = self.time(like, options['repeat'])
+                fts_ms = self.time(fts, options['repeat'])
+                ranked_ms = self.time(ranked, options['repeat'])
+                self.stdout.write(f'{term:<14}{fts.count():>9}{like_ms:>10.2f}{fts_ms:>10.2f}{ranked_ms:>11.2f}')
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        rng = random.Random(42)
+        categories = Category.objects.bulk_create([
+            Category(slug=f'bench-{i}', title=f'{rng.choice(WORDS).title()} dishes') for i in range(20)
+        ])
+        MenuItem.objects.bulk_create(
+            (
+                MenuItem(
+                    title=' '.join(rng.sample(WORDS, 3)).title(),
+                    price=rng.randint(100, 5000) / 100,
+                    featured=rng.random() < 0.1,
+                    category=rng.choice(categories),
+                )
+                for _ in range(count)
+            ),
+            batch_size=5000,
+        )
+
+    def time(self, queryset, repeat):
+        """Median time to count the matches and fetch the first page, as the list endpoint does."""
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset.count()
+            list(queryset[:10])
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
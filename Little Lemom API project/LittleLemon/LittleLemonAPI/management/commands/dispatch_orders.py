@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI import dispatch
+
+
+class Command(BaseCommand):
+    help = 'Assign every unassigned open order to the least loaded delivery crew members.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebalance', action='store_true',
+            help='Also move the newest open orders of overloaded members and of users no longer in the crew.',
+        )
+
+    def handle(self, *args, **options):
+        assigned = dispatch.dispatch_backlog(rebalance=options['rebalance'])
+        self.stdout.write(f'Assigned {sum(assigned.values())} orders to {len(assigned)} delivery crew members.')
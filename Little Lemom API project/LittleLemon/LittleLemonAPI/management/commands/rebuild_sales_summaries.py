@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI import analytics
+from LittleLemonAPI.models import DailySales, MenuItemSales, DeliveryCrewSummary
+
+
+class Command(BaseCommand):
+    help = 'Recompute the sales summary tables behind /api/analytics from Order and OrderItem.'
+
+    def handle(self, *args, **options):
+        analytics.rebuild()
+        self.stdout.write(
+            f'Rebuilt {DailySales.objects.count()} days, {MenuItemSales.objects.count()} menu items '
+            f'and {DeliveryCrewSummary.objects.count()} delivery crew summaries.'
+        )
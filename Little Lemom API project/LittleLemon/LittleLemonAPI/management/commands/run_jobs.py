@@ -0,0 +1,67 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from LittleLemonAPI import jobs
+
+
+def work(stop, batch, poll, lease):
+    """Worker loop: claim and run jobs until ``stop`` is set, sleeping ``poll`` seconds when idle."""
+    worker = jobs.worker_id()
+    while not stop.is_set():
+        claimed = jobs.claim(worker, batch, lease)
+        if not claimed:
+            stop.wait(poll)
+            continue
+        for job in claimed:
+            jobs.run_job(job, worker)
+
+
+def _child(stop, batch, poll, lease):
+    # The parent turns Ctrl-C and SIGTERM into ``stop``; workers finish their batch.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    try:
+        work(stop, batch, poll, lease)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the Job table in one or more worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--batch', type=int, default=10, help='Jobs claimed at a time by each worker.')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds an idle worker waits before polling again.')
+        parser.add_argument('--lease', type=int, default=jobs.JOB_LEASE_SECONDS, help='Seconds a worker may hold a job.')
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are due, then exit.')
+
+    def handle(self, *args, **options):
+        if options['processes'] < 1 or options['batch'] < 1:
+            raise CommandError('--processes and --batch must be at least 1.')
+
+        if options['once']:
+            outcomes = jobs.run_pending(batch=options['batch'])
+            self.stdout.write(', '.join(f'{count} {outcome}' for outcome, count in sorted(outcomes.items())) or 'No jobs due.')
+            return
+
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+
+        # Forked workers must open their own database connections.
+        connections.close_all()
+        processes = [
+            context.Process(target=_child, args=(stop, options['batch'], options['poll'], options['lease']), daemon=True)
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Started {len(processes)} job workers.')
+        for process in processes:
+            process.join()
+        self.stdout.write('Job workers stopped.')
@@ -0,0 +1,20 @@
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+from .routers import use_primary
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+@sync_and_async_middleware
+def primary_database_middleware(get_response):
+    """Pin requests that may write (POST, PUT, PATCH, DELETE) to the primary database."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with use_primary(request.method not in SAFE_METHODS):
+                return await get_response(request)
+    else:
+        def middleware(request):
+            with use_primary(request.method not in SAFE_METHODS):
+                return get_response(request)
+    return middleware
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:20
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0008_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('order_id', models.IntegerField()),
+                ('user_id', models.IntegerField()),
+                ('delivery_crew_id', models.IntegerField(null=True)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_id', 'id'], name='orderevent_user_idx'), models.Index(fields=['delivery_crew_id', 'id'], name='orderevent_crew_idx')],
+            },
+        ),
+    ]
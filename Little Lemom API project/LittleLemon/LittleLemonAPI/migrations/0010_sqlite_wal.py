@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def use_wal(apps, schema_editor):
+    # WAL is stored in the database file, so it is set once here rather than on every connection.
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+
+
+def use_rollback_journal(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=DELETE')
+
+
+class Migration(migrations.Migration):
+    # The journal mode cannot change inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('LittleLemonAPI', '0009_order_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(use_wal, use_rollback_journal),
+    ]
@@ -1,5 +1,7 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 # Create your models here.
@@ -28,12 +30,49 @@ class Cart(models.Model):
     def __str__(self):
         return self.user
 
+class OrderQuerySet(models.QuerySet):
+    def with_details(self):
+        """Join the users and prefetch the items so serializing a page costs a fixed number of queries."""
+        return self.select_related('user', 'delivery_crew').prefetch_related('order_items')
+
+    def filter_status(self, status_filter):
+        """Apply the ?status= query parameter ('true'/'1' or anything else for false) if given."""
+        if status_filter is None:
+            return self
+        return self.filter(status=status_filter.lower() in ['true', '1'])
+
+    def visible_to(self, user):
+        """Managers see every order, delivery crew their assigned orders, customers their own."""
+        from .roles import is_manager, is_delivery_crew
+
+        if is_manager(user):
+            return self.all()
+        if is_delivery_crew(user):
+            return self.filter(delivery_crew=user)
+        return self.filter(user=user)
+
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='delivery_crew',null=True)
     status = models.BooleanField(db_index=True, default=0)
     total = models.DecimalField(max_digits=6, decimal_places=2)
     date = models.DateField(db_index=True)
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_order_idempotency_key'),
+        ]
+        # Match the orders_list access paths: filter by role column, optionally by status, newest first.
+        indexes = [
+            models.Index(fields=['user', 'date'], name='order_user_date_idx'),
+            models.Index(fields=['user', 'status', 'date'], name='order_user_status_date_idx'),
+            models.Index(fields=['delivery_crew', 'date'], name='order_crew_date_idx'),
+            models.Index(fields=['delivery_crew', 'status', 'date'], name='order_crew_status_date_idx'),
+            models.Index(fields=['status', 'date'], name='order_status_date_idx'),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE,  related_name='order_items')# Allows you to use order.order_items in serializers
@@ -43,4 +82,80 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=6, decimal_places=2)
 
     class Meta:
-        unique_together = ('order', 'menuitem')
\ No newline at end of file
+        unique_together = ('order', 'menuitem')
+
+# ----- Sales summaries (maintained incrementally by LittleLemonAPI.analytics) -----
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+class OrderStatusSummary(models.Model):
+    status = models.BooleanField(unique=True)
+    orders = models.IntegerField(default=0)
+
+class MenuItemSales(models.Model):
+    menuitem = models.OneToOneField(MenuItem, on_delete=models.CASCADE, related_name='sales')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-quantity'], name='menuitemsales_quantity_idx'),
+            models.Index(fields=['-revenue'], name='menuitemsales_revenue_idx'),
+        ]
+
+class DeliveryCrewSummary(models.Model):
+    delivery_crew = models.OneToOneField(User, on_delete=models.CASCADE, related_name='delivery_summary')
+    assigned = models.IntegerField(default=0)
+    delivered = models.IntegerField(default=0)
+
+# ----- Order change log read by the event stream (LittleLemonAPI.events) -----
+
+class OrderEvent(models.Model):
+    CREATED = 'order.created'
+    UPDATED = 'order.updated'
+    DELETED = 'order.deleted'
+
+    kind = models.CharField(max_length=20)
+    # Plain ids rather than foreign keys: events outlive deleted orders and users.
+    order_id = models.IntegerField()
+    user_id = models.IntegerField()
+    delivery_crew_id = models.IntegerField(null=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        # Last-Event-ID replays: every event after an id, for one customer or one crew member.
+        indexes = [
+            models.Index(fields=['user_id', 'id'], name='orderevent_user_idx'),
+            models.Index(fields=['delivery_crew_id', 'id'], name='orderevent_crew_idx'),
+        ]
+
+# ----- Background jobs (run by LittleLemonAPI.jobs / the run_jobs command) -----
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.SmallIntegerField(default=0)
+    max_attempts = models.SmallIntegerField(default=5)
+    # Set while a worker holds the job; another worker may take it once the lease expires.
+    lease_owner = models.CharField(max_length=64, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Workers claim by (status, run_at) for pending jobs and (status, lease_expires_at) for abandoned ones.
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+            models.Index(fields=['status', 'lease_expires_at'], name='job_status_lease_idx'),
+        ]
@@ -0,0 +1,90 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# Orderings the keyset paginator can seek on. 'id' is always added as the tiebreaker.
+CURSOR_ORDERINGS = ['-date', 'date', '-total', 'total', '-id', 'id']
+
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(Exception):
+    """Raised for a cursor that cannot be decoded or does not match the ordering."""
+
+
+def encode_cursor(ordering, value, pk):
+    payload = json.dumps([ordering, value, pk], default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor, ordering, model):
+    """
+    Return the (value, pk) a cursor seeks past, converted with the model fields.
+
+    Cursors come back from clients, so a value the field cannot hold (e.g. a
+    tampered date) is an InvalidCursor rather than an error in the query.
+    """
+    try:
+        cursor_ordering, value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if cursor_ordering != ordering:
+            raise InvalidCursor()
+        field = model._meta.get_field(ordering.lstrip('-'))
+        value = field.to_python(value)
+        pk = model._meta.pk.to_python(pk)
+    except (ValueError, TypeError, ValidationError):
+        raise InvalidCursor()
+    if value is None or pk is None:
+        raise InvalidCursor()
+    return value, pk
+
+
+def _seek(queryset, ordering, cursor):
+    descending = ordering.startswith('-')
+    field = ordering.lstrip('-')
+    tiebreak = '-id' if descending else 'id'
+    order_by = [ordering] if field == 'id' else [ordering, tiebreak]
+    queryset = queryset.order_by(*order_by)
+
+    if cursor:
+        value, pk = decode_cursor(cursor, ordering, queryset.model)
+        lookup = 'lt' if descending else 'gt'
+        if field == 'id':
+            queryset = queryset.filter(**{f'id__{lookup}': pk})
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': pk})
+            )
+    return queryset
+
+
+def _page(rows, ordering, page_size):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        field = ordering.lstrip('-')
+        if isinstance(last, dict):  # values() rows
+            next_cursor = encode_cursor(ordering, last[field], last['id'])
+        else:
+            next_cursor = encode_cursor(ordering, getattr(last, field), last.pk)
+    return rows, next_cursor
+
+
+def paginate_by_cursor(queryset, ordering, cursor, page_size):
+    """
+    Return (rows, next_cursor) for one page of ``queryset`` ordered by ``ordering``.
+
+    Pages are found by seeking past the last row of the previous page
+    (WHERE field > value OR (field = value AND id > pk)) instead of OFFSET,
+    and no COUNT(*) is run, so deep pages cost the same as the first one.
+    """
+    queryset = _seek(queryset, ordering, cursor)
+    return _page(list(queryset[:page_size + 1]), ordering, page_size)
+
+
+async def apaginate_by_cursor(queryset, ordering, cursor, page_size):
+    """Async variant of paginate_by_cursor for the ASGI views."""
+    queryset = _seek(queryset, ordering, cursor)
+    return _page([row async for row in queryset[:page_size + 1]], ordering, page_size)
@@ -1,11 +1,12 @@
 from rest_framework import permissions
-from django.contrib.auth.models import Group
+
+from .roles import is_manager
 
 class IsManager(permissions.BasePermission):
     """Allow only users in the 'Manager' group to modify menu items."""
 
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.groups.filter(name="Manager").exists()
+        return request.user.is_authenticated and is_manager(request.user)
 
 
 # class IsCustomerOrDelivery(permissions.BasePermission):
@@ -15,4 +16,4 @@ class IsManager(permissions.BasePermission):
 #         return request.user.is_authenticated and (
 #             request.user.groups.filter(name="Customer").exists() or
 #             request.user.groups.filter(name="Delivery Crew").exists()
-#         )
\ No newline at end of file
+#         )
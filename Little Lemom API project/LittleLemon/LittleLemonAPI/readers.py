@@ -0,0 +1,142 @@
+"""
+Read-only fast path for GET list/retrieve.
+
+A ValuesReader is compiled once from a ModelSerializer class: every field
+becomes a (key, column, mapper) entry and a nested many=True serializer
+over a reverse foreign key becomes one extra query. Responses are then
+built straight from ``.values()`` rows, skipping model instances and the
+per-field dispatch of Serializer.to_representation, with exactly the
+JSON the serializer would produce. Writes keep using the serializers.
+"""
+import functools
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.http import Http404
+from django.utils.functional import cached_property
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .instrumentation import timed
+
+# Fields whose to_representation returns the database value unchanged.
+_PASSTHROUGH = (serializers.IntegerField, serializers.BooleanField, serializers.CharField)
+
+
+class ValuesReader:
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+
+    @cached_property
+    def plan(self):
+        """(fields, nested): fields are (key, column, mapper), nested are (key, reader, foreign key column)."""
+        fields, nested = [], []
+        for key, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if '.' in field.source or field.source == '*':
+                raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{key}: dotted sources are not supported.')
+            if isinstance(field, serializers.ListSerializer):
+                relation = self.model._meta.get_field(field.source)
+                nested.append((key, reader_for(type(field.child)), relation.field.attname))
+            elif isinstance(field, serializers.BaseSerializer):
+                raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{key}: only many=True nesting is supported.')
+            elif isinstance(field, (serializers.PrimaryKeyRelatedField, *_PASSTHROUGH)):
+                # A related field renders the raw foreign key, like PKOnlyObject.pk.
+                fields.append((key, self.model._meta.get_field(field.source).attname, None))
+            else:
+                fields.append((key, self.model._meta.get_field(field.source).attname, field.to_representation))
+        return fields, nested
+
+    def values(self, queryset, *extra):
+        """``queryset`` as the rows this reader consumes."""
+        fields, nested = self.plan
+        columns = [column for _, column, _ in fields] + list(extra)
+        if nested and 'id' not in columns:
+            columns.append('id')
+        return queryset.values(*columns)
+
+    def _children(self, ids):
+        # Same filter as prefetch_related, so children come back in the same order.
+        for key, reader, fk in self.plan[1]:
+            yield key, reader, fk, reader.values(reader.model._default_manager.filter(**{f'{fk}__in': ids}), fk)
+
+    def _represent(self, rows, children):
+        with timed('serialize'):
+            return self._build(rows, children)
+
+    def _build(self, rows, children):
+        fields, nested = self.plan
+        data = []
+        for row in rows:
+            item = {}
+            for key, column, mapper in fields:
+                value = row[column]
+                item[key] = value if mapper is None or value is None else mapper(value)
+            for key, _, _ in nested:
+                item[key] = children[key].get(row['id'], [])
+            data.append(item)
+        return data
+
+    def _group(self, rows, fk):
+        grouped = {}
+        for row, item in zip(rows, self.to_representation(rows)):
+            grouped.setdefault(row[fk], []).append(item)
+        return grouped
+
+    def to_representation(self, rows):
+        """Serialize rows (or a queryset from ``values()``) exactly as many=True would."""
+        rows = list(rows)
+        children = {}
+        if self.plan[1]:
+            for key, reader, fk, queryset in self._children([row['id'] for row in rows]):
+                children[key] = reader._group(list(queryset) if rows else [], fk)
+        return self._represent(rows, children)
+
+    async def ato_representation(self, rows):
+        """Async variant of to_representation; ``rows`` may be a list or a queryset from ``values()``."""
+        if not isinstance(rows, list):
+            rows = [row async for row in rows]
+        children = {}
+        if self.plan[1]:
+            for key, reader, fk, child_queryset in self._children([row['id'] for row in rows]):
+                children[key] = reader._group([row async for row in child_queryset] if rows else [], fk)
+        return self._represent(rows, children)
+
+
+@functools.cache
+def reader_for(serializer_class):
+    """The shared ValuesReader of ``serializer_class``."""
+    return ValuesReader(serializer_class)
+
+
+class ValuesReadMixin:
+    """
+    Serve list/retrieve of a generic view through the ValuesReader of its serializer.
+
+    Filtering, pagination and permissions run as usual; object permissions
+    receive the row dict instead of a model instance.
+    """
+
+    def list(self, request, *args, **kwargs):
+        reader = reader_for(self.get_serializer_class())
+        queryset = reader.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.to_representation(page))
+        return Response(reader.to_representation(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        reader = reader_for(self.get_serializer_class())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            rows = list(reader.values(queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}))[:1])
+        except (TypeError, ValueError, ValidationError):
+            # A lookup value the field cannot hold (e.g. /menu-items/abc), as in DRF's get_object_or_404.
+            rows = []
+        if not rows:
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        self.check_object_permissions(request, rows[0])
+        return Response(reader.to_representation(rows)[0])
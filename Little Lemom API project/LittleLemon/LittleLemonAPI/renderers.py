@@ -0,0 +1,80 @@
+"""
+orjson-backed drop-in replacements for DRF's JSONRenderer and JSONParser.
+
+Output is byte-for-byte what JSONRenderer produces with the default
+UNICODE_JSON/COMPACT_JSON/STRICT_JSON settings. Anything orjson would
+write differently falls back to the stdlib path:
+
+- indented output (?indent= in Accept, browsable API) and non-default settings
+- ints beyond 64 bits, lone surrogates and other values orjson rejects
+- floats json writes in exponent form (orjson writes 1e16 and 0.00001
+  where json writes 1e+16 and 1e-05)
+
+Decimal, Promise and other non-JSON types go through DRF's encoder, and
+datetimes are passed to it as well so they keep its 'Z' suffix. The one
+known difference: non-finite floats render as null instead of raising.
+
+orjson is optional; without it both classes behave exactly like DRF's.
+"""
+import codecs
+import io
+import re
+
+from rest_framework.parsers import JSONParser, get_encoding
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+# Floats orjson formats differently from json: an exponent (orjson always
+# writes a lowercase 'e') or a plain number below 1e-4. Both checks may also
+# match inside strings, which only costs a fallback; they are kept to a
+# literal-led regex and a substring test because scanning is on the hot path.
+_EXPONENT = re.compile(rb'e[-\d]')
+_SMALL_FLOAT = b'0.0000'
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None
+            or self.ensure_ascii or not self.compact or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=DUMPS_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if _SMALL_FLOAT in ret or _EXPONENT.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same JavaScript-safe escaping as JSONRenderer.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        if orjson is None or not self.strict or codecs.lookup(get_encoding(parser_context)).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # Let JSONParser accept what orjson is stricter about (huge ints, lone
+            # surrogates) or raise its usual ParseError.
+            return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.contrib.auth.models import User, Group
+from django.core.cache import caches
+
+MANAGER = "Manager"
+DELIVERY_CREW = "Delivery crew"
+
+# Cache holding each user's group names. Every worker must see an
+# invalidation, so multi-process deployments need a shared backend here.
+ROLE_CACHE_ALIAS = getattr(settings, 'ROLE_CACHE_ALIAS', 'default')
+
+
+def _cache_key(user_id):
+    return f'roles:{user_id}'
+
+
+def _ttl():
+    # Seconds a user's group names stay cached; read per call so override_settings applies.
+    return getattr(settings, 'ROLE_CACHE_TTL', 300)
+
+
+def get_roles(user):
+    """
+    Return the set of group names the user belongs to.
+
+    The result is memoised on the user object for the rest of the request
+    and kept in the cache for ROLE_CACHE_TTL seconds, so the group table is
+    queried at most once per TTL instead of once per permission check.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, '_roles', None)
+    if roles is None:
+        cache = caches[ROLE_CACHE_ALIAS]
+        roles = cache.get(_cache_key(user.pk))
+        if roles is None:
+            roles = frozenset(user.groups.values_list('name', flat=True))
+            cache.set(_cache_key(user.pk), roles, _ttl())
+        user._roles = roles
+    return roles
+
+
+async def aget_roles(user):
+    """Async variant of get_roles, sharing its cache entries; the cache is never read on the event loop."""
+    if not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, '_roles', None)
+    if roles is None:
+        cache = caches[ROLE_CACHE_ALIAS]
+        roles = await cache.aget(_cache_key(user.pk))
+        if roles is None:
+            roles = frozenset([name async for name in user.groups.values_list('name', flat=True)])
+            await cache.aset(_cache_key(user.pk), roles, _ttl())
+        user._roles = roles
+    return roles
+
+
+def is_manager(user):
+    return MANAGER in get_roles(user)
+
+
+def is_delivery_crew(user):
+    return DELIVERY_CREW in get_roles(user)
+
+
+def invalidate_roles(*user_ids):
+    caches[ROLE_CACHE_ALIAS].delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """m2m_changed receiver for User.groups: drop cached roles of every affected user."""
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+
+    if isinstance(instance, User):
+        instance.__dict__.pop('_roles', None)
+        invalidate_roles(instance.pk)
+    elif isinstance(instance, Group):
+        if action == 'pre_clear':
+            pk_set = set(instance.user_set.values_list('pk', flat=True))
+        if pk_set:
+            invalidate_roles(*pk_set)
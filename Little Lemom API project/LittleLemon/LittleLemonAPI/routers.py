@@ -0,0 +1,50 @@
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+
+# Alias of the read-only replica; reads go to the primary when it is not configured.
+READ_REPLICA = getattr(settings, 'READ_REPLICA', 'replica')
+
+_use_primary = contextvars.ContextVar('use_primary', default=False)
+
+
+@contextmanager
+def use_primary(enabled=True):
+    """Send every read in this block (and the tasks and threads it starts) to the primary."""
+    token = _use_primary.set(enabled or _use_primary.get())
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Send reads to the READ_REPLICA alias and writes to the primary.
+
+    Reads stay on the primary inside a transaction on the primary (so a
+    request sees its own writes and select_for_update locks) and during
+    requests with unsafe methods, which primary_database_middleware marks
+    with use_primary().
+    """
+
+    def db_for_read(self, model, **hints):
+        if READ_REPLICA not in settings.DATABASES or _use_primary.get():
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return READ_REPLICA
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
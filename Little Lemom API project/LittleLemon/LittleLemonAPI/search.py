@@ -0,0 +1,49 @@
+import re
+
+from django.db import connection
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+FTS_TABLE = 'LittleLemonAPI_menuitem_fts'
+
+# Joining the index (rather than a correlated subquery per row) lets SQLite drive
+# the query from the MATCH and look menu items up by primary key.
+JOIN_WHERE = [f'"{FTS_TABLE}"."rowid" = "LittleLemonAPI_menuitem"."id"', f'"{FTS_TABLE}" MATCH %s']
+
+# bm25 weights for the (title, category) columns: title matches rank higher.
+RANK_SQL = f'bm25("{FTS_TABLE}", 10.0, 1.0)'
+
+
+def fts_query(terms):
+    """Build an FTS5 query that prefix-matches every word of the search terms."""
+    words = re.findall(r'\w+', ' '.join(terms))
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def full_text_search(queryset, terms, rank=True):
+    """Restrict a MenuItem queryset to FTS matches for ``terms``, optionally ordered by relevance."""
+    query = fts_query(terms)
+    if not query:
+        return queryset
+
+    queryset = queryset.extra(tables=[FTS_TABLE], where=JOIN_WHERE, params=[query])
+    if rank:
+        queryset = queryset.extra(select={'search_rank': RANK_SQL}).order_by('search_rank', 'id')
+    return queryset
+
+
+class MenuItemSearchFilter(SearchFilter):
+    """
+    ?search= backed by the SQLite FTS5 index on menu item and category titles.
+
+    Every word is prefix-matched ("chic" finds "Chicken") and, unless the
+    client asked for an explicit ?ordering=, results are ranked by bm25
+    relevance. Falls back to the LIKE based SearchFilter on other databases.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if connection.vendor != 'sqlite':
+            return super().filter_queryset(request, queryset, view)
+
+        rank = not request.query_params.get(api_settings.ORDERING_PARAM)
+        return full_text_search(queryset, self.get_search_terms(request), rank=rank)
@@ -1,7 +1,8 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
 
-from .models import MenuItem, Cart, Category, Order, OrderItem
+from .bulk import MAX_BULK_ORDERS
+from .models import MenuItem, Cart, Category, Order, OrderItem, DailySales, OrderStatusSummary, MenuItemSales, DeliveryCrewSummary
 
 class MenuItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -18,24 +19,14 @@ class CartSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = ['id', 'menuitem', 'quantity', 'unit_price', 'price']
-        read_only_fields = ('unit_price', 'price')  # Auto-calculated fields
+        read_only_fields = ('unit_price', 'price')  # Auto-calculated from the menu price
 
-    def create(self, validated_data):
-        """ Automatically set unit_price and total price before saving """
-        menuitem = validated_data['menuitem']
-        quantity = validated_data.get('quantity', 1)
 
-        unit_price = menuitem.price  # Get price from MenuItem
-        total_price = unit_price * quantity
+class CartLineSerializer(serializers.Serializer):
+    """One {menuitem, quantity} line of a cart POST. Menu items are resolved in bulk by the view."""
+    menuitem = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, max_value=32767, default=1)
 
-        cart_item = Cart.objects.create(
-            user=self.context['request'].user,
-            menuitem=menuitem,
-            quantity=quantity,
-            unit_price=unit_price,
-            price=total_price
-        )
-        return cart_item
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -57,3 +48,58 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'date', 'order_items']
         read_only_fields = ['user', 'total', 'date']
+
+
+class BulkOrderFilterSerializer(serializers.Serializer):
+    """Selects orders for a bulk update by their current values."""
+    status = serializers.BooleanField(required=False)
+    delivery_crew = serializers.IntegerField(required=False, allow_null=True)
+    date = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError("Give at least one of status, delivery_crew or date.")
+        return attrs
+
+class BulkOrderUpdateSerializer(serializers.Serializer):
+    """Body of a bulk order update: the target orders (ids or filter) and the new values."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAX_BULK_ORDERS, required=False,
+    )
+    filter = BulkOrderFilterSerializer(required=False)
+    delivery_crew = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), allow_null=True, required=False)
+    status = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError("Give either ids or filter.")
+        if 'delivery_crew' not in attrs and 'status' not in attrs:
+            raise serializers.ValidationError("Give delivery_crew and/or status to update.")
+        return attrs
+
+
+# ----- Sales analytics ----- #
+
+class DailySalesSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailySales
+        fields = ['date', 'orders', 'revenue']
+
+class OrderStatusSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderStatusSummary
+        fields = ['status', 'orders']
+
+class MenuItemSalesSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source='menuitem.title')
+
+    class Meta:
+        model = MenuItemSales
+        fields = ['menuitem', 'title', 'quantity', 'revenue']
+
+class DeliveryCrewSummarySerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='delivery_crew.username')
+
+    class Meta:
+        model = DeliveryCrewSummary
+        fields = ['delivery_crew', 'username', 'assigned', 'delivered']
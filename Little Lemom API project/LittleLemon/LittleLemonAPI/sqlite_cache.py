@@ -0,0 +1,209 @@
+"""
+A Django cache backend kept in a SQLite file shared by all worker processes.
+
+LocMemCache entries live in one process: deleting one (the roles of a user
+whose groups changed, a revoked token) only reaches the worker that handled
+the change, and the others keep the old value until it expires. Here every
+entry is a row in one file, like the throttle buckets, so a delete is seen
+by every process on the host at once. A get is a primary key lookup.
+
+Integers are stored as SQLite integers so incr() is a single atomic
+UPDATE; everything else is pickled. Past MAX_ENTRIES the least recently
+used entries are evicted, like LocMemCache: reads record their time,
+at most once per ACCESS_RESOLUTION seconds per entry so that hot keys do
+not turn every read into a write. Deployments spread over several hosts
+should point the same cache aliases at Redis or Memcached instead.
+
+sqlite3 calls block, and may wait up to 5 seconds for another process's
+write lock, so the async methods (aget, aset, ...) run them on the default
+thread pool rather than on the event loop or Django's single sync thread.
+"""
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID
+"""
+
+LIVE = '(expires IS NULL OR expires > :now)'
+
+# Fraction of writes that also drop expired rows and enforce MAX_ENTRIES.
+CULL_PROBABILITY = 0.01
+# Seconds within which repeated reads of an entry count as one use.
+ACCESS_RESOLUTION = 1.0
+
+
+def _dump(value):
+    if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _load(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    """CACHES backend: LOCATION is the path of the SQLite file."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = str(location)
+        self._local = threading.local()
+
+    def connection(self):
+        # sqlite3 connections must not cross threads or survive a fork.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(SCHEMA)
+            if 'accessed' not in {column[1] for column in conn.execute('PRAGMA table_info(cache)')}:
+                # A file created before eviction was LRU.
+                conn.execute('ALTER TABLE cache ADD COLUMN accessed REAL NOT NULL DEFAULT 0')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _write(self, sql, params):
+        conn = self.connection()
+        cursor = conn.execute(sql, params)
+        if random.random() < CULL_PROBABILITY:
+            self._cull(conn, params['now'])
+        return cursor
+
+    def _cull(self, conn, now):
+        conn.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        excess = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - self._max_entries
+        if excess > 0:
+            if not self._cull_frequency:
+                conn.execute('DELETE FROM cache')
+                return
+            # Like LocMemCache, drop 1/CULL_FREQUENCY of the entries, least recently used first.
+            count = max(excess, self._max_entries // self._cull_frequency)
+            conn.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)', (count,))
+
+    def _touch(self, keys, now):
+        conn = self.connection()
+        conn.execute(
+            f'UPDATE cache SET accessed = ? WHERE key IN ({", ".join("?" * len(keys))}) AND accessed < ?',
+            [now, *keys, now - ACCESS_RESOLUTION],
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._write(
+            'INSERT INTO cache (key, value, expires, accessed) VALUES (:key, :value, :expires, :now) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, accessed = :now '
+            'WHERE cache.expires <= :now',
+            {'key': key, 'value': _dump(value), 'expires': self.get_backend_timeout(timeout), 'now': time.time()},
+        )
+        return cursor.rowcount > 0
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        row = self.connection().execute(
+            f'SELECT value, accessed FROM cache WHERE key = :key AND {LIVE}', {'key': key, 'now': now},
+        ).fetchone()
+        if row is None:
+            return default
+        if row[1] < now - ACCESS_RESOLUTION:
+            self._touch([key], now)
+        return _load(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        rows = self.connection().execute(
+            f'SELECT key, value, accessed FROM cache WHERE key IN ({", ".join("?" * len(keys))}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            [*keys, now],
+        ).fetchall()
+        stale = [key for key, _, accessed in rows if accessed < now - ACCESS_RESOLUTION]
+        if stale:
+            self._touch(stale, now)
+        return {keys[key]: _load(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write(
+            'INSERT INTO cache (key, value, expires, accessed) VALUES (:key, :value, :expires, :now) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, accessed = :now',
+            {'key': key, 'value': _dump(value), 'expires': self.get_backend_timeout(timeout), 'now': time.time()},
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self.connection().execute(
+            f'UPDATE cache SET expires = :expires WHERE key = :key AND {LIVE}',
+            {'key': key, 'expires': self.get_backend_timeout(timeout), 'now': time.time()},
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self.connection().execute(
+            f"UPDATE cache SET value = value + :delta, accessed = :now "
+            f"WHERE key = :key AND typeof(value) = 'integer' AND {LIVE} "
+            f"RETURNING value",
+            {'key': key, 'delta': delta, 'now': time.time()},
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Key '{key}' not found or not an integer")
+        return row[0]
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.connection().execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            self.connection().execute(f'DELETE FROM cache WHERE key IN ({", ".join("?" * len(keys))})', keys)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.connection().execute(
+            f'SELECT 1 FROM cache WHERE key = :key AND {LIVE}', {'key': key, 'now': time.time()},
+        ).fetchone() is not None
+
+    def clear(self):
+        self.connection().execute('DELETE FROM cache')
+
+    # Connections are per thread, so any pool thread will do.
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return await sync_to_async(self.add, thread_sensitive=False)(key, value, timeout, version)
+
+    async def aget(self, key, default=None, version=None):
+        return await sync_to_async(self.get, thread_sensitive=False)(key, default, version)
+
+    async def aget_many(self, keys, version=None):
+        return await sync_to_async(self.get_many, thread_sensitive=False)(keys, version)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        await sync_to_async(self.set, thread_sensitive=False)(key, value, timeout, version)
+
+    async def aincr(self, key, delta=1, version=None):
+        return await sync_to_async(self.incr, thread_sensitive=False)(key, delta, version)
+
+    async def adelete(self, key, version=None):
+        return await sync_to_async(self.delete, thread_sensitive=False)(key, version)
+
+    async def adelete_many(self, keys, version=None):
+        await sync_to_async(self.delete_many, thread_sensitive=False)(keys, version)
@@ -1,3 +1,1588 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import datetime
+import io
+import json
+import threading
+import time
+from unittest import mock
+from pathlib import Path
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User, Group
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Count
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .models import MenuItem, Cart, Category, Order, OrderItem, DeliveryCrewSummary, DailySales, Job, OrderEvent
+from . import analytics, authentication, benchmark, caching, dispatch, events, export, instrumentation, jobs, roles
+from .cart import CartLimitExceeded, add_to_cart
+from .readers import reader_for
+from .routers import ReadReplicaRouter, use_primary
+from .renderers import FastJSONParser, FastJSONRenderer
+from .sqlite_cache import SQLiteCache
+from .serializers import MenuItemSerializer, CategorySerializer, CartSerializer, OrderSerializer
+from .throttling import SQLiteThrottleStore, get_store
 
 # Create your tests here.
+
+
+class LittleLemonTestCase(TestCase):
+    """Shared fixtures: the two staff groups, a small menu and one user per role."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager_group = Group.objects.create(name="Manager")
+        cls.delivery_group = Group.objects.create(name="Delivery crew")
+
+        cls.category = Category.objects.create(slug='mains', title='Mains')
+        cls.menu_items = MenuItem.objects.bulk_create([
+            MenuItem(title=f'Item {i}', price=Decimal(i) + Decimal('1.50'), featured=i % 2 == 0, category=cls.category)
+            for i in range(20)
+        ])
+
+        cls.customer = User.objects.create_user(username='customer1', password='pass')
+        cls.manager = User.objects.create_user(username='manager1', password='pass')
+        cls.manager.groups.add(cls.manager_group)
+        cls.crew = User.objects.create_user(username='delivery1', password='pass')
+        cls.crew.groups.add(cls.delivery_group)
+
+    def setUp(self):
+        # Cached roles/catalog responses and throttle buckets would leak between tests.
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        get_store().clear()
+        dispatch.dispatcher.invalidate()
+        self.client = APIClient()
+
+    def login(self, user):
+        # A fresh instance per login, as a real request would load it.
+        self.client.force_authenticate(user=User.objects.get(pk=user.pk))
+
+    def fill_cart(self, user, size):
+        Cart.objects.bulk_create([
+            Cart(user=user, menuitem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+            for item in MenuItem.objects.order_by('id')[:size]
+        ])
+
+
+class CheckoutTests(LittleLemonTestCase):
+
+    def checkout(self, **headers):
+        return self.client.post('/api/orders', headers=headers)
+
+    def test_checkout_moves_cart_into_order(self):
+        self.login(self.customer)
+        self.fill_cart(self.customer, 3)
+
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(id=response.data['id'])
+        self.assertEqual(order.order_items.count(), 3)
+        self.assertEqual(str(order.total), '15.00')
+        self.assertFalse(Cart.objects.filter(user=self.customer).exists())
+
+    def test_empty_cart_is_rejected(self):
+        self.login(self.customer)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_idempotency_key_returns_the_same_order(self):
+        self.login(self.customer)
+        self.fill_cart(self.customer, 2)
+
+        first = self.checkout(**{'Idempotency-Key': 'abc-123'})
+        self.fill_cart(self.customer, 2)
+        retry = self.checkout(**{'Idempotency-Key': 'abc-123'})
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(first.data['id'], retry.data['id'])
+        self.assertEqual(Order.objects.count(), 1)
+        # The retry must not consume the new cart.
+        self.assertEqual(Cart.objects.filter(user=self.customer).count(), 2)
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        self.login(self.customer)
+        self.client.get('/api/orders')  # warm the role cache
+        dispatch.dispatcher.reserve()  # and load the crew heap
+        counts = []
+        for size in (1, 15):
+            self.fill_cart(self.customer, size)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.checkout()
+            self.assertEqual(response.status_code, 201)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(OrderItem.objects.count(), 16)
+
+
+class RoleCacheTests(LittleLemonTestCase):
+
+    def test_roles_are_loaded_once_across_requests(self):
+        self.login(self.manager)
+        self.client.get('/api/orders')
+        self.login(self.manager)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/orders')
+        self.assertFalse(any('auth_user_groups' in q['sql'] for q in ctx.captured_queries))
+
+    def test_membership_changes_invalidate_cached_roles(self):
+        self.fill_cart(self.customer, 1)
+        self.login(self.customer)
+        self.client.get('/api/orders')  # warm the role cache as a customer
+
+        self.login(self.manager)
+        response = self.client.post('/api/groups/delivery-crew/users', {'user_id': self.customer.id})
+        self.assertEqual(response.status_code, 201)
+
+        self.login(self.customer)
+        self.assertEqual(self.client.post('/api/orders').status_code, 403)
+
+        self.login(self.manager)
+        response = self.client.delete(f'/api/groups/delivery-crew/users/{self.customer.id}')
+        self.assertEqual(response.status_code, 200)
+
+        self.login(self.customer)
+        self.assertEqual(self.client.post('/api/orders').status_code, 201)
+
+    def test_invalidation_reaches_other_processes(self):
+        # A second cache instance on the same file stands in for another worker.
+        other = SQLiteCache(caches[roles.ROLE_CACHE_ALIAS].path, {})
+        roles.get_roles(User.objects.get(pk=self.crew.pk))
+        self.assertEqual(other.get(f'roles:{self.crew.pk}'), frozenset({roles.DELIVERY_CREW}))
+
+        self.crew.groups.remove(self.delivery_group)
+        self.assertIsNone(other.get(f'roles:{self.crew.pk}'))
+
+    @override_settings(ROLE_CACHE_TTL=0)
+    def test_ttl_is_read_at_call_time(self):
+        roles.get_roles(User.objects.get(pk=self.crew.pk))
+        with CaptureQueriesContext(connection) as ctx:
+            roles.get_roles(User.objects.get(pk=self.crew.pk))
+        self.assertTrue(any('auth_user_groups' in q['sql'] for q in ctx.captured_queries))
+
+
+class SQLiteCacheTests(TestCase):
+
+    def setUp(self):
+        self.cache = caches['shared']
+        self.cache.clear()
+
+    def test_entries_are_shared_between_instances(self):
+        other = SQLiteCache(self.cache.path, {})
+        self.cache.set('k', {'a': 1})
+        self.assertEqual(other.get('k'), {'a': 1})
+        self.assertFalse(other.add('k', 'ignored'))
+        other.delete('k')
+        self.assertIsNone(self.cache.get('k'))
+
+    def test_incr_is_atomic_and_expired_entries_are_gone(self):
+        self.cache.set('n', 1)
+        self.assertEqual(self.cache.incr('n', 2), 3)
+        self.assertEqual(self.cache.get('n'), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.set('old', 'x', timeout=0)
+        self.assertIsNone(self.cache.get('old'))
+        self.assertTrue(self.cache.add('old', 'y'))
+        self.assertEqual(self.cache.get_many(['n', 'old', 'missing']), {'n': 3, 'old': 'y'})
+
+    @mock.patch('LittleLemonAPI.sqlite_cache.CULL_PROBABILITY', 1)
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = SQLiteCache(self.cache.path, {'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3}})
+        now = time.time()
+        with mock.patch('LittleLemonAPI.sqlite_cache.time') as clock:
+            for step, key in enumerate('abc'):
+                clock.time.return_value = now + step * 10
+                cache.set(key, key)
+            clock.time.return_value = now + 30
+            cache.get('a')
+            clock.time.return_value = now + 40
+            cache.set('d', 'd')
+        self.assertEqual(cache.get_many('abcd'), {'a': 'a', 'c': 'c', 'd': 'd'})
+
+
+# Maximum number of SQL queries each endpoint may run, whatever the page size.
+# Raising a number here should be a deliberate decision in review.
+QUERY_BUDGETS = {
+    'orders-list': 3,
+    'order-detail': 2,
+    'cart-menu-items': 1,
+    'menu-items-list': 2,
+    'category-list': 2,
+}
+
+
+class QueryBudgetTests(LittleLemonTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        orders = Order.objects.bulk_create([
+            Order(user=cls.customer, delivery_crew=cls.crew, total=10, date='2025-03-01')
+            for _ in range(30)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+            for order in orders for item in cls.menu_items[:3]
+        ])
+        cls.order = orders[0]
+
+    def assertWithinBudget(self, endpoint, url, user):
+        self.login(user)
+        self.client.get(url)  # warm the role cache
+        self.login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        budget = QUERY_BUDGETS[endpoint]
+        self.assertLessEqual(
+            len(ctx.captured_queries), budget,
+            f'{endpoint} ran {len(ctx.captured_queries)} queries (budget {budget}):\n'
+            + '\n'.join(q['sql'] for q in ctx.captured_queries),
+        )
+        return response
+
+    def test_orders_list_for_every_role(self):
+        for user in (self.manager, self.crew, self.customer):
+            with self.subTest(user=user.username):
+                response = self.assertWithinBudget('orders-list', '/api/orders?perpage=30', user)
+                self.assertEqual(len(response.data), 30)
+                self.assertEqual(len(response.data[0]['order_items']), 3)
+
+    def test_order_detail(self):
+        for user in (self.manager, self.crew, self.customer):
+            with self.subTest(user=user.username):
+                self.assertWithinBudget('order-detail', f'/api/orders/{self.order.id}', user)
+
+    def test_cart(self):
+        self.fill_cart(self.customer, 15)
+        self.assertWithinBudget('cart-menu-items', '/api/cart/menu-items', self.customer)
+
+    def test_menu_items(self):
+        self.assertWithinBudget('menu-items-list', '/api/menu-items', self.customer)
+
+    def test_categories(self):
+        self.assertWithinBudget('category-list', '/api/categories/', self.customer)
+
+
+class CursorPaginationTests(LittleLemonTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Few distinct dates and totals so most rows tie on the ordering field.
+        Order.objects.bulk_create([
+            Order(user=cls.customer, total=10 + i % 3, date=f'2025-03-0{1 + i % 4}')
+            for i in range(25)
+        ])
+
+    def walk(self, ordering, perpage=7):
+        self.login(self.manager)
+        seen, cursor = [], ''
+        while cursor is not None:
+            response = self.client.get('/api/orders', {'cursor': cursor, 'ordering': ordering, 'perpage': perpage})
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), perpage)
+            seen.extend(order['id'] for order in response.data['results'])
+            cursor = response.data['next']
+        return seen
+
+    def test_every_order_is_returned_once_in_order(self):
+        for ordering in ('-date', 'total', 'id', '-id'):
+            with self.subTest(ordering=ordering):
+                seen = self.walk(ordering)
+                expected = Order.objects.order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+                self.assertEqual(seen, [o.id for o in expected])
+                self.assertEqual(len(set(seen)), 25)
+
+    def test_no_count_query(self):
+        self.login(self.manager)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/orders', {'cursor': ''})
+        self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+
+    def test_page_size_is_capped(self):
+        Order.objects.bulk_create([Order(user=self.customer, total=1, date='2025-01-01') for _ in range(120)])
+        self.login(self.manager)
+        response = self.client.get('/api/orders', {'cursor': '', 'perpage': 1000})
+        self.assertEqual(len(response.data['results']), 100)
+        response = self.client.get('/api/orders', {'perpage': 1000})
+        self.assertEqual(len(response.data), 100)
+
+    def test_rejects_unsupported_ordering_and_bad_cursor(self):
+        self.login(self.manager)
+        self.assertEqual(self.client.get('/api/orders', {'cursor': '', 'ordering': 'user'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/orders', {'cursor': 'not-a-cursor'}).status_code, 400)
+
+    def test_rejects_tampered_cursor_values(self):
+        self.login(self.manager)
+        for ordering, payload in [
+            ('-date', ['-date', 'notadate', 1]),
+            ('total', ['total', 'lots', 1]),
+            ('-date', ['-date', '2024-01-01', 'x']),
+            ('id', ['id', None, None]),
+            ('-date', ['-date', '2024-01-01']),
+        ]:
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+            response = self.client.get('/api/orders', {'cursor': cursor, 'ordering': ordering})
+            self.assertEqual(response.status_code, 400, payload)
+
+
+class CatalogCacheTests(LittleLemonTestCase):
+
+    def test_repeated_reads_are_served_from_cache(self):
+        self.login(self.customer)
+        first = self.client.get('/api/menu-items', {'ordering': 'price', 'featured': 'true'})
+        with CaptureQueriesContext(connection) as ctx:
+            # Same parameters in a different order hit the same entry.
+            second = self.client.get('/api/menu-items', {'featured': 'true', 'ordering': 'price'})
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_invalidation_reaches_other_processes(self):
+        # A second cache instance on the same file stands in for another worker.
+        other = SQLiteCache(caches[caching.CATALOG_CACHE_ALIAS].path, {})
+        version = caching.catalog_version()
+        self.assertEqual(other.get(caching.VERSION_KEY), version)
+
+        self.login(self.manager)
+        self.assertEqual(self.client.patch(f'/api/menu-items/{self.menu_items[0].id}', {'price': '4.25'}).status_code, 200)
+        self.assertGreater(other.get(caching.VERSION_KEY), version)
+
+    def test_writes_bump_the_version(self):
+        self.login(self.customer)
+        before = self.client.get('/api/categories/')
+
+        self.login(self.manager)
+        response = self.client.post('/api/menu-items', {'title': 'Soup', 'price': '4.00', 'featured': False, 'category': self.category.id})
+        self.assertEqual(response.status_code, 201)
+        Category.objects.create(slug='desserts', title='Desserts')
+
+        self.login(self.customer)
+        after = self.client.get('/api/categories/')
+        self.assertNotEqual(before['ETag'], after['ETag'])
+        self.assertEqual(after.data['count'], 2)
+        response = self.client.get('/api/menu-items', {'search': 'Soup'})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_if_none_match_returns_304(self):
+        self.login(self.customer)
+        response = self.client.get(f'/api/menu-items/{self.menu_items[0].id}')
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            revalidated = self.client.get(f'/api/menu-items/{self.menu_items[0].id}', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+
+class CategoryIndexTests(LittleLemonTestCase):
+
+    def test_index_is_one_aggregate_query(self):
+        Category.objects.create(slug='desserts', title='Desserts')
+        self.login(self.customer)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/categories/index')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('facets', response.data)
+        desserts, mains = response.data['categories']
+        self.assertEqual((desserts['items'], desserts['min_price']), (0, None))
+        self.assertEqual(
+            {key: mains[key] for key in ('slug', 'items', 'featured', 'min_price', 'max_price')},
+            {'slug': 'mains', 'items': 20, 'featured': 10, 'min_price': '1.50', 'max_price': '20.50'},
+        )
+
+    def test_menu_item_filters_add_facets(self):
+        self.login(self.customer)
+        response = self.client.get('/api/categories/index', {'search': 'Item 1', 'featured': 'true'})
+
+        self.assertEqual(response.status_code, 200)
+        # "Item 1" prefix-matches Item 1 and Item 10-19; the featured ones are 10, 12, ..., 18.
+        self.assertEqual(response.data['facets'], {
+            'items': 5,
+            'min_price': '11.50',
+            'max_price': '19.50',
+            'category': [{'id': self.category.id, 'items': 5}],
+            'featured': {'true': 5, 'false': 0},
+        })
+
+        response = self.client.get('/api/categories/index', {'category': 999999})
+        self.assertEqual(response.status_code, 400)
+
+    def test_index_is_cached_until_the_catalog_changes(self):
+        self.login(self.customer)
+        first = self.client.get('/api/categories/index', {'featured': 'false'})
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get('/api/categories/index', {'featured': 'false'})
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(first.data, second.data)
+
+        self.login(self.manager)
+        self.client.post('/api/menu-items', {'title': 'Soup', 'price': '0.75', 'featured': False, 'category': self.category.id})
+
+        self.login(self.customer)
+        after = self.client.get('/api/categories/index', {'featured': 'false'})
+        self.assertEqual(after.data['categories'][0]['items'], 21)
+        self.assertEqual(after.data['facets']['min_price'], '0.75')
+
+
+class FullTextSearchTests(LittleLemonTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        desserts = Category.objects.create(slug='desserts', title='Desserts')
+        cls.cake = MenuItem.objects.create(title='Lemon Cake', price=5, featured=False, category=desserts)
+        cls.chicken = MenuItem.objects.create(title='Lemon Chicken', price=12, featured=True, category=cls.category)
+        cls.tart = MenuItem.objects.create(title='Honey Tart', price=6, featured=False, category=desserts)
+
+    def search(self, term, **params):
+        self.login(self.customer)
+        response = self.client.get('/api/menu-items', {'search': term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_prefix_match_on_every_word(self):
+        self.assertEqual(self.search('lem chic'), [self.chicken.id])
+
+    def test_category_title_is_searchable(self):
+        self.assertEqual(sorted(self.search('dessert')), sorted([self.cake.id, self.tart.id]))
+
+    def test_explicit_ordering_overrides_relevance(self):
+        self.assertEqual(self.search('lemon', ordering='-price'), [self.chicken.id, self.cake.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        MenuItem.objects.filter(id=self.tart.id).update(title='Walnut Tart')
+        self.cake.delete()
+        self.assertEqual(self.search('walnut'), [self.tart.id])
+        self.assertEqual(self.search('cake'), [])
+
+
+class CartUpsertTests(LittleLemonTestCase):
+
+    def test_single_line_is_still_accepted(self):
+        self.login(self.customer)
+        item = self.menu_items[0]
+        response = self.client.post('/api/cart/menu-items', {'menuitem': item.id, 'quantity': 2})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['menuitem'], item.id)
+        self.assertEqual(response.data['price'], '3.00')
+
+    def test_adding_an_existing_item_raises_its_quantity(self):
+        self.login(self.customer)
+        item = self.menu_items[1]
+        self.client.post('/api/cart/menu-items', {'menuitem': item.id, 'quantity': 1})
+        response = self.client.post('/api/cart/menu-items', {'menuitem': item.id, 'quantity': 3})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['quantity'], 4)
+        self.assertEqual(response.data['price'], '10.00')
+
+    def test_batch_is_applied_with_a_fixed_number_of_queries(self):
+        self.login(self.customer)
+        self.fill_cart(self.customer, 1)
+        lines = [{'menuitem': item.id, 'quantity': 1} for item in self.menu_items[:12]]
+        lines.append({'menuitem': self.menu_items[0].id, 'quantity': 1})
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/cart/menu-items', lines, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 12)
+        first = Cart.objects.get(user=self.customer, menuitem=self.menu_items[0])
+        self.assertEqual(first.quantity, 4)  # 2 already in the cart + 1 + 1
+        self.assertLessEqual(len(ctx.captured_queries), 6)
+
+    def test_unknown_items_reject_the_whole_batch(self):
+        self.login(self.customer)
+        lines = [{'menuitem': self.menu_items[0].id}, {'menuitem': 999999}]
+        response = self.client.post('/api/cart/menu-items', lines, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Cart.objects.filter(user=self.customer).exists())
+
+    def test_empty_batch_is_rejected(self):
+        self.login(self.customer)
+        response = self.client.post('/api/cart/menu-items', [], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_lines_and_total_must_fit_the_price_columns(self):
+        self.login(self.customer)
+        item, other = self.menu_items[0], self.menu_items[1]  # 1.50 and 2.50
+        self.assertEqual(self.client.post('/api/cart/menu-items', {'menuitem': item.id, 'quantity': 6000}).status_code, 201)
+
+        # 7000 x 1.50 = 10500.00 does not fit DecimalField(6, 2), whether in one POST or merged.
+        for line in ({'menuitem': item.id, 'quantity': 1000}, {'menuitem': other.id, 'quantity': 30000}):
+            response = self.client.post('/api/cart/menu-items', line)
+            self.assertEqual(response.status_code, 400, line)
+        # Each line fits but the cart total (9000 + 2500) would not.
+        response = self.client.post('/api/cart/menu-items', {'menuitem': other.id, 'quantity': 1000})
+        self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(Cart.objects.get(user=self.customer).quantity, 6000)
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        self.assertEqual(self.client.post('/api/orders').status_code, 201)
+
+    def test_upsert_skips_lines_that_outgrew_their_columns(self):
+        # A concurrent add between the limit check and the upsert.
+        self.fill_cart(self.customer, 1)
+        Cart.objects.filter(user=self.customer).update(quantity=6666, price=Decimal('9999.00'))
+        with mock.patch('LittleLemonAPI.cart._check_limits'), self.assertRaises(CartLimitExceeded):
+            add_to_cart(self.customer, [{'menuitem': self.menu_items[0].id, 'quantity': 1}, {'menuitem': self.menu_items[1].id, 'quantity': 1}])
+        self.assertEqual(list(Cart.objects.filter(user=self.customer).values_list('quantity', flat=True)), [6666])
+
+
+class CartRepricingTests(LittleLemonTestCase):
+
+    def test_price_change_reprices_every_open_cart(self):
+        item, other = self.menu_items[0], self.menu_items[1]
+        customers = [User.objects.create_user(username=f'shopper{i}', password='pass') for i in range(5)]
+        for customer in customers:
+            self.fill_cart(customer, 2)
+
+        self.login(self.manager)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(f'/api/menu-items/{item.id}', {'price': '4.25'})
+
+        self.assertEqual(response.status_code, 200)
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE') and 'LittleLemonAPI_cart' in q['sql']]
+        self.assertEqual(len(updates), 1)
+        lines = Cart.objects.filter(menuitem=item)
+        self.assertEqual(lines.count(), 5)
+        for line in lines:
+            self.assertEqual(line.unit_price, Decimal('4.25'))
+            self.assertEqual(line.price, Decimal('8.50'))
+        self.assertFalse(Cart.objects.filter(menuitem=other).exclude(unit_price=other.price).exists())
+
+    def test_checkout_with_stale_prices_reprices_the_cart(self):
+        self.fill_cart(self.customer, 3)
+        # A change that bypassed the API, so the cart still has the old price.
+        MenuItem.objects.filter(id=self.menu_items[2].id).update(price=Decimal('9.99'))
+        self.login(self.customer)
+
+        response = self.client.post('/api/orders')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['menuitems'], [self.menu_items[2].id])
+        self.assertFalse(Order.objects.exists())
+        line = Cart.objects.get(user=self.customer, menuitem=self.menu_items[2])
+        self.assertEqual(line.price, Decimal('19.98'))
+
+        response = self.client.post('/api/orders')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total'], '27.98')
+
+
+    def test_price_rise_beyond_the_column_limit_is_refused_at_checkout(self):
+        item = MenuItem.objects.create(title='Platter', price=Decimal('20.50'), featured=False, category=self.category)
+        self.login(self.customer)
+        self.assertEqual(self.client.post('/api/cart/menu-items', {'menuitem': item.id, 'quantity': 400}).status_code, 201)
+
+        self.login(self.manager)
+        self.assertEqual(self.client.patch(f'/api/menu-items/{item.id}', {'price': '99.00'}).status_code, 200)
+        line = Cart.objects.get(user=self.customer, menuitem=item)
+        self.assertEqual((line.unit_price, line.price), (Decimal('20.50'), Decimal('8200.00')))
+
+        self.login(self.customer)
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        response = self.client.post('/api/orders')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(item.id), response.data['error'])
+        self.assertFalse(Order.objects.exists())
+
+
+class SharedThrottleTests(LittleLemonTestCase):
+
+    def test_anonymous_rate_is_enforced(self):
+        statuses = [self.client.get('/api/categories/').status_code for _ in range(6)]
+        self.assertEqual(statuses, [200] * 5 + [429])
+
+    def test_buckets_are_shared_between_connections(self):
+        # Two stores on one file behave like two worker processes.
+        path = get_store().path
+        first, second = SQLiteThrottleStore(path), SQLiteThrottleStore(path)
+        results = [store.consume('k', 4, 4 / 60, 1000.0)[0] for store in (first, second) * 3]
+        self.assertEqual(results, [True] * 4 + [False] * 2)
+
+    def test_tests_do_not_use_the_configured_store(self):
+        self.assertNotEqual(Path(get_store().path), settings.BASE_DIR / 'throttle.sqlite3')
+
+    def test_bucket_refills_over_time(self):
+        store = get_store()
+        for _ in range(2):
+            store.consume('k', 2, 1.0, 1000.0)
+        self.assertFalse(store.consume('k', 2, 1.0, 1000.5)[0])
+        self.assertTrue(store.consume('k', 2, 1.0, 1001.6)[0])
+
+
+class CachedTokenAuthenticationTests(LittleLemonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_skips_token_and_group_queries(self):
+        self.client.get('/api/cart/menu-items')
+        hits = authentication.stats.snapshot()['hits']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/orders')
+        self.assertEqual(response.status_code, 200)
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('authtoken_token', sql)
+        self.assertNotIn('auth_user_groups', sql)
+        self.assertEqual(authentication.stats.snapshot()['hits'], hits + 1)
+
+    def test_logout_revokes_immediately(self):
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        self.assertEqual(self.client.post('/token/logout/').status_code, 204)
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 401)
+
+    def test_deactivation_revokes_immediately(self):
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        self.customer.is_active = False
+        self.customer.save()
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 401)
+
+    def test_revocation_reaches_other_processes(self):
+        # A second cache instance on the same file stands in for another worker.
+        other = SQLiteCache(caches[authentication.TOKEN_CACHE_ALIAS].path, {})
+        key = authentication._cache_key(self.token.key)
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        self.assertEqual(other.get(key).user.pk, self.customer.pk)
+
+        self.assertEqual(self.client.post('/token/logout/').status_code, 204)
+        self.assertIsNone(other.get(key))
+
+        token = Token.objects.create(user=self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        self.customer.is_active = False
+        self.customer.save()
+        self.assertIsNone(other.get(authentication._cache_key(token.key)))
+
+    def test_group_change_refreshes_cached_roles(self):
+        self.client.get('/api/orders')
+        self.delivery_group.user_set.add(self.customer)
+        self.assertEqual(self.client.post('/api/orders').status_code, 403)
+
+    def test_metrics_endpoint(self):
+        self.login(self.manager)
+        response = self.client.get('/api/metrics/auth-cache')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'hits', 'misses', 'hit_ratio'})
+
+
+class BenchmarkHarnessTests(TestCase):
+    """Smoke test so the bench_api harness keeps working as endpoints change."""
+
+    def test_every_endpoint_runs_in_every_mode(self):
+        with benchmark.benchmark_environment():
+            dataset = benchmark.seed(menu_items=30, users=30, orders=50)
+            drivers = (benchmark.InProcessDriver(dataset), benchmark.WSGIDriver(dataset), benchmark.ASGIDriver(dataset))
+            for driver in drivers:
+                for endpoint in benchmark.endpoints(dataset):
+                    with self.subTest(mode=driver.mode, endpoint=endpoint.name):
+                        stats = benchmark.measure(driver, endpoint, requests=2, warmup=1)
+                        self.assertLess(stats['status'], 400)
+                        self.assertGreater(stats['throughput_rps'], 0)
+
+    def test_concurrent_asgi_runs_report_loop_lag(self):
+        with benchmark.benchmark_environment():
+            dataset = benchmark.seed(menu_items=5, users=5, orders=5)
+            endpoint = next(e for e in benchmark.endpoints(dataset) if e.name == 'orders (customer)')
+            with benchmark.store_contention(hold_ms=5, every_ms=10):
+                stats = benchmark.measure_concurrent(benchmark.ASGIDriver(dataset), endpoint, requests=8, concurrency=4)
+        self.assertEqual(stats['requests'], 8)
+        self.assertGreaterEqual(stats['loop_lag_max_ms'], stats['loop_lag_p99_ms'])
+
+    def test_shared_stores_are_left_alone(self):
+        shared = caches[roles.ROLE_CACHE_ALIAS]
+        shared.set('outside', 1)
+        with benchmark.benchmark_environment():
+            dataset = benchmark.seed(menu_items=5, users=5, orders=5)
+            endpoint = next(e for e in benchmark.endpoints(dataset) if e.name == 'manager group')
+            self.assertEqual(benchmark.measure(benchmark.WSGIDriver(dataset), endpoint, requests=1, warmup=0)['status'], 200)
+        # Seeded ids are handed out again after the rollback; their roles must not outlive it.
+        self.assertIsNone(shared.get(f'roles:{dataset.users["manager"].id}'))
+        self.assertEqual(shared.get('outside'), 1)
+        self.assertNotIn('bench', str(get_store().path))
+
+
+class OrderExportTests(LittleLemonTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.orders = Order.objects.bulk_create([
+            Order(user=cls.customer, total=i, date=f'2024-01-{i % 5 + 1:02d}', status=i % 2 == 0)
+            for i in range(12)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+            for order in cls.orders[:-1] for item in cls.menu_items[:2]
+        ])
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_matches_order_serializer(self):
+        self.login(self.manager)
+        lines = self.content(self.client.get('/api/orders/export.ndjson')).splitlines()
+        expected = self.client.get('/api/orders?ordering=date&perpage=100').json()
+        expected.sort(key=lambda order: (order['date'], order['id']))
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_csv_has_one_row_per_item(self):
+        self.login(self.manager)
+        response = self.client.get('/api/orders/export.csv?start=2024-01-02&end=2024-01-03', headers={'Accept': 'text/csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(io.StringIO(self.content(response))))
+        self.assertEqual(rows[0], export.CSV_HEADER)
+        orders = [order for order in self.orders if order.date in ('2024-01-02', '2024-01-03')]
+        items = sum(2 if order is not self.orders[-1] else 1 for order in orders)
+        self.assertEqual(len(rows) - 1, items)
+        self.assertTrue(all('2024-01-02' <= row[5] <= '2024-01-03' for row in rows[1:]))
+
+    def test_chunks_cover_every_order_with_constant_queries(self):
+        for chunk_size in (1, 5, 100):
+            with self.subTest(chunk_size=chunk_size), CaptureQueriesContext(connection) as ctx:
+                chunks = list(export.order_chunks(chunk_size=chunk_size))
+            ids = [order['id'] for chunk in chunks for order in chunk]
+            self.assertEqual(sorted(ids), sorted(order.id for order in self.orders))
+            self.assertTrue(all(len(chunk) <= chunk_size for chunk in chunks))
+            self.assertLessEqual(len(ctx.captured_queries), 2 * len(chunks) + 1)
+
+    def test_managers_only(self):
+        self.login(self.customer)
+        self.assertEqual(self.client.get('/api/orders/export.csv').status_code, 403)
+        self.login(self.manager)
+        self.assertEqual(self.client.get('/api/orders/export.csv?start=January').status_code, 400)
+
+
+@override_settings(ROOT_URLCONF='LittleLemon.asgi_urls')
+class AsyncViewTests(LittleLemonTestCase):
+    """The ASGI cart and order views must answer exactly like the sync ones."""
+
+    def setUp(self):
+        super().setUp()
+        self.async_client = AsyncClient()
+
+    def token(self, user):
+        return {'Authorization': f'Token {Token.objects.get_or_create(user=user)[0].key}'}
+
+    async def test_store_io_stays_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        threads = set()
+
+        def recording(connection):
+            def wrapper(store):
+                threads.add(threading.get_ident())
+                return connection(store)
+            return wrapper
+
+        headers = await sync_to_async(self.token)(self.customer)
+        with mock.patch.object(SQLiteCache, 'connection', recording(SQLiteCache.connection)), \
+                mock.patch.object(SQLiteThrottleStore, 'connection', recording(SQLiteThrottleStore.connection)):
+            response = await self.async_client.get('/api/orders', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(threads)
+        self.assertNotIn(loop_thread, threads)
+
+    async def test_orders_match_sync_views(self):
+        await Order.objects.abulk_create([
+            Order(user=self.customer, delivery_crew=self.crew if i % 2 else None, total=i, date=f'2024-01-{i + 1:02d}')
+            for i in range(15)
+        ])
+        for user in (self.manager, self.crew, self.customer):
+            headers = await sync_to_async(self.token)(user)
+            for query in ('', '?page=2&perpage=4', '?page=0', '?ordering=total&status=false', '?cursor=&perpage=5'):
+                with self.subTest(user=user.username, query=query):
+                    with override_settings(ROOT_URLCONF='LittleLemon.urls'):
+                        expected = await sync_to_async(APIClient().get)(f'/api/orders{query}', headers=headers)
+                    response = await self.async_client.get(f'/api/orders{query}', headers=headers)
+                    self.assertEqual(response.status_code, expected.status_code)
+                    self.assertEqual(response.json(), expected.json())
+
+    async def test_cart_and_checkout(self):
+        headers = await sync_to_async(self.token)(self.customer)
+        item = self.menu_items[0]
+
+        response = await self.async_client.post(
+            '/api/cart/menu-items', [{'menuitem': item.id, 'quantity': 2}], content_type='application/json', headers=headers,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()[0]['price'], '3.00')
+
+        first = await self.async_client.post('/api/orders', headers={**headers, 'Idempotency-Key': 'k1'})
+        retry = await self.async_client.post('/api/orders', headers={**headers, 'Idempotency-Key': 'k1'})
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(first.json()['id'], retry.json()['id'])
+        self.assertFalse(await Cart.objects.filter(user=self.customer).aexists())
+
+    async def test_order_detail_permissions(self):
+        order = await Order.objects.acreate(user=self.customer, delivery_crew=self.crew, total=5, date='2024-01-01')
+        crew = await sync_to_async(self.token)(self.crew)
+        other = await sync_to_async(User.objects.create_user)(username='customer2', password='pass')
+        stranger = await sync_to_async(self.token)(other)
+
+        response = await self.async_client.get(f'/api/orders/{order.id}', headers=stranger)
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.patch(
+            f'/api/orders/{order.id}', {'status': True}, content_type='application/json', headers=crew,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['status'])
+        response = await self.async_client.delete(f'/api/orders/{order.id}', headers=crew)
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.get('/api/orders/999999', headers=crew)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_requires_token(self):
+        response = await self.async_client.get('/api/orders')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/orders', headers={'Authorization': 'Token nope'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_errors_match_sync_views(self):
+        headers = await sync_to_async(self.token)(self.customer)
+        for method, path, body in (('post', '/api/cart/menu-items', '{"menuitem": '), ('put', '/api/orders', '')):
+            with self.subTest(method=method, path=path):
+                with override_settings(ROOT_URLCONF='LittleLemon.urls'):
+                    expected = await sync_to_async(getattr(APIClient(), method))(
+                        path, body, content_type='application/json', headers=headers,
+                    )
+                response = await getattr(self.async_client, method)(path, body, content_type='application/json', headers=headers)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'GET, POST')
+
+    async def test_session_authentication(self):
+        await self.async_client.aforce_login(self.customer)
+        response = await self.async_client.get('/api/cart/menu-items')
+        self.assertEqual(response.status_code, 200)
+
+    async def test_browsable_api_is_not_served(self):
+        # Documented difference: the sync views would render the HTML page.
+        headers = await sync_to_async(self.token)(self.customer)
+        response = await self.async_client.get('/api/orders', headers={**headers, 'Accept': 'text/html'})
+        self.assertEqual(response.status_code, 406)
+        response = await self.async_client.get('/api/orders', headers={**headers, 'Accept': 'application/json; indent=2'})
+        self.assertEqual(response.status_code, 200)
+
+
+class FastJSONTests(TestCase):
+    """FastJSONRenderer/FastJSONParser must be indistinguishable from DRF's JSON classes."""
+
+    payloads = [
+        {'price': '12.50', 'total': Decimal('3.10'), 'date': datetime.date(2024, 1, 2), 'status': False, 'crew': None},
+        {'at': datetime.datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc), 'time': datetime.time(9, 30)},
+        {'title': 'Crème brûlée \u2028 \u2029 \U0001F34B "quoted" \\ / \t', 'lazy': gettext_lazy('Manager')},
+        {'floats': [0.1, 1.0, -0.0, 1e15, 1e16, 1e-4, 1e-5, 123.456e20, Decimal('1E-7')]},
+        {'big': 2 ** 70, 'negative': -2 ** 63, 'keys': {1: 'a', None: 'b', 2.5: 'c'}},
+        {'error': [ErrorDetail('This field is required.', code='required')], 'nested': ({'a': []}, [{}])},
+        [],
+    ]
+
+    def test_render_is_byte_identical(self):
+        for data in self.payloads:
+            with self.subTest(data=data):
+                self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_falls_back(self):
+        media_type = 'application/json; indent=4'
+        data = self.payloads[0]
+        self.assertEqual(FastJSONRenderer().render(data, media_type), JSONRenderer().render(data, media_type))
+
+    def test_parse_matches_json_parser(self):
+        bodies = [JSONRenderer().render(data) for data in self.payloads]
+        bodies += [b'{"big": %d, "float": 1e400}' % 2 ** 80, b'{"a": 1, "a": 2}', b'"\\ud800"']
+        for body in bodies:
+            with self.subTest(body=body):
+                self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+    def test_invalid_json_raises_parse_error(self):
+        for body in (b'{"a": NaN}', b'{"a": 1', b'\xff'):
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(body))
+
+
+class ValuesReaderTests(LittleLemonTestCase):
+    """The values() fast path must produce exactly what the serializers produce."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Category.objects.create(slug='drinks', title='Drinks \u2028 & more')
+        orders = Order.objects.bulk_create([
+            Order(user=cls.customer, delivery_crew=cls.crew if i % 3 else None, status=i % 2 == 0, total=Decimal(i) / 3, date=f'2024-02-{i + 1:02d}')
+            for i in range(8)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menuitem=item, quantity=i + 1, unit_price=item.price, price=item.price * (i + 1))
+            for order in orders[1:] for i, item in enumerate(reversed(cls.menu_items[:3]))
+        ])
+
+    def test_readers_match_serializers(self):
+        self.fill_cart(self.customer, 4)
+        cases = [
+            (MenuItemSerializer, MenuItem.objects.order_by('id')),
+            (CategorySerializer, Category.objects.order_by('id')),
+            (CartSerializer, Cart.objects.order_by('id')),
+            (OrderSerializer, Order.objects.with_details().order_by('id')),
+        ]
+        for serializer_class, queryset in cases:
+            with self.subTest(serializer=serializer_class.__name__):
+                reader = reader_for(serializer_class)
+                self.assertEqual(
+                    JSONRenderer().render(reader.to_representation(reader.values(queryset))),
+                    JSONRenderer().render(serializer_class(queryset, many=True).data),
+                )
+
+    def test_endpoints_match_serializers(self):
+        self.login(self.manager)
+        for path, serializer_class, instances in [
+            ('/api/menu-items?ordering=-price&page=2', MenuItemSerializer, MenuItem.objects.order_by('-price')[2:4]),
+            (f'/api/menu-items/{self.menu_items[3].id}', MenuItemSerializer, MenuItem.objects.get(id=self.menu_items[3].id)),
+            ('/api/orders?perpage=5&page=2', OrderSerializer, Order.objects.with_details().order_by('-date')[5:10]),
+            (f'/api/orders/{Order.objects.last().id}', OrderSerializer, Order.objects.with_details().last()),
+        ]:
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                data = response.data['results'] if 'results' in response.data else response.data
+                expected = serializer_class(instances, many=not isinstance(instances, (MenuItem, Order))).data
+                self.assertEqual(JSONRenderer().render(data), JSONRenderer().render(expected))
+
+        self.assertEqual(self.client.get('/api/menu-items/999999').status_code, 404)
+        self.assertEqual(self.client.get('/api/menu-items/abc').status_code, 404)
+        self.assertEqual(self.client.get('/api/orders/999999').status_code, 404)
+
+
+class QueryPlanTests(LittleLemonTestCase):
+    """Fail when a view's main query degrades to a full table scan or a temp B-tree sort."""
+
+    def assertIndexedPlan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        for step in plan:
+            self.assertNotIn('TEMP B-TREE', step, f'{sql}\n{plan}')
+            self.assertFalse(step.startswith('SCAN') and 'USING' not in step, f'{sql}\n{plan}')
+
+    def test_orders_list_plans(self):
+        for user in (self.manager, self.crew, self.customer):
+            for status_filter in (None, 'true', 'false'):
+                for ordering in ('-date', 'date'):
+                    with self.subTest(user=user.username, status=status_filter, ordering=ordering):
+                        orders = Order.objects.visible_to(user).filter_status(status_filter).order_by(ordering)
+                        self.assertIndexedPlan(orders[:10])
+
+    def test_cursor_first_page_plans(self):
+        for user in (self.manager, self.crew, self.customer):
+            with self.subTest(user=user.username):
+                self.assertIndexedPlan(Order.objects.visible_to(user).order_by('-date', '-id')[:11])
+
+    def test_cart_plans(self):
+        self.assertIndexedPlan(Cart.objects.filter(user=self.customer))
+        self.assertIndexedPlan(Cart.objects.filter(user=self.customer, menuitem=self.menu_items[0]))
+
+
+class SalesAnalyticsTests(LittleLemonTestCase):
+
+    def snapshot(self):
+        self.login(self.manager)
+        return {
+            name: self.client.get(f'/api/analytics/{name}').data
+            for name in ('revenue', 'order-status', 'top-items', 'delivery-crew')
+        }
+
+    @override_settings(AUTO_DISPATCH_ORDERS=False)
+    def test_summaries_follow_checkout_updates_and_deletes(self):
+        order_ids = []
+        for size in (3, 2, 4):
+            self.fill_cart(self.customer, size)
+            self.login(self.customer)
+            order_ids.append(self.client.post('/api/orders').data['id'])
+
+        self.login(self.manager)
+        self.client.patch(f'/api/orders/{order_ids[0]}', {'delivery_crew': self.crew.id})
+        self.client.patch(f'/api/orders/{order_ids[1]}', {'delivery_crew': self.crew.id})
+        self.login(self.crew)
+        self.client.patch(f'/api/orders/{order_ids[0]}', {'status': True})
+        self.login(self.manager)
+        self.client.delete(f'/api/orders/{order_ids[1]}')
+        # The checkouts' summary jobs run after the updates and deletes and must still add up.
+        jobs.run_pending()
+
+        incremental = self.snapshot()
+        self.assertEqual(incremental['revenue'][0]['orders'], 2)
+        self.assertEqual(incremental['top-items'][0]['quantity'], 4)
+        self.assertEqual(incremental['delivery-crew'][0]['assigned'], 1)
+        self.assertEqual(incremental['delivery-crew'][0]['delivered'], 1)
+
+        call_command('rebuild_sales_summaries', stdout=io.StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_customers_cannot_read_analytics(self):
+        self.login(self.customer)
+        self.assertEqual(self.client.get('/api/analytics/revenue').status_code, 403)
+
+
+class BulkOrderUpdateTests(LittleLemonTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.crew2 = User.objects.create_user(username='delivery2', password='pass')
+        cls.crew2.groups.add(cls.delivery_group)
+        cls.orders = Order.objects.bulk_create([
+            Order(user=cls.customer, total=i + 1, date=f'2024-01-0{i % 3 + 1}') for i in range(30)
+        ])
+        call_command('rebuild_sales_summaries', stdout=io.StringIO())
+
+    def bulk(self, user, body):
+        self.login(user)
+        return self.client.patch('/api/orders/bulk', body, format='json')
+
+    def summaries(self):
+        self.login(self.manager)
+        return {name: self.client.get(f'/api/analytics/{name}').data for name in ('order-status', 'delivery-crew')}
+
+    def test_assign_by_ids_reports_every_id(self):
+        ids = [order.id for order in self.orders[:5]]
+        response = self.bulk(self.manager, {'ids': ids + [999999], 'delivery_crew': self.crew.id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 5)
+        self.assertEqual([r['result'] for r in response.data['results']], ['updated'] * 5 + ['not_found'])
+        self.assertEqual(Order.objects.filter(delivery_crew=self.crew).count(), 5)
+
+        response = self.bulk(self.manager, {'ids': ids[:2], 'delivery_crew': self.crew.id})
+        self.assertEqual([r['result'] for r in response.data['results']], ['unchanged'] * 2)
+
+    def test_filter_and_status_keep_summaries_in_sync(self):
+        self.bulk(self.manager, {'filter': {'date': '2024-01-01'}, 'delivery_crew': self.crew.id})
+        self.bulk(self.manager, {'filter': {'date': '2024-01-02'}, 'delivery_crew': self.crew2.id})
+        response = self.bulk(self.crew, {'filter': {'delivery_crew': self.crew.id}, 'status': True})
+        self.assertEqual(response.data['updated'], 10)
+        self.bulk(self.manager, {'filter': {'date': '2024-01-01', 'status': True}, 'delivery_crew': self.crew2.id})
+
+        incremental = self.summaries()
+        call_command('rebuild_sales_summaries', stdout=io.StringIO())
+        self.assertEqual(self.summaries(), incremental)
+        self.assertEqual(Order.objects.filter(delivery_crew=self.crew2, status=True).count(), 10)
+
+    def test_query_count_does_not_grow_with_order_count(self):
+        self.bulk(self.manager, {'ids': [self.orders[0].id], 'status': True})  # warm the role cache
+        counts = []
+        for orders in (self.orders[1:2], self.orders[2:30]):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.bulk(self.manager, {'ids': [order.id for order in orders], 'delivery_crew': self.crew.id})
+            self.assertEqual(response.data['updated'], len(orders))
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_permissions_and_validation(self):
+        ids = [self.orders[0].id]
+        self.assertEqual(self.bulk(self.customer, {'ids': ids, 'status': True}).status_code, 403)
+        self.assertEqual(self.bulk(self.crew, {'ids': ids, 'delivery_crew': self.crew.id}).status_code, 400)
+        self.assertEqual(self.bulk(self.manager, {'ids': ids}).status_code, 400)
+        self.assertEqual(self.bulk(self.manager, {'status': True}).status_code, 400)
+        self.assertEqual(self.bulk(self.manager, {'ids': ids, 'filter': {'status': False}, 'status': True}).status_code, 400)
+        self.assertEqual(self.bulk(self.manager, {'ids': ids, 'delivery_crew': 999999}).status_code, 400)
+        self.assertFalse(Order.objects.filter(status=True).exists())
+
+
+class DatabaseRoutingTests(TransactionTestCase):
+    """Reads go to the replica connection unless a write may be involved. Needs committed data."""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        get_store().clear()
+        self.customer = User.objects.create_user(username='customer1', password='pass')
+        category = Category.objects.create(slug='mains', title='Mains')
+        self.item = MenuItem.objects.create(title='Soup', price=Decimal('4.50'), featured=False, category=category)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.customer)
+
+    def test_router(self):
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(Order), 'replica')
+        self.assertEqual(router.db_for_write(Order), 'default')
+        with use_primary():
+            self.assertEqual(router.db_for_read(Order), 'default')
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Order), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'LittleLemonAPI'))
+
+    def test_gets_read_from_the_replica_and_writes_from_the_primary(self):
+        with CaptureQueriesContext(connections['default']) as primary, CaptureQueriesContext(connections['replica']) as replica:
+            self.client.get('/api/cart/menu-items')
+        self.assertEqual(len(primary.captured_queries), 0)
+        self.assertGreater(len(replica.captured_queries), 0)
+
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(self.client.post('/api/cart/menu-items', {'menuitem': self.item.id}).status_code, 201)
+            self.assertEqual(self.client.post('/api/orders').status_code, 201)
+        self.assertEqual(len(replica.captured_queries), 0)
+
+        # Committed writes are visible on the replica straight away.
+        self.assertEqual(len(self.client.get('/api/orders').data), 1)
+
+    def test_connection_setup(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+        # Connecting must not rewrite the database file; migration 0010 switches it to WAL.
+        self.assertNotIn('journal_mode', connections['default'].settings_dict['OPTIONS']['init_command'])
+        with self.assertRaises(OperationalError), connections['replica'].cursor() as cursor:
+            cursor.execute('DELETE FROM LittleLemonAPI_menuitem')
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0)
+class InstrumentationTests(LittleLemonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        instrumentation.histograms.clear()
+
+    def server_timing(self, response):
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    def test_server_timing_breaks_down_the_request(self):
+        Order.objects.create(user=self.customer, total=5, date='2024-01-01')
+        self.login(self.manager)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/orders')
+
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'auth', 'throttle', 'permissions', 'db', 'serialize', 'render', 'total'})
+        self.assertEqual(timing['db']['desc'], f'"{len(ctx.captured_queries)} queries"')
+        self.assertGreaterEqual(float(timing['total']['dur']), float(timing['render']['dur']))
+
+    def test_histograms_per_view(self):
+        self.login(self.customer)
+        for _ in range(3):
+            self.client.get('/api/orders')
+        self.client.get('/api/menu-items')
+
+        series = instrumentation.histograms.snapshot()
+        labels = (('view', 'orders-list'), ('method', 'GET'))
+        self.assertEqual(sum(series[('littlelemon_request_duration_seconds', labels)][1]), 3)
+        self.assertEqual(sum(series[('littlelemon_request_phase_seconds', labels + (('phase', 'render'),))][1]), 3)
+        self.assertIn(('littlelemon_request_duration_seconds', (('view', 'menu-items-list'), ('method', 'GET'))), series)
+
+    def test_server_timing_is_only_sent_to_staff_and_managers(self):
+        self.login(self.customer)
+        response = self.client.get('/api/orders')
+        self.assertNotIn('Server-Timing', response)
+        # The request is still broken down in the histograms.
+        labels = (('view', 'orders-list'), ('method', 'GET'), ('phase', 'db'))
+        self.assertIn(('littlelemon_request_phase_seconds', labels), instrumentation.histograms.snapshot())
+
+        self.assertNotIn('Server-Timing', APIClient().get('/api/categories/'))
+
+        staff = User.objects.create_user(username='staff1', password='pass', is_staff=True)
+        self.login(staff)
+        self.assertIn('Server-Timing', self.client.get('/api/orders'))
+        with override_settings(DEBUG=True):
+            self.assertIn('Server-Timing', APIClient().get('/api/categories/'))
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_only_counted(self):
+        self.login(self.customer)
+        response = self.client.get('/api/orders')
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual({name for name, _ in instrumentation.histograms.snapshot()}, {'littlelemon_request_duration_seconds'})
+
+    def test_prometheus_endpoint(self):
+        self.login(self.customer)
+        self.assertEqual(self.client.get('/api/metrics').status_code, 403)
+
+        self.login(self.manager)
+        self.client.get('/api/orders')
+        response = self.client.get('/api/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        text = response.content.decode()
+        self.assertIn('# TYPE littlelemon_request_duration_seconds histogram', text)
+        self.assertIn('littlelemon_request_duration_seconds_bucket{view="orders-list",method="GET",le="+Inf"} 1', text)
+        self.assertIn('littlelemon_request_duration_seconds_count{view="orders-list",method="GET"} 1', text)
+        self.assertIn('# TYPE littlelemon_auth_token_cache_hits_total counter', text)
+
+    def test_prometheus_text_buckets_are_cumulative(self):
+        labels = (('view', 'x'), ('method', 'GET'))
+        for value in (0.001, 0.02, 20):
+            instrumentation.histograms.observe('littlelemon_request_duration_seconds', labels, instrumentation.DURATION_BUCKETS, value)
+        lines = instrumentation.prometheus_text().splitlines()
+
+        self.assertIn('littlelemon_request_duration_seconds_bucket{view="x",method="GET",le="0.005"} 1', lines)
+        self.assertIn('littlelemon_request_duration_seconds_bucket{view="x",method="GET",le="0.025"} 2', lines)
+        self.assertIn('littlelemon_request_duration_seconds_bucket{view="x",method="GET",le="10.0"} 2', lines)
+        self.assertIn('littlelemon_request_duration_seconds_bucket{view="x",method="GET",le="+Inf"} 3', lines)
+        self.assertIn('littlelemon_request_duration_seconds_sum{view="x",method="GET"} 20.021', lines)
+
+    @override_settings(ROOT_URLCONF='LittleLemon.asgi_urls')
+    async def test_async_views_are_timed(self):
+        token = await sync_to_async(Token.objects.create)(user=self.manager)
+        response = await AsyncClient().get('/api/orders', headers={'Authorization': f'Token {token.key}'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual({'auth', 'throttle', 'db', 'render', 'total'}, set(self.server_timing(response)))
+
+        token = await sync_to_async(Token.objects.create)(user=self.customer)
+        response = await AsyncClient().get('/api/orders', headers={'Authorization': f'Token {token.key}'})
+        self.assertNotIn('Server-Timing', response)
+
+
+class DispatchTests(LittleLemonTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.crew2 = User.objects.create_user(username='crew2', password='pass')
+        cls.crew3 = User.objects.create_user(username='crew3', password='pass')
+        cls.delivery_group.user_set.add(cls.crew2, cls.crew3)
+
+    def open_orders(self, crew, count):
+        Order.objects.bulk_create([Order(user=self.customer, delivery_crew=crew, total=1, date='2024-01-01') for _ in range(count)])
+
+    def open_counts(self):
+        return sorted(
+            Order.objects.filter(status=False, delivery_crew__isnull=False).values_list('delivery_crew')
+            .annotate(open=Count('id')).values_list('open', flat=True)
+        )
+
+    def crew_summaries(self):
+        # Zero rows are left behind by moves and hidden by the analytics view.
+        return list(
+            DeliveryCrewSummary.objects.filter(assigned__gt=0).order_by('delivery_crew')
+            .values('delivery_crew', 'assigned', 'delivered')
+        )
+
+    def test_checkout_assigns_the_least_loaded_crew_member(self):
+        self.open_orders(self.crew, 2)
+        self.open_orders(self.crew3, 1)
+        Order.objects.create(user=self.customer, delivery_crew=self.crew2, status=True, total=1, date='2024-01-01')
+        self.login(self.customer)
+
+        assigned = []
+        for _ in range(4):
+            self.fill_cart(self.customer, 1)
+            assigned.append(self.client.post('/api/orders').data['delivery_crew'])
+
+        self.assertEqual(assigned, [self.crew2.id, self.crew2.id, self.crew3.id, self.crew.id])
+        self.assertEqual(self.open_counts(), [2, 2, 3])
+
+    def test_crew_changes_reload_the_heap(self):
+        self.login(self.customer)
+        self.fill_cart(self.customer, 1)
+        self.client.post('/api/orders')
+
+        self.delivery_group.user_set.remove(self.crew, self.crew2)
+        for _ in range(3):
+            self.fill_cart(self.customer, 1)
+            self.assertEqual(self.client.post('/api/orders').data['delivery_crew'], self.crew3.id)
+
+        self.delivery_group.user_set.clear()
+        self.fill_cart(self.customer, 1)
+        self.assertIsNone(self.client.post('/api/orders').data['delivery_crew'])
+
+    def test_crew_changes_made_by_other_workers_are_noticed(self):
+        self.login(self.customer)
+        self.fill_cart(self.customer, 1)
+        self.client.post('/api/orders')
+
+        # Neither change sends m2m_changed in this process.
+        User.objects.filter(id=self.crew.id).update(is_active=False)
+        User.groups.through.objects.filter(user=self.crew2).delete()
+        for _ in range(3):
+            self.fill_cart(self.customer, 1)
+            self.assertEqual(self.client.post('/api/orders').data['delivery_crew'], self.crew3.id)
+
+    def test_dispatch_orders_assigns_the_backlog(self):
+        self.open_orders(self.crew, 5)
+        self.open_orders(None, 10)
+        Order.objects.create(user=self.customer, status=True, total=1, date='2024-01-01')
+        analytics.rebuild()
+
+        out = io.StringIO()
+        call_command('dispatch_orders', stdout=out)
+
+        self.assertEqual(out.getvalue().strip(), 'Assigned 10 orders to 2 delivery crew members.')
+        self.assertEqual(self.open_counts(), [5, 5, 5])
+        self.assertEqual(Order.objects.filter(delivery_crew__isnull=True).count(), 1)
+        incremental = self.crew_summaries()
+        analytics.rebuild()
+        self.assertEqual(self.crew_summaries(), incremental)
+
+    def test_rebalance_moves_excess_and_former_crew_orders(self):
+        self.open_orders(self.crew, 9)
+        former = User.objects.create_user(username='former', password='pass')
+        self.open_orders(former, 2)
+        Order.objects.create(user=self.customer, delivery_crew=self.crew, status=True, total=1, date='2024-01-01')
+        analytics.rebuild()
+
+        self.assertEqual(dispatch.dispatch_backlog(), {})
+        assigned = dispatch.dispatch_backlog(rebalance=True)
+
+        self.assertEqual(sum(assigned.values()), 7)
+        self.assertEqual(self.open_counts(), [3, 4, 4])
+        self.assertFalse(Order.objects.filter(delivery_crew=former, status=False).exists())
+        self.assertTrue(Order.objects.filter(delivery_crew=self.crew, status=True).exists())
+        incremental = self.crew_summaries()
+        analytics.rebuild()
+        self.assertEqual(self.crew_summaries(), incremental)
+
+
+@jobs.task('tests.create_category')
+def create_category(payload):
+    Category.objects.create(slug=payload['slug'], title=payload['slug'])
+    if payload.get('fail'):
+        raise ValueError('boom')
+
+
+class JobQueueTests(LittleLemonTestCase):
+
+    def test_checkout_defers_sales_summaries_to_a_job(self):
+        self.fill_cart(self.customer, 3)
+        self.login(self.customer)
+        self.assertEqual(self.client.post('/api/orders').status_code, 201)
+
+        self.assertEqual(Job.objects.get().name, analytics.RECORD_ORDER_JOB)
+        self.assertFalse(DailySales.objects.exists())
+
+        self.assertEqual(jobs.run_pending(), {jobs.DONE: 1})
+        self.assertFalse(Job.objects.exists())
+        incremental = list(DailySales.objects.values('date', 'orders', 'revenue'))
+        analytics.rebuild()
+        self.assertEqual(list(DailySales.objects.values('date', 'orders', 'revenue')), incremental)
+
+    def test_rebuild_drops_pending_summary_jobs(self):
+        self.fill_cart(self.customer, 2)
+        self.login(self.customer)
+        self.client.post('/api/orders')
+
+        analytics.rebuild()
+        self.assertEqual(jobs.run_pending(), {})
+        self.assertEqual(DailySales.objects.get().orders, 1)
+
+    def test_failed_jobs_are_retried_then_kept(self):
+        job = jobs.enqueue('tests.create_category', {'slug': 'x', 'fail': True}, max_attempts=2)
+
+        self.assertEqual(jobs.run_pending(), {jobs.RETRY: 1})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.lease_owner), (Job.PENDING, 1, ''))
+        self.assertGreater(job.run_at, job.created_at)
+        self.assertIn('ValueError: boom', job.last_error)
+        self.assertFalse(Category.objects.filter(slug='x').exists())
+
+        Job.objects.update(run_at=job.created_at)
+        self.assertEqual(jobs.run_pending(), {jobs.FAILED: 1})
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+        self.assertEqual(jobs.run_pending(), {})
+
+    def test_expired_leases_move_to_another_worker(self):
+        jobs.enqueue('tests.create_category', {'slug': 'once'})
+        [first] = jobs.claim('worker-a')
+        self.assertEqual(jobs.claim('worker-b'), [])
+
+        Job.objects.update(lease_expires_at=first.created_at)
+        [second] = jobs.claim('worker-b')
+        self.assertEqual(second.attempts, 2)
+
+        # The first worker's late run is rolled back; only the lease holder's counts.
+        self.assertEqual(jobs.run_job(first, 'worker-a'), jobs.LOST)
+        self.assertFalse(Category.objects.filter(slug='once').exists())
+        self.assertEqual(jobs.run_job(second, 'worker-b'), jobs.DONE)
+        self.assertEqual(Category.objects.filter(slug='once').count(), 1)
+        self.assertFalse(Job.objects.exists())
+
+    def test_unknown_tasks_are_rejected(self):
+        with self.assertRaises(jobs.UnknownTask):
+            jobs.enqueue('tests.missing')
+
+    def test_run_jobs_once(self):
+        for slug in ('a', 'b', 'c'):
+            jobs.enqueue('tests.create_category', {'slug': slug})
+        out = io.StringIO()
+        call_command('run_jobs', '--once', '--batch', '2', stdout=out)
+        self.assertEqual(out.getvalue().strip(), '3 done')
+        self.assertEqual(Category.objects.filter(slug__in='abc').count(), 3)
+
+
+@override_settings(ROOT_URLCONF='LittleLemon.asgi_urls')
+class OrderEventStreamTests(LittleLemonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.async_client = AsyncClient()
+
+    def token(self, user):
+        return {'Authorization': f'Token {Token.objects.get_or_create(user=user)[0].key}'}
+
+    async def open_stream(self, user, query='', **headers):
+        headers = {**await sync_to_async(self.token)(user), **headers}
+        response = await self.async_client.get(f'/api/orders/events{query}', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        return stream
+
+    async def next_event(self, stream):
+        chunk = (await asyncio.wait_for(anext(stream), 5)).decode()
+        lines = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+        return int(lines['id']), lines['event'], json.loads(lines['data'])
+
+    async def test_streams_follow_the_role_rules(self):
+        manager = await self.open_stream(self.manager)
+        crew = await self.open_stream(self.crew)
+        customer = await self.open_stream(self.customer)
+        other = await sync_to_async(User.objects.create_user)(username='other', password='pass')
+        other_stream = await self.open_stream(other)
+
+        await sync_to_async(self.fill_cart)(self.customer, 2)
+        headers = await sync_to_async(self.token)(self.customer)
+        order = (await self.async_client.post('/api/orders', headers=headers)).json()
+
+        for stream in (manager, crew, customer):
+            _, kind, data = await self.next_event(stream)
+            self.assertEqual(kind, 'order.created')
+            self.assertEqual(data, {key: order[key] for key in data})
+        self.assertEqual(data['delivery_crew'], self.crew.id)
+
+        headers = await sync_to_async(self.token)(self.crew)
+        await self.async_client.patch(f'/api/orders/{order["id"]}', {'status': True}, content_type='application/json', headers=headers)
+        _, kind, data = await self.next_event(customer)
+        self.assertEqual((kind, data['status']), ('order.updated', True))
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(anext(other_stream), 0.3)
+
+    async def test_order_filter_and_replay(self):
+        first, second = [
+            await Order.objects.acreate(user=self.customer, total=5, date='2024-01-01') for _ in range(2)
+        ]
+        await sync_to_async(events.publish_order)(OrderEvent.UPDATED, first)
+        await sync_to_async(events.publish_order)(OrderEvent.UPDATED, second)
+        await sync_to_async(events.publish_order)(OrderEvent.DELETED, first)
+        first_event = await OrderEvent.objects.order_by('id').afirst()
+
+        stream = await self.open_stream(self.customer, f'?order={first.id}', **{'Last-Event-ID': str(first_event.id - 1)})
+        replayed = [await self.next_event(stream) for _ in range(2)]
+        self.assertEqual([kind for _, kind, _ in replayed], ['order.updated', 'order.deleted'])
+        self.assertEqual(replayed[1][2], {'id': first.id})
+
+        headers = await sync_to_async(self.token)(self.crew)
+        response = await self.async_client.get(f'/api/orders/events?order={first.id}', headers=headers)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_one_event_reaches_every_stream(self):
+        streams = [await self.open_stream(self.manager) for _ in range(50)]
+        order = await Order.objects.acreate(user=self.customer, total=5, date='2024-01-01')
+        await sync_to_async(events.publish_order)(OrderEvent.CREATED, order)
+        await sync_to_async(events.broker.wake)()
+
+        received = [await self.next_event(stream) for stream in streams]
+        self.assertEqual({event_id for event_id, _, _ in received}, {received[0][0]})
+        self.assertEqual(len(events.broker.subscriptions[events.MANAGERS]), 50)
+
+    @mock.patch.object(events, 'ORDER_EVENT_HEARTBEAT', 0.1)
+    async def test_streams_end_when_access_changes(self):
+        customer = await self.open_stream(self.customer)
+        manager = await self.open_stream(self.manager)
+        crew = await self.open_stream(self.crew)
+        self.assertEqual(await anext(customer), b': keepalive\n\n')
+
+        headers = await sync_to_async(self.token)(self.customer)
+        self.assertEqual((await self.async_client.post('/token/logout/', headers=headers)).status_code, 204)
+        await sync_to_async(self.manager.groups.remove)(self.manager_group)
+
+        for stream in (customer, manager):
+            with self.assertRaises(StopAsyncIteration):
+                await asyncio.wait_for(anext(stream), 5)
+        self.assertEqual(await anext(crew), b': keepalive\n\n')
+
+    @mock.patch.object(events, 'ORDER_EVENT_HEARTBEAT', 0.3)
+    async def test_busy_streams_are_rechecked(self):
+        stream = await self.open_stream(self.manager)
+        await sync_to_async(self.manager.groups.remove)(self.manager_group)
+        order = await Order.objects.acreate(user=self.customer, total=5, date='2024-01-01')
+
+        # An event every 50ms keeps the stream from ever idling for a heartbeat.
+        deadline = time.monotonic() + 3
+        with self.assertRaises(StopAsyncIteration):
+            while time.monotonic() < deadline:
+                await sync_to_async(events.publish_order)(OrderEvent.UPDATED, order)
+                await sync_to_async(events.broker.wake)()
+                self.assertEqual((await self.next_event(stream))[1], 'order.updated')
+                await asyncio.sleep(0.05)
+
+    @mock.patch.object(events, 'ORDER_EVENT_HEARTBEAT', 0.1)
+    async def test_session_streams_end_on_logout(self):
+        await self.async_client.aforce_login(self.customer)
+        response = await self.async_client.get('/api/orders/events')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        self.assertEqual(await anext(stream), b': keepalive\n\n')
+
+        await self.async_client.alogout()
+        with self.assertRaises(StopAsyncIteration):
+            await asyncio.wait_for(anext(stream), 5)
+
+    @mock.patch.object(events, '_pruned_at', None)
+    def test_writers_prune_expired_events(self):
+        order = Order.objects.create(user=self.customer, total=5, date='2024-01-01')
+        events.publish_order(OrderEvent.CREATED, order)
+        OrderEvent.objects.update(created_at=timezone.now() - datetime.timedelta(seconds=events.ORDER_EVENT_RETENTION + 1))
+        events._pruned_at = None
+
+        # A WSGI write with no stream open anywhere.
+        self.login(self.manager)
+        self.client.patch(f'/api/orders/{order.id}', {'status': True})
+
+        self.assertEqual(list(OrderEvent.objects.values_list('kind', flat=True)), [OrderEvent.UPDATED])
+
+    def test_slow_streams_are_closed(self):
+        subscription = events.Subscription(events.MANAGERS)
+        for event_id in range(events.STREAM_QUEUE_SIZE + 1):
+            subscription.deliver(event_id, 1, 'message')
+
+        self.assertTrue(subscription.overflowed)
+        items = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+        self.assertEqual(len(items), events.STREAM_QUEUE_SIZE)
+        self.assertIsNone(items[-1])
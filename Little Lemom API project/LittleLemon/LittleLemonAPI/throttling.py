@@ -0,0 +1,108 @@
+import os
+import random
+import sqlite3
+import threading
+
+from django.conf import settings
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+# One row per throttle key holding a token bucket. The whole check is a single
+# UPSERT, so it is O(1) and atomic across every process sharing the file.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS throttle (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    stamp REAL NOT NULL,
+    allowed INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+CONSUME_SQL = """
+INSERT INTO throttle (key, tokens, stamp, allowed) VALUES (:key, :capacity - 1, :now, 1)
+ON CONFLICT (key) DO UPDATE SET
+    allowed = MIN(:capacity, tokens + MAX(0, :now - stamp) * :rate) >= 1,
+    tokens = MIN(:capacity, tokens + MAX(0, :now - stamp) * :rate)
+             - (MIN(:capacity, tokens + MAX(0, :now - stamp) * :rate) >= 1),
+    stamp = :now
+RETURNING allowed, tokens
+"""
+
+# Buckets untouched for this long are full again and can be dropped.
+EXPIRE_AFTER = 24 * 60 * 60
+
+
+class SQLiteThrottleStore:
+    """Token buckets in a SQLite file shared by all worker processes."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def connection(self):
+        # sqlite3 connections must not cross threads or survive a fork.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def consume(self, key, capacity, rate, now):
+        """Take one token from ``key``'s bucket. Returns (allowed, tokens left)."""
+        conn = self.connection()
+        allowed, tokens = conn.execute(
+            CONSUME_SQL, {'key': key, 'capacity': capacity, 'rate': rate, 'now': now}
+        ).fetchone()
+        if random.random() < 0.001:
+            conn.execute('DELETE FROM throttle WHERE stamp < ?', (now - EXPIRE_AFTER,))
+        return bool(allowed), tokens
+
+    def clear(self):
+        self.connection().execute('DELETE FROM throttle')
+
+
+_stores = {}
+
+
+def get_store():
+    path = getattr(settings, 'THROTTLE_STORE_PATH', settings.BASE_DIR / 'throttle.sqlite3')
+    store = _stores.get(path)
+    if store is None:
+        store = _stores[path] = SQLiteThrottleStore(path)
+    return store
+
+
+class SharedRateThrottleMixin:
+    """
+    Replace SimpleRateThrottle's per-cache timestamp history with a shared token bucket.
+
+    The bucket holds num_requests tokens and refills at num_requests/duration
+    per second, so the configured rate holds across all workers.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        allowed, self.tokens = get_store().consume(
+            self.key, self.num_requests, self.num_requests / self.duration, self.now
+        )
+        return allowed
+
+    def wait(self):
+        return max(0.0, (1 - self.tokens) * self.duration / self.num_requests)
+
+
+class SharedAnonRateThrottle(SharedRateThrottleMixin, AnonRateThrottle):
+    pass
+
+
+class SharedUserRateThrottle(SharedRateThrottleMixin, UserRateThrottle):
+    pass
@@ -1,12 +1,14 @@
-from django.urls import path,include
+from django.urls import path,re_path,include
 from rest_framework.routers import DefaultRouter
 
 
 from .views import (MenuItemViewSet,
     manager_users, manager_user_delete,
     delivery_crew_users, delivery_crew_user_delete,
-    cart_menu_items, CategoryListView,
-    order_detail,orders_list
+    cart_menu_items, CategoryListView, CategoryIndexView,
+    order_detail,orders_list,orders_export,orders_bulk,
+    analytics_revenue, analytics_order_status, analytics_top_items, analytics_delivery_crew,
+    auth_cache_metrics, prometheus_metrics,
 )
 
 
@@ -18,6 +20,7 @@ router.register('menu-items', MenuItemViewSet, basename='menu-items')
 urlpatterns = [
     # categories
     path('categories/', CategoryListView.as_view(), name='category-list'),
+    path('categories/index', CategoryIndexView.as_view(), name='category-index'),
 
     # menuitems
     path('', include(router.urls)),
@@ -35,4 +38,16 @@ urlpatterns = [
     # Order
     path('orders', orders_list, name='orders-list'),
     path('orders/<int:order_id>', order_detail, name='order-detail'),
+    path('orders/bulk', orders_bulk, name='orders-bulk'),
+    re_path(r'^orders/export\.(?P<export_format>csv|ndjson)$', orders_export, name='orders-export'),
+
+    # Sales analytics
+    path('analytics/revenue', analytics_revenue, name='analytics-revenue'),
+    path('analytics/order-status', analytics_order_status, name='analytics-order-status'),
+    path('analytics/top-items', analytics_top_items, name='analytics-top-items'),
+    path('analytics/delivery-crew', analytics_delivery_crew, name='analytics-delivery-crew'),
+
+    # Metrics
+    path('metrics', prometheus_metrics, name='metrics'),
+    path('metrics/auth-cache', auth_cache_metrics, name='auth-cache-metrics'),
 ]
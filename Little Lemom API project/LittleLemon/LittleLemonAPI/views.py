@@ -1,36 +1,49 @@
 import datetime
 from django.core.paginator import Paginator, EmptyPage
 from django.contrib.auth.models import User, Group
+from django.db import transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 
 from rest_framework import viewsets
-from rest_framework.generics import ListAPIView
-from rest_framework.decorators import api_view, permission_classes, throttle_classes
-from rest_framework.filters import OrderingFilter, SearchFilter
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+from rest_framework.generics import GenericAPIView, ListAPIView
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.settings import api_settings
 
-from .models import MenuItem, Cart, Category, Order, OrderItem
-from .serializers import MenuItemSerializer, UserGroupSerializer,CartSerializer, CategorySerializer, OrderSerializer
+from .models import MenuItem, Cart, Category, Order, OrderEvent, DailySales, OrderStatusSummary, MenuItemSales, DeliveryCrewSummary
+from .serializers import (MenuItemSerializer, UserGroupSerializer,CartSerializer, CartLineSerializer, CategorySerializer, OrderSerializer,
+    BulkOrderUpdateSerializer,
+    DailySalesSerializer, OrderStatusSummarySerializer, MenuItemSalesSerializer, DeliveryCrewSummarySerializer)
 from .permissions import IsManager
+from . import analytics, authentication, catalog, events, export, instrumentation
+from .caching import CatalogCacheMixin
+from .bulk import MAX_BULK_ORDERS, UPDATED, bulk_update_orders
+from .cart import MAX_CART_LINES, add_to_cart, CartLimitExceeded, reprice_carts, UnknownMenuItems
+from .checkout import checkout, EmptyCart, StalePrices
+from .pagination import CURSOR_ORDERINGS, MAX_PAGE_SIZE, InvalidCursor, paginate_by_cursor
+from .roles import MANAGER, DELIVERY_CREW, is_manager, is_delivery_crew
+from .readers import ValuesReadMixin, reader_for
+from .search import MenuItemSearchFilter
 
 # Create your views here.
+# Throttling comes from REST_FRAMEWORK["DEFAULT_THROTTLE_CLASSES"] in settings.py.
 
 
-class MenuItemViewSet(viewsets.ModelViewSet):
-    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+class MenuItemViewSet(CatalogCacheMixin, ValuesReadMixin, viewsets.ModelViewSet):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
     pagination_class = PageNumberPagination  # Using the default PageNumberPagination
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, MenuItemSearchFilter]
     filterset_fields = ['featured', 'category']
     ordering_fields = ['price', 'title']
     ordering = ['title']  # default ordering
-    search_fields = ['title']  # allow searching by title
+    search_fields = ['title']  # full-text search on title (and category title on SQLite)
 
 
     def get_permissions(self):
@@ -43,6 +56,14 @@ class MenuItemViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated()]  # All authenticated users can view (GET)
 
         return []  # Default to no permissions (not really needed)
+
+    def perform_update(self, serializer):
+        """Save the item and reprice open carts holding it if its price changed."""
+        old_price = serializer.instance.price
+        with transaction.atomic():
+            item = serializer.save()
+            if item.price != old_price:
+                reprice_carts([item.id])
     
 
 
@@ -50,13 +71,12 @@ class MenuItemViewSet(viewsets.ModelViewSet):
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated, IsManager])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
 def manager_users(request):
     """
     GET: Returns all users in the Manager group.
     POST: Assigns the user (provided via 'username' in payload) to the Manager group.
     """
-    manager_group = Group.objects.get(name="Manager")
+    manager_group = Group.objects.get(name=MANAGER)
     
     if request.method == 'GET':
         managers = manager_group.user_set.all()
@@ -74,12 +94,11 @@ def manager_users(request):
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated, IsManager])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
 def manager_user_delete(request, userId):
     """
     DELETE: Removes the user with the provided userId from the Manager group.
     """
-    manager_group = Group.objects.get(name="Manager")
+    manager_group = Group.objects.get(name=MANAGER)
     try:
         user = User.objects.get(id=userId)
         user.groups.remove(manager_group)
@@ -92,13 +111,12 @@ def manager_user_delete(request, userId):
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated, IsManager])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
 def delivery_crew_users(request):
     """
     GET: Returns all users in the Delivery Crew group.
     POST: Assigns the user (provided via 'user_id' in payload) to the Delivery Crew group.
     """
-    delivery_group = Group.objects.get(name="Delivery crew")
+    delivery_group = Group.objects.get(name=DELIVERY_CREW)
     
     if request.method == 'GET':
         crew_members = delivery_group.user_set.all()
@@ -116,12 +134,11 @@ def delivery_crew_users(request):
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated, IsManager])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
 def delivery_crew_user_delete(request, userId):
     """
     DELETE: Removes the user with the provided userId from the Delivery Crew group.
     """
-    delivery_group = Group.objects.get(name="Delivery crew")
+    delivery_group = Group.objects.get(name=DELIVERY_CREW)
     try:
         user = User.objects.get(id=userId)
         user.groups.remove(delivery_group)
@@ -132,23 +149,37 @@ def delivery_crew_user_delete(request, userId):
 
 @api_view(['GET', 'POST', 'DELETE'])
 @permission_classes([IsAuthenticated])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
 def cart_menu_items(request):
     user = request.user
 
     if request.method == 'GET':
         # Return all cart items for the current user.
-        cart_items = Cart.objects.filter(user=user)
-        serializer = CartSerializer(cart_items, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        reader = reader_for(CartSerializer)
+        return Response(reader.to_representation(reader.values(Cart.objects.filter(user=user))), status=status.HTTP_200_OK)
 
     elif request.method == 'POST':
-        # Add item to cart (unit_price & price auto-calculated in serializer)
-        serializer = CartSerializer(data=request.data, context={'request': request})
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # Add one line ({menuitem, quantity}) or a list of lines in one transaction.
+        # unit_price & price come from the current menu price; existing lines have their quantity raised.
+        many = isinstance(request.data, list)
+        if many:
+            serializer = CartLineSerializer(data=request.data, many=True, allow_empty=False, max_length=MAX_CART_LINES)
+        else:
+            serializer = CartLineSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        lines = serializer.validated_data if many else [serializer.validated_data]
+        try:
+            menuitem_ids = add_to_cart(user, lines)
+        except UnknownMenuItems as e:
+            return Response({"error": f"Menu items not found: {e.ids}"}, status=status.HTTP_400_BAD_REQUEST)
+        except CartLimitExceeded as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if many:
+            cart_items = Cart.objects.filter(user=user)
+            return Response(CartSerializer(cart_items, many=True).data, status=status.HTTP_201_CREATED)
+        cart_item = Cart.objects.get(user=user, menuitem_id=menuitem_ids[0])
+        return Response(CartSerializer(cart_item).data, status=status.HTTP_201_CREATED)
 
     elif request.method == 'DELETE':
         # Remove all cart items for the current user
@@ -157,18 +188,51 @@ def cart_menu_items(request):
 
     
 
-class CategoryListView(ListAPIView):
-    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+class CategoryListView(CatalogCacheMixin, ValuesReadMixin, ListAPIView):
     queryset = Category.objects.all()  # Query all categories
     serializer_class = CategorySerializer  # Use the CategorySerializer to format the response
     permission_classes = [IsAuthenticatedOrReadOnly]  # Allows viewing by anyone, but modification is restricted
 
 
+def _prices(row):
+    # Prices as strings, like MenuItemSerializer renders them.
+    for field in ('min_price', 'max_price'):
+        if row[field] is not None:
+            row[field] = str(row[field])
+    return row
+
+
+class CategoryIndexView(CatalogCacheMixin, GenericAPIView):
+    """
+    GET /api/categories/index: every category with its item count, featured
+    count and price range, unpaginated, for building the menu navigation.
+
+    Any MenuItemViewSet filter (?category=, ?featured=, ?search=) adds
+    "facets": the matching items counted per category and per featured
+    flag, with their price range. Cached until the catalog changes.
+    """
+    queryset = MenuItem.objects.all()
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    filter_backends = [DjangoFilterBackend, MenuItemSearchFilter]
+    filterset_fields = MenuItemViewSet.filterset_fields
+    search_fields = MenuItemViewSet.search_fields
+
+    def get(self, request):
+        return self.cached_response(request, self.build)
+
+    def build(self):
+        categories = [_prices(row) for row in catalog.category_index()]
+        data = {'count': len(categories), 'categories': categories}
+        filters = [*self.filterset_fields, api_settings.SEARCH_PARAM]
+        if any(param in self.request.query_params for param in filters):
+            data['facets'] = _prices(catalog.menu_facets(self.filter_queryset(self.get_queryset())))
+        return Response(data)
+
+
 
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
 def orders_list(request):
     """
     GET /api/orders/:
@@ -185,34 +249,20 @@ def orders_list(request):
     # GET: List orders based on role
     # -----------------------
     if request.method == 'GET':
-        if user.groups.filter(name="Manager").exists():
-            orders = Order.objects.all()
-        elif user.groups.filter(name="Delivery crew").exists():
-            orders = Order.objects.filter(delivery_crew=user)
-        else:
-            orders = Order.objects.filter(user=user)
+        # Read straight from values() rows; responses match OrderSerializer (see readers.py).
+        reader = reader_for(OrderSerializer)
+        orders = Order.objects.visible_to(user)
 
 
         # ----- Filtering ----- 
         # Optionally filter by 'status' if provided (e.g., ?status=true or ?status=false)
-        status_filter = request.query_params.get('status')
-        if status_filter is not None:
-            # Interpret common true/false values
-            if status_filter.lower() in ['true', '1']:
-                orders = orders.filter(status=True)
-            else:
-                orders = orders.filter(status=False)
+        orders = orders.filter_status(request.query_params.get('status'))
         
         # ----- Sorting (Ordering) -----
         # Use the 'ordering' query parameter (e.g., ?ordering=total or ?ordering=-date)
-        ordering_param = request.query_params.get('ordering')
-        if ordering_param:
-            orders = orders.order_by(ordering_param)
-        else:
-            orders = orders.order_by('-date')  # default ordering
-        
+        ordering_param = request.query_params.get('ordering') or '-date'  # default ordering
+
         # ----- Pagination -----
-           # Manual pagination using Django's Paginator
         page = request.query_params.get('page', 1)
         perpage = request.query_params.get('perpage', 10)
         try:
@@ -220,16 +270,30 @@ def orders_list(request):
             page = int(page)
         except ValueError:
             return Response({"error": "Invalid page or perpage parameter."}, status=status.HTTP_400_BAD_REQUEST)
-
+        if perpage < 1:
+            return Response({"error": "Invalid page or perpage parameter."}, status=status.HTTP_400_BAD_REQUEST)
+        perpage = min(perpage, MAX_PAGE_SIZE)
+
+        # Opt-in keyset pagination: ?cursor= (empty for the first page), then the returned 'next'.
+        cursor = request.query_params.get('cursor')
+        if cursor is not None:
+            if ordering_param not in CURSOR_ORDERINGS:
+                return Response({"error": f"Cursor pagination supports ordering by {', '.join(CURSOR_ORDERINGS)}."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                rows, next_cursor = paginate_by_cursor(reader.values(orders), ordering_param, cursor, perpage)
+            except InvalidCursor:
+                return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"results": reader.to_representation(rows), "next": next_cursor}, status=status.HTTP_200_OK)
+
+        # Manual pagination using Django's Paginator
+        orders = reader.values(orders.order_by(ordering_param))
         paginator = Paginator(orders, per_page=perpage)
         try:
             orders = paginator.page(number=page)
         except EmptyPage:
             orders = []
-        
-        serializer_orders = OrderSerializer(orders, many=True)
 
-        return Response(serializer_orders.data, status=status.HTTP_200_OK)
+        return Response(reader.to_representation(orders), status=status.HTTP_200_OK)
  
     
     # -----------------------
@@ -237,41 +301,69 @@ def orders_list(request):
     # -----------------------
     elif request.method == 'POST':
         # Only customers can create orders
-        if user.groups.filter(name="Manager").exists() or user.groups.filter(name="Delivery crew").exists():
+        if is_manager(user) or is_delivery_crew(user):
             return Response({"error": "Only customers can create orders."}, status=status.HTTP_403_FORBIDDEN)
         
-        # Create order from current cart items.
-        cart_items = Cart.objects.filter(user=user)
-        if not cart_items.exists():
+        # Create order from current cart items in one transaction.
+        # Clients may send an Idempotency-Key header so retries return the same order.
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key and len(idempotency_key) > 64:
+            return Response({"error": "Idempotency-Key must be at most 64 characters."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            order, created = checkout(user, idempotency_key)
+        except EmptyCart:
             return Response({"error": "Cart is empty."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Create a new order for the customer; set date to today and total initially 0.
-        order = Order.objects.create(
-            user=user,
-            total=0,
-            date=datetime.date.today()
-        )
-        total = 0
-        for item in cart_items:
-            # Create an OrderItem for each cart item
-            OrderItem.objects.create(
-                order=order,
-                menuitem=item.menuitem,
-                quantity=item.quantity,
-                unit_price=item.unit_price,
-                price=item.price
-            )
-            total += item.price
-        order.total = total
-        order.save()
-        # Clear the cart
-        cart_items.delete()
+        except StalePrices as exc:
+            return Response({"error": "Menu prices changed since these items were added; the cart has been repriced.", "menuitems": exc.ids}, status=status.HTTP_409_CONFLICT)
+        except CartLimitExceeded as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         serializer = OrderSerializer(order)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsManager])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [export.CSVRenderer, export.NDJSONRenderer])
+def orders_export(request, export_format):
+    """
+    GET /api/orders/export.csv or /api/orders/export.ndjson (managers only):
+      - Streams every order with its items, optionally limited with ?start=YYYY-MM-DD&end=YYYY-MM-DD.
+      - Orders are read in chunks of EXPORT_CHUNK_SIZE, so memory stays flat for any history size.
+    """
+    try:
+        start = datetime.date.fromisoformat(request.query_params['start']) if request.query_params.get('start') else None
+        end = datetime.date.fromisoformat(request.query_params['end']) if request.query_params.get('end') else None
+    except ValueError:
+        return Response({"error": "start and end must be dates (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+
+    chunks = export.order_chunks(start, end)
+    if export_format == 'csv':
+        response = StreamingHttpResponse(export.csv_lines(chunks), content_type='text/csv')
+    else:
+        response = StreamingHttpResponse(export.ndjson_lines(chunks), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="orders.{export_format}"'
+    return response
+
+def _update_order(order, data):
+    """Apply a partial update and move the order between the sales summaries in one transaction."""
+    old_status, old_crew_id = order.status, order.delivery_crew_id
+    serializer = OrderSerializer(order, data=data, partial=True)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    with transaction.atomic():
+        serializer.save()
+        analytics.record_order_change(old_status, old_crew_id, order)
+        events.publish_order(OrderEvent.UPDATED, order)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+def _delete_order(order):
+    with transaction.atomic():
+        analytics.record_order_delete(order)
+        events.publish_order(OrderEvent.DELETED, order)
+        order.delete()
 
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
 def order_detail(request, order_id):
     """
     /api/orders/{order_id}/ endpoint:
@@ -288,41 +380,37 @@ def order_detail(request, order_id):
     DELETE:
       - Only Managers can delete orders.
     """
-    order = get_object_or_404(Order, id=order_id)
     user = request.user
 
     # -----------------------
-    # GET: Retrieve order details.
+    # GET: Retrieve order details (straight from values() rows, see readers.py).
     # -----------------------
     if request.method == 'GET':
+        reader = reader_for(OrderSerializer)
+        rows = list(reader.values(Order.objects.filter(id=order_id)))
+        if not rows:
+            raise Http404("No Order matches the given query.")
         # Customers can only view their own orders.
-        if not (user.groups.filter(name="Manager").exists() or user.groups.filter(name="Delivery crew").exists()):
-            if order.user != user:
+        if not (is_manager(user) or is_delivery_crew(user)):
+            if rows[0]['user_id'] != user.id:
                 return Response({"error": "Not authorized to view this order."}, status=status.HTTP_403_FORBIDDEN)
-        serializer = OrderSerializer(order)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    
+        return Response(reader.to_representation(rows)[0], status=status.HTTP_200_OK)
+
+    order = get_object_or_404(Order.objects.with_details(), id=order_id)
+
     # -----------------------
     # PUT/PATCH: Update an order.
     # -----------------------
-    elif request.method in ['PUT', 'PATCH']:
+    if request.method in ['PUT', 'PATCH']:
         # Manager: can update any field.
-        if user.groups.filter(name="Manager").exists():
-            serializer = OrderSerializer(order, data=request.data, partial=True)
-            if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data, status=status.HTTP_200_OK)
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if is_manager(user):
+            return _update_order(order, request.data)
         
         # Delivery Crew: can only update the 'status' field.
-        elif user.groups.filter(name="Delivery crew").exists():
+        elif is_delivery_crew(user):
             if set(request.data.keys()) != {'status'}:
                 return Response({"error": "Delivery crew can only update the 'status' field."}, status=status.HTTP_400_BAD_REQUEST)
-            serializer = OrderSerializer(order, data=request.data, partial=True)
-            if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data, status=status.HTTP_200_OK)
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return _update_order(order, request.data)
         else:
             return Response({"error": "Not authorized to update this order."}, status=status.HTTP_403_FORBIDDEN)
     
@@ -330,8 +418,126 @@ def order_detail(request, order_id):
     # DELETE: Delete an order.
     # -----------------------
     elif request.method == 'DELETE':
-        if user.groups.filter(name="Manager").exists():
-            order.delete()
+        if is_manager(user):
+            _delete_order(order)
             return Response({"message": "Order deleted."}, status=status.HTTP_200_OK)
         else:
-            return Response({"error": "Not authorized to delete this order."}, status=status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+            return Response({"error": "Not authorized to delete this order."}, status=status.HTTP_403_FORBIDDEN)
+
+
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def orders_bulk(request):
+    """
+    PATCH /api/orders/bulk:
+      - Body: {"ids": [...]} or {"filter": {"status", "delivery_crew", "date"}}, plus the new
+        "delivery_crew" and/or "status". At most MAX_BULK_ORDERS orders per request.
+      - Managers may change both fields, Delivery Crew only 'status' (as in order_detail).
+      - Applied with set-based UPDATEs in one transaction; returns the outcome for every ID.
+    """
+    user = request.user
+    if not (is_manager(user) or is_delivery_crew(user)):
+        return Response({"error": "Not authorized to update orders."}, status=status.HTTP_403_FORBIDDEN)
+
+    serializer = BulkOrderUpdateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+
+    changes = {}
+    if 'delivery_crew' in data:
+        if not is_manager(user):
+            return Response({"error": "Delivery crew can only update the 'status' field."}, status=status.HTTP_400_BAD_REQUEST)
+        changes['delivery_crew_id'] = data['delivery_crew'].pk if data['delivery_crew'] else None
+    if 'status' in data:
+        changes['status'] = data['status']
+
+    if 'ids' in data:
+        order_ids = data['ids']
+    else:
+        filters = dict(data['filter'])
+        if 'delivery_crew' in filters:
+            filters['delivery_crew_id'] = filters.pop('delivery_crew')
+        order_ids = list(Order.objects.filter(**filters).order_by('id').values_list('id', flat=True)[:MAX_BULK_ORDERS + 1])
+        if len(order_ids) > MAX_BULK_ORDERS:
+            return Response({"error": f"The filter matches more than {MAX_BULK_ORDERS} orders."}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = bulk_update_orders(order_ids, changes)
+    return Response({
+        "updated": sum(result == UPDATED for result in results.values()),
+        "results": [{"id": order_id, "result": result} for order_id, result in results.items()],
+    }, status=status.HTTP_200_OK)
+
+# ----- Sales analytics (managers only, read from the summary tables) ----- #
+# Rows emptied by updates and deletes are skipped, as rebuild_sales_summaries would drop them.
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsManager])
+def analytics_revenue(request):
+    """
+    GET: Orders and revenue per day, optionally limited with ?start=YYYY-MM-DD&end=YYYY-MM-DD.
+    """
+    days = DailySales.objects.filter(orders__gt=0).order_by('date')
+    try:
+        if request.query_params.get('start'):
+            days = days.filter(date__gte=datetime.date.fromisoformat(request.query_params['start']))
+        if request.query_params.get('end'):
+            days = days.filter(date__lte=datetime.date.fromisoformat(request.query_params['end']))
+    except ValueError:
+        return Response({"error": "start and end must be dates (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(DailySalesSerializer(days, many=True).data, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsManager])
+def analytics_order_status(request):
+    """
+    GET: Number of orders per status.
+    """
+    summaries = OrderStatusSummary.objects.filter(orders__gt=0).order_by('status')
+    return Response(OrderStatusSummarySerializer(summaries, many=True).data, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsManager])
+def analytics_top_items(request):
+    """
+    GET: Best selling menu items, ?by=quantity (default) or ?by=revenue, at most ?limit= (default 10, max 100).
+    """
+    by = request.query_params.get('by', 'quantity')
+    if by not in ['quantity', 'revenue']:
+        return Response({"error": "by must be 'quantity' or 'revenue'."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({"error": "Invalid limit parameter."}, status=status.HTTP_400_BAD_REQUEST)
+    items = MenuItemSales.objects.filter(quantity__gt=0).select_related('menuitem').order_by(f'-{by}', 'menuitem_id')[:max(limit, 0)]
+    return Response(MenuItemSalesSerializer(items, many=True).data, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsManager])
+def analytics_delivery_crew(request):
+    """
+    GET: Orders assigned to and delivered by each delivery crew member.
+    """
+    crew = DeliveryCrewSummary.objects.filter(assigned__gt=0).select_related('delivery_crew').order_by('-delivered', 'delivery_crew_id')
+    return Response(DeliveryCrewSummarySerializer(crew, many=True).data, status=status.HTTP_200_OK)
+
+
+# ----- Metrics ----- #
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsManager])
+def auth_cache_metrics(request):
+    """GET: Hit/miss counters of the token authentication cache in this process."""
+    return Response(authentication.stats.snapshot(), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsManager])
+def prometheus_metrics(request):
+    """GET: Request histograms and auth cache counters of this process, in the Prometheus text format."""
+    auth = authentication.stats.snapshot()
+    text = instrumentation.prometheus_text([
+        ('littlelemon_auth_token_cache_hits_total', 'Token authentication cache hits.', auth['hits']),
+        ('littlelemon_auth_token_cache_misses_total', 'Token authentication cache misses.', auth['misses']),
+    ])
+    return HttpResponse(text, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,77 @@
+"""
+Per menu item rating aggregates.
+
+RatingSummary rows are moved by one upsert per rating write instead of
+being recomputed, so reading an average or histogram never scans Rating.
+Rating.save() records creates and score changes in its own transaction;
+the post_delete receiver covers deletes, including cascades from User.
+Bulk queryset writes bypass both, run ``rebuild_summaries()`` after them.
+"""
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+
+from .models import Rating, RatingSummary
+
+SCORES = range(6)
+
+# Seconds a rendered summary stays cached; writes drop it straight away.
+SUMMARY_CACHE_TTL = 300
+SUMMARY_LIST_KEY = 'rating-summary:all'
+
+
+def summary_cache_key(menuitem_id):
+    return f'rating-summary:{menuitem_id}'
+
+
+def invalidate_summaries(*menuitem_ids):
+    cache.delete_many([summary_cache_key(menuitem_id) for menuitem_id in menuitem_ids] + [SUMMARY_LIST_KEY])
+
+
+def record_rating(menuitem_id, rating, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) one rating from its menu item's summary.
+
+    A single INSERT .. ON CONFLICT DO UPDATE increments the counters in the
+    database, so concurrent writers never overwrite each other. Call it in
+    the transaction that writes the Rating; cached summaries are dropped
+    once that transaction commits.
+    """
+    table = connection.ops.quote_name(RatingSummary._meta.db_table)
+    stars = f'stars_{rating}'
+    buckets = [f'stars_{score}' for score in SCORES]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (menuitem_id, count, total, {', '.join(buckets)}) "
+            f"VALUES ({', '.join(['%s'] * (len(buckets) + 3))}) "
+            f"ON CONFLICT (menuitem_id) DO UPDATE SET "
+            f"count = {table}.count + excluded.count, "
+            f"total = {table}.total + excluded.total, "
+            f"{stars} = {table}.{stars} + excluded.{stars}",
+            [menuitem_id, sign, sign * rating] + [sign if score == rating else 0 for score in SCORES],
+        )
+    transaction.on_commit(lambda: invalidate_summaries(menuitem_id))
+
+
+def rating_deleted(sender, instance, **kwargs):
+    """post_delete receiver for Rating."""
+    record_rating(instance.menuitem_id, instance.rating, sign=-1)
+
+
+@transaction.atomic
+def rebuild_summaries():
+    """Recompute every RatingSummary from the Rating table."""
+    stale = list(RatingSummary.objects.values_list('menuitem_id', flat=True))
+    rows = list(
+        Rating.objects.values('menuitem_id')
+        .annotate(
+            count=Count('id'),
+            total=Sum('rating'),
+            **{f'stars_{score}': Count('id', filter=Q(rating=score)) for score in SCORES},
+        )
+        .order_by('menuitem_id')
+    )
+    RatingSummary.objects.all().delete()
+    RatingSummary.objects.bulk_create(RatingSummary(**row) for row in rows)
+    menuitem_ids = set(stale) | {row['menuitem_id'] for row in rows}
+    transaction.on_commit(lambda: invalidate_summaries(*menuitem_ids))
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete
 
 
 class LittlelemondrfConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'LittleLemonDRF'
+
+    def ready(self):
+        from .aggregates import rating_deleted
+
+        post_delete.connect(rating_deleted, sender='LittleLemonDRF.Rating', dispatch_uid='rating_summary_delete')
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:06
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+def remove_duplicate_ratings(apps, schema_editor):
+    """Keep only the latest rating of each user for each menu item."""
+    Rating = apps.get_model('LittleLemonDRF', 'Rating')
+    latest = Rating.objects.values('user', 'menuitem_id').annotate(latest=Max('id')).values('latest')
+    Rating.objects.exclude(id__in=latest).delete()
+
+
+def build_summaries(apps, schema_editor):
+    Rating = apps.get_model('LittleLemonDRF', 'Rating')
+    RatingSummary = apps.get_model('LittleLemonDRF', 'RatingSummary')
+    rows = (
+        Rating.objects.values('menuitem_id')
+        .annotate(
+            count=Count('id'),
+            total=Sum('rating'),
+            **{f'stars_{score}': Count('id', filter=Q(rating=score)) for score in range(6)},
+        )
+        .order_by('menuitem_id')
+    )
+    RatingSummary.objects.bulk_create(RatingSummary(**row) for row in rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonDRF', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_ratings, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='RatingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('menuitem_id', models.SmallIntegerField(unique=True)),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('stars_0', models.IntegerField(default=0)),
+                ('stars_1', models.IntegerField(default=0)),
+                ('stars_2', models.IntegerField(default=0)),
+                ('stars_3', models.IntegerField(default=0)),
+                ('stars_4', models.IntegerField(default=0)),
+                ('stars_5', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='rating',
+            constraint=models.UniqueConstraint(fields=('user', 'menuitem_id'), name='unique_rating_per_user_item'),
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
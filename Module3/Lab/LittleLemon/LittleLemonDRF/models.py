@@ -1,8 +1,49 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 
 
 class Rating(models.Model):
   menuitem_id = models.SmallIntegerField()
   rating = models.SmallIntegerField()
-  user = models.ForeignKey(User, on_delete=models.CASCADE)
\ No newline at end of file
+  user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+  class Meta:
+    # One rating per user and menu item, enforced by a unique index instead of a validator query.
+    constraints = [
+      models.UniqueConstraint(fields=['user', 'menuitem_id'], name='unique_rating_per_user_item'),
+    ]
+
+  def save(self, *args, **kwargs):
+    """Save the rating and move its RatingSummary counters in the same transaction."""
+    from .aggregates import record_rating
+
+    with transaction.atomic():
+      old = None
+      if self.pk is not None:
+        old = Rating.objects.filter(pk=self.pk).values_list('menuitem_id', 'rating').first()
+      super().save(*args, **kwargs)
+      if old is not None:
+        record_rating(*old, sign=-1)
+      record_rating(self.menuitem_id, self.rating)
+
+
+class RatingSummary(models.Model):
+  """Per menu item aggregate of Rating, maintained by LittleLemonDRF.aggregates."""
+  menuitem_id = models.SmallIntegerField(unique=True)
+  count = models.IntegerField(default=0)
+  total = models.IntegerField(default=0)
+  # Histogram: number of ratings with each score (RatingSerializer allows 0-5).
+  stars_0 = models.IntegerField(default=0)
+  stars_1 = models.IntegerField(default=0)
+  stars_2 = models.IntegerField(default=0)
+  stars_3 = models.IntegerField(default=0)
+  stars_4 = models.IntegerField(default=0)
+  stars_5 = models.IntegerField(default=0)
+
+  @property
+  def average(self):
+    return round(self.total / self.count, 2) if self.count else None
+
+  @property
+  def histogram(self):
+    return {str(stars): getattr(self, f'stars_{stars}') for stars in range(6)}
@@ -1,7 +1,5 @@
-
 from rest_framework import serializers 
-from .models import Rating 
-from rest_framework.validators import UniqueTogetherValidator 
+from .models import Rating, RatingSummary 
 from django.contrib.auth.models import User 
  
  
@@ -13,5 +11,16 @@ class RatingSerializer (serializers.ModelSerializer):
     class Meta:
         model = Rating
         fields = ['user', 'menuitem_id', 'rating']
-        validators = [UniqueTogetherValidator(queryset= Rating.objects.all(), fields=['user', 'menuitem_id', 'rating'])] 
+        # Duplicates are rejected by the unique_rating_per_user_item constraint, see RatingsView.
+        validators = []
         extra_kwargs = {'rating': {'max_value': 5, 'min_value': 0}, }
+
+
+class RatingSummarySerializer(serializers.ModelSerializer):
+    sum = serializers.IntegerField(source='total')
+    average = serializers.FloatField()
+    histogram = serializers.DictField(child=serializers.IntegerField())
+
+    class Meta:
+        model = RatingSummary
+        fields = ['menuitem_id', 'count', 'sum', 'average', 'histogram']
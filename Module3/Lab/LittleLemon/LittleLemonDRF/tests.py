@@ -1,3 +1,62 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .aggregates import rebuild_summaries
+from .models import Rating, RatingSummary
+
+
+class RatingSummaryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.alice = User.objects.create_user('alice', password='pass')
+        self.bob = User.objects.create_user('bob', password='pass')
+
+    def summary(self, menuitem_id):
+        return self.client.get(f'/api/ratings/summary/{menuitem_id}')
+
+    def test_summary_follows_rating_writes(self):
+        self.client.force_authenticate(self.alice)
+        self.assertEqual(self.client.post('/api/ratings', {'menuitem_id': 1, 'rating': 4}).status_code, 201)
+        self.assertEqual(self.summary(1).json(), {
+            'menuitem_id': 1, 'count': 1, 'sum': 4, 'average': 4.0,
+            'histogram': {'0': 0, '1': 0, '2': 0, '3': 0, '4': 1, '5': 0},
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(user=self.bob, menuitem_id=1, rating=1)
+        self.assertEqual(self.summary(1).json()['average'], 2.5)
+
+        rating = Rating.objects.get(user=self.alice)
+        rating.rating = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.save()
+        self.assertEqual(self.summary(1).json()['histogram'], {'0': 0, '1': 1, '2': 0, '3': 0, '4': 0, '5': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.delete()
+        self.assertEqual(self.summary(1).json()['count'], 1)
+        self.assertEqual(self.client.get('/api/ratings/summary').json(), [self.summary(1).json()])
+
+    def test_duplicate_rating_is_rejected(self):
+        self.client.force_authenticate(self.alice)
+        self.client.post('/api/ratings', {'menuitem_id': 1, 'rating': 4})
+        response = self.client.post('/api/ratings', {'menuitem_id': 1, 'rating': 2})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Rating.objects.count(), 1)
+        self.assertEqual(RatingSummary.objects.get(menuitem_id=1).total, 4)
+
+    def test_rebuild_matches_incremental_summaries(self):
+        for user, menuitem_id, score in [(self.alice, 1, 3), (self.bob, 1, 0), (self.alice, 2, 5)]:
+            Rating.objects.create(user=user, menuitem_id=menuitem_id, rating=score)
+        incremental = list(RatingSummary.objects.order_by('menuitem_id').values())
+        rebuild_summaries()
+        rebuilt = list(RatingSummary.objects.order_by('menuitem_id').values())
+        self.assertEqual([dict(row, id=None) for row in rebuilt], [dict(row, id=None) for row in incremental])
+
+    def test_ratings_list_stays_public(self):
+        self.assertEqual(self.client.get('/api/ratings').status_code, 200)
+        self.assertEqual(self.client.post('/api/ratings', {'menuitem_id': 1, 'rating': 4}).status_code, 401)
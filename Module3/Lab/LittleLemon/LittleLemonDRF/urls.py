@@ -3,4 +3,6 @@ from . import views
   
 urlpatterns = [ 
     path('ratings', views.RatingsView.as_view()), 
-] 
\ No newline at end of file
+    path('ratings/summary', views.RatingSummaryListView.as_view()), 
+    path('ratings/summary/<int:menuitem_id>', views.RatingSummaryView.as_view()), 
+] 
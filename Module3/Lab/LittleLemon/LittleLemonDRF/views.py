@@ -1,16 +1,50 @@
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.shortcuts import get_object_or_404
 from rest_framework import generics
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
-from .models import Rating
-from .serializers import RatingSerializer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .aggregates import SUMMARY_CACHE_TTL, SUMMARY_LIST_KEY, summary_cache_key
+from .models import Rating, RatingSummary
+from .serializers import RatingSerializer, RatingSummarySerializer
 
 class RatingsView(generics.ListCreateAPIView):
     queryset = Rating.objects.all()
     serializer_class = RatingSerializer
 
-    def get_permission(self):
+    def get_permissions(self):
       if(self.request.method=='GET'):
         return []        
       return [IsAuthenticated()]
 
-  
-        
+    def perform_create(self, serializer):
+      try:
+        serializer.save()
+      except IntegrityError:
+        raise ValidationError({'non_field_errors': ['You have already rated this menu item.']})
+
+
+class RatingSummaryListView(APIView):
+    permission_classes = []
+
+    def get(self, request):
+      data = cache.get(SUMMARY_LIST_KEY)
+      if data is None:
+        summaries = RatingSummary.objects.filter(count__gt=0).order_by('menuitem_id')
+        data = RatingSummarySerializer(summaries, many=True).data
+        cache.set(SUMMARY_LIST_KEY, data, SUMMARY_CACHE_TTL)
+      return Response(data)
+
+
+class RatingSummaryView(APIView):
+    permission_classes = []
+
+    def get(self, request, menuitem_id):
+      data = cache.get(summary_cache_key(menuitem_id))
+      if data is None:
+        summary = get_object_or_404(RatingSummary, menuitem_id=menuitem_id, count__gt=0)
+        data = RatingSummarySerializer(summary).data
+        cache.set(summary_cache_key(menuitem_id), data, SUMMARY_CACHE_TTL)
+      return Response(data)